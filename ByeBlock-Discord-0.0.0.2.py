@@ -5,32 +5,56 @@
 ####################################################################################################|
 ####################################################################################################|
                                                                                                    #| 
-import sys                                                                                         #| 
-import os                                                                                          #|
-import subprocess                                                                                  #|
-import requests                                                                                    #|
 import time                                                                                        #|
+STARTUP_BEGIN = time.perf_counter()                                                                #|
+import sys                                                                                         #|
+import os                                                                                          #|
+import json                                                                                        #|
+import logging                                                                                     #|
+import threading                                                                                   #|
+if __name__ == "__main__" and "--probe" in sys.argv:                                               #|
+    # Headless proxy checks, without Qt                                                            #|
+    from byeblock_cli import probe_main                                                            #|
+    sys.exit(probe_main(sys.argv[1:]))                                                             #|
 from PyQt5.QtCore import (                                                                         #|
-    QUrl, QSettings, QThread, pyqtSignal, Qt                                                       #|
+    QUrl, QSettings, QThread, QTimer, QCoreApplication, pyqtSignal, Qt, QBuffer, QIODevice         #|
 )                                                                                                  #|
 from PyQt5.QtWidgets import (                                                                      #|
     QApplication, QMainWindow, QMessageBox, QAction, QMenu,                                        #|
     QMenuBar, QWidget, QDialog, QDialogButtonBox, QVBoxLayout,                                     #|
     QLabel, QSpinBox, QLineEdit, QComboBox, QCheckBox,                                             #|
-    QPushButton, QTabWidget, QSystemTrayIcon                                                       #|
+    QPushButton, QTabWidget, QSystemTrayIcon, QFileDialog, QListWidget,                            #|
+    QTableWidget, QTableWidgetItem                                                                 #|
+)                                                                                                  #|
+from PyQt5.QtWebEngineWidgets import (                                                             #|
+    QWebEngineView, QWebEnginePage, QWebEngineSettings, QWebEngineProfile, QWebEngineScript        #|
+)                                                                                                  #|
+from PyQt5.QtWebEngineCore import (                                                                #|
+    QWebEngineUrlRequestInterceptor, QWebEngineUrlSchemeHandler, QWebEngineUrlScheme,              #|
+    QWebEngineUrlRequestJob, QWebEngineUrlRequestInfo                                              #|
 )                                                                                                  #|
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage, QWebEngineSettings            #|
-from PyQt5.QtGui import QPalette, QColor, QDesktopServices, QIcon                                  #|
+from PyQt5 import sip                                                                              #|
+from PyQt5.QtGui import QPalette, QColor, QDesktopServices, QIcon, QKeySequence                    #|
 from PyQt5.QtNetwork import QNetworkProxy                                                          #|
-from PyQt5.QtGui import QKeySequence                                                               #|
-from pyqtgraph import PlotWidget, mkPen                                                            #|
-import pyqtgraph as pg                                                                             #|
-from PyQt5.QtCore import QCoreApplication                                                          #|
-import webbrowser                                                                                  #|
-import sys                                                                                         #|
-from PyQt5.QtCore import QUrl                                                                      #|
-from PyQt5.QtWidgets import QApplication, QMainWindow                                              #|
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage                                #|
+from byeblock_probe import (                                                                       #|
+    ProbeEngine, ProxyTarget, SocketSet, PROBE_MODES, PROXY_TYPES, PHASES, read_proxy_list,        #|
+    valid_host                                                                                     #|
+)                                                                                                  #|
+from byeblock_selector import ProxySelector, FailoverConfig, transfer_ms, REFERENCE_BYTES          #|
+from byeblock_schedule import ProbeScheduler, ScheduleConfig                                       #|
+from byeblock_registry import DeferredSettings, ProxyRegistry                                      #|
+from byeblock_rules import RuleSet, RULES_FILE, write_default_rules                                #|
+from byeblock_routing import RouteTable, ROUTES_FILE, write_default_routes                         #|
+from byeblock_memory import process_tree_rss, format_mb                                            #|
+from byeblock_dns import RESOLVER, configure_resolver                                              #|
+from byeblock_netstats import NetworkStats, WINDOWS, INITIATOR_TYPES, error_count                  #|
+from byeblock_render import (                                                                      #|
+    RenderConfig, RenderCost, GPU_MODES, COST_FILE, page_config, chromium_flags,                   #|
+    apply_chromium_flags, active_flags, describe, cost_line, read_costs                            #|
+)                                                                                                  #|
+from concurrent.futures import ThreadPoolExecutor                                                  #|
+# pyqtgraph/numpy, the history database and the asyncio forwarder are imported on first use        #|
+STARTUP_IMPORTED = time.perf_counter()                                                             #|
                                                                                                    #|
 ####################################################################################################|
 ####################################################################################################|
@@ -39,72 +63,478 @@ from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage
 ####################################################################################################|
 #--------------------------------------------------------------------------------------------------#|
 
+log = logging.getLogger("ByeBlock-Discord")
+
+def open_settings(parent):
+    """Open Settings.ini with writes flushed one second after the last change."""
+    timer = QTimer(parent)
+    timer.setSingleShot(True)
+    timer.setInterval(1000)
+    settings = DeferredSettings(QSettings("Settings.ini", QSettings.IniFormat), timer.start)
+    timer.timeout.connect(settings.flush)
+    return settings
+
+def load_failover_config(settings):
+    return FailoverConfig(
+        enabled=settings.value("Failover/Enabled", False, type=bool),
+        max_latency=settings.value("Failover/MaxLatency", 800, type=int),
+        max_loss=settings.value("Failover/MaxLoss", 30, type=int) / 100,
+        hysteresis=settings.value("Failover/Hysteresis", 20, type=int) / 100,
+        min_dwell=settings.value("Failover/MinDwell", 30, type=int),
+    )
+
+def load_throughput_config(settings):
+    from byeblock_throughput import ThroughputConfig, THROUGHPUT_URL
+    return ThroughputConfig(
+        url=settings.value("Throughput/URL", THROUGHPUT_URL),
+        payload=settings.value("Throughput/PayloadMB", 25, type=int) * 1048576,
+        streams=settings.value("Throughput/Streams", 4, type=int),
+        duration=settings.value("Throughput/Seconds", 10, type=int),
+    )
+
+def load_render_config(settings):
+    return RenderConfig(
+        low_resource=settings.value("Render/LowResource", False, type=bool),
+        renderer_limit=settings.value("Render/RendererLimit", 1, type=int),
+        gpu=settings.value("Render/GPU", "software compositing"),
+        reduce_motion=settings.value("Render/ReduceMotion", True, type=bool),
+        block_autoplay=settings.value("Render/BlockAutoplay", True, type=bool),
+        timer_floor=settings.value("Render/TimerFloorMs", 2000, type=int),
+    )
+
+def load_schedule_config(settings):
+    return ScheduleConfig(
+        interval=settings.value("Probe/Interval", 1, type=float),
+        max_interval=settings.value("Probe/MaxInterval", 10, type=float),
+        max_backoff=settings.value("Probe/MaxBackoff", 60, type=float),
+        budget=settings.value("Probe/BudgetPerMinute", 600, type=int),
+    )
+
+def open_web_profile(settings, parent):
+    """Open the persistent web profile: disk cache, cookies and local storage under WebProfile."""
+    root = os.path.abspath(settings.value("Cache/Path", "WebProfile"))
+    profile = QWebEngineProfile("ByeBlock", parent)
+    profile.setPersistentStoragePath(os.path.join(root, "Storage"))
+    profile.setCachePath(os.path.join(root, "Cache"))
+    profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+    profile.setHttpCacheMaximumSize(settings.value("Cache/SizeMB", 512, type=int) * 1048576)
+    profile.setPersistentCookiesPolicy(QWebEngineProfile.ForcePersistentCookies)
+
+    # Chromium keeps 250 resource timings by default, Discord loads more than that
+    script = QWebEngineScript()
+    script.setName("resource-timing-buffer")
+    script.setSourceCode("performance.setResourceTimingBufferSize(10000);")
+    script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+    script.setWorldId(QWebEngineScript.MainWorld)
+    profile.scripts().insert(script)
+
+    # Counts bytes and XHR/fetch status codes for the Network tab
+    script = QWebEngineScript()
+    script.setName("network-stats")
+    script.setSourceCode(NETWORK_JS)
+    script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+    script.setWorldId(QWebEngineScript.MainWorld)
+    profile.scripts().insert(script)
+
+    profile.scripts().insert(render_profile_script(load_render_config(settings)))
+    return profile
+
+def render_source(config):
+    """The page knobs of the rendering profile; the same source updates a loaded page."""
+    return (f"window.__byeblockRender = Object.assign(window.__byeblockRender || {{}}, "
+            f"{json.dumps(page_config(config))});\n" + RENDER_JS)
+
+def render_profile_script(config):
+    script = QWebEngineScript()
+    script.setName("render-profile")
+    script.setSourceCode(render_source(config))
+    script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+    script.setWorldId(QWebEngineScript.MainWorld)
+    return script
+
+ASSET_SCHEME = b"byeblock-asset"
+
+def register_asset_scheme():
+    """Must run before the QApplication is created."""
+    scheme = QWebEngineUrlScheme(ASSET_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.HostAndPort)
+    scheme.setDefaultPort(443)
+    # Served in place of https://discord.com/assets/..., so it must pass the page's CSP and CORS
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.CorsEnabled
+                    | QWebEngineUrlScheme.ContentSecurityPolicyIgnored)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+def open_asset_store(settings):
+    from byeblock_assets import AssetStore
+    return AssetStore(
+        settings.value("Assets/Path", "Assets"),
+        settings.value("Assets/SizeMB", 256, type=int) * 1048576,
+    )
+
+def open_block_rules(settings):
+    paths = settings.value("Block/RulesFiles", [RULES_FILE])
+    if isinstance(paths, str):
+        paths = [paths]
+    if RULES_FILE in paths:
+        write_default_rules(RULES_FILE)
+    return RuleSet(paths)
+
+def open_routes(settings):
+    paths = settings.value("Routing/RulesFiles", [ROUTES_FILE])
+    if isinstance(paths, str):
+        paths = [paths]
+    if ROUTES_FILE in paths:
+        write_default_routes(ROUTES_FILE)
+    return RouteTable(paths)
+
+def application_proxy_url():
+    """The proxy the web view uses, as a URL for requests; None when direct."""
+    proxy = QNetworkProxy.applicationProxy()
+    if proxy.type() == QNetworkProxy.Socks5Proxy:
+        proxy_type = "SOCKS5H" if proxy.capabilities() & QNetworkProxy.HostNameLookupCapability else "SOCKS5"
+    elif proxy.type() == QNetworkProxy.HttpProxy:
+        proxy_type = "HTTP"
+    else:
+        return None
+    return ProxyTarget("", proxy.hostName(), proxy.port(), proxy_type, proxy.user(), proxy.password()).url()
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def configure_probe_engine(engine, settings, mode=None):
+    engine.mode = mode or settings.value("Probe/Mode", "phases")
+    if engine.mode == "gateway":
+        gateway = engine.gateway_probe()
+        gateway.url = settings.value("Probe/GatewayURL", "") or gateway.url
+        gateway.stall_timeout = settings.value("Probe/StallTimeout", gateway.stall_timeout, type=float)
+
+def open_probe_history(settings):
+    from byeblock_history import ProbeHistory
+    return ProbeHistory(
+        raw_hours=settings.value("History/RawHours", 24, type=int),
+        keep_days=settings.value("History/KeepDays", 30, type=int),
+    )
+
 class PingWorker(QThread):
-    ping_signal = pyqtSignal(float)
+    """Probe the stored proxies for everyone who needs the results.
+
+    The main window (failover, balancing) and the ping graph share one
+    worker, so every proxy is probed and written to the history once.
+    It runs while at least one of them is attached.
+    """
 
-    def __init__(self, get_proxy_info):
+    sweep_signal = pyqtSignal(list)
+
+    def __init__(self, get_proxies, history=None):
         super().__init__()
-        self.get_proxy_info = get_proxy_info
+        self.get_proxies = get_proxies
+        self.history = history
+        self.engine = ProbeEngine()
+        self.scheduler = ProbeScheduler()
         self.running = False
+        # user: callable returning the proxy_info that user wants probed at the base interval
+        self.users = {}
+
+    def attach(self, user, get_proxy_info):
+        self.users[user] = get_proxy_info
+        if not self.running:
+            self.running = True
+            self.start()
+
+    def detach(self, user):
+        self.users.pop(user, None)
+        if not self.users:
+            self.shutdown()
+
+    def shutdown(self):
+        self.users.clear()
+        if self.running:
+            self.stop()
+            self.wait()
 
     def run(self):
-        while self.running:
-            ping = self.ping_site()
-            self.ping_signal.emit(ping)
-            time.sleep(1)
+        # Each proxy is probed when the scheduler says it is due, and every batch of
+        # finished probes is emitted as soon as it is in
+        self.engine.reset()
+        pending = {}
+        try:
+            while self.running:
+                self.submit_due(pending)
+                done = self.engine.wait_any(pending, self.scheduler.next_wakeup())
+                if not self.running:
+                    break
+                results = [future.result() for future in done]
+                for future in done:
+                    del pending[future]
+                for result in results:
+                    self.scheduler.done(result)
+                if not results:
+                    continue
+                if self.history is not None:
+                    self.history.append(results)
+                self.sweep_signal.emit(results)
+        finally:
+            for future in pending:
+                future.cancel()
+            # The cut short probes never report done(), so after a restart they would never be due again
+            self.scheduler.reset()
+
+    def submit_due(self, pending):
+        proxies = {target.name: target for target in self.get_proxies()}
+        self.engine.prefetch(proxies.values())
+        self.engine.forget_missing(proxies.values())
+        self.scheduler.forget_missing(proxies)
+        pinned = set()
+        for get_proxy_info in list(self.users.values()):
+            proxy_info = get_proxy_info()
+            if proxy_info:
+                pinned.add(proxy_info['name'])
+        self.scheduler.pinned = pinned
+        for name in self.scheduler.due(proxies):
+            pending[self.engine.submit(proxies[name])] = name
+
+    def stop(self):
+        """Stop after the current sweep, cutting its open probes short."""
+        self.running = False
+        self.engine.cancel()
 
-    def ping_site(self):
-        proxy_info = self.get_proxy_info()
-        if not proxy_info:
-            return 0
-        
-        proxies = {
-            "http": f"http://{proxy_info['host']}:{proxy_info['port']}",
-            "https": f"http://{proxy_info['host']}:{proxy_info['port']}"
-        }
+GRAPH_WINDOWS = {"1 min": 60, "10 min": 600, "1 hour": 3600, "8 hours": 8 * 3600}
+# The stored history summed up under the graph, beyond what the graph itself holds
+HISTORY_SUMMARY_DAYS = 7
+
+class ImportWorker(QThread):
+    result_signal = pyqtSignal(object, object)
+    done_signal = pyqtSignal(list)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.running = False
+        self.error = None
 
+    def run(self):
+        engine = ProbeEngine()
+        alive = []
         try:
-            start_time = time.time()
-            response = requests.get("https://discord.com/app", proxies=proxies, timeout=5)
-            response.raise_for_status()
-            return (time.time() - start_time) * 1000
-        except (requests.exceptions.RequestException, requests.exceptions.Timeout):
-            return 0
+            with open(self.path, encoding="utf-8", errors="replace") as file:
+                for target, result in engine.stream(read_proxy_list(file)):
+                    if not self.running:
+                        break
+                    if result.ok:
+                        alive.append(target)
+                    self.result_signal.emit(target, result)
+        except Exception as e:
+            # The proxies found so far are still added, the label says why it stopped
+            self.error = e
+        finally:
+            engine.close()
+            self.done_signal.emit(alive)
+
+class ThroughputWorker(QThread):
+    result_signal = pyqtSignal(object)
+    done_signal = pyqtSignal(list)
+
+    def __init__(self, targets, config):
+        super().__init__()
+        self.targets = targets
+        self.config = config
+        self.sockets = SocketSet()
+        self.stopped = threading.Event()
+        self.running = False
+
+    def run(self):
+        from byeblock_throughput import measure_throughput
+
+        # One proxy at a time, so they do not compete for the local link
+        results = []
+        config = self.config
+        for target in self.targets:
+            if not self.running:
+                break
+            result = measure_throughput(target, config.url, config.payload, config.streams, config.duration,
+                                        sockets=self.sockets, stop=self.stopped)
+            if not self.running:
+                break
+            results.append(result)
+            self.result_signal.emit(result)
+        self.done_signal.emit(results)
+
+    def stop(self):
+        self.running = False
+        self.stopped.set()
+        self.sockets.shutdown()
 
 class ProxyPingGraph(QWidget):
-    def __init__(self, get_proxy_info):
+    def __init__(self, get_proxy_info, get_proxies, history_hours=8, history=None, max_fps=2, worker=None):
         super().__init__()
         self.get_proxy_info = get_proxy_info
-        
-        self.graphWidget = PlotWidget()
+        self.get_proxies = get_proxies
+        self.history = history
+
+        # pyqtgraph and numpy cost about half a second, so they load with the first graph
+        import pyqtgraph as pg
+        from byeblock_series import RingSeries, DECIMATE_MODES
+
+        self.graphWidget = pg.PlotWidget(axisItems={"bottom": pg.DateAxisItem()})
         layout = QVBoxLayout()
         layout.addWidget(self.graphWidget)
+
+        self.window_combobox = QComboBox()
+        self.window_combobox.addItems(GRAPH_WINDOWS)
+        self.window_combobox.currentTextChanged.connect(self.redraw)
+        layout.addWidget(self.window_combobox)
+
+        self.decimate_combobox = QComboBox()
+        self.decimate_combobox.addItems(DECIMATE_MODES)
+        self.decimate_combobox.currentTextChanged.connect(self.redraw)
+        layout.addWidget(self.decimate_combobox)
+
+        self.stats_label = QLabel("p50: - p95: - p99: - loss: -")
+        layout.addWidget(self.stats_label)
+        self.history_label = QLabel("")
+        layout.addWidget(self.history_label)
         self.setLayout(layout)
 
         self.graphWidget.setBackground('#202020')
         self.graphWidget.showGrid(x=False, y=False)
         self.graphWidget.setTitle("Proxy Ping", color="w", size="15pt")
-
-        self.x = list(range(50))
-        self.y = [0] * 50
-
-        self.data_line = self.graphWidget.plot(self.x, self.y, pen=pg.mkPen(color="r", width=3))
-
-        self.worker = PingWorker(self.get_proxy_info)
-        self.worker.ping_signal.connect(self.update_plot_data)
+        self.graphWidget.addLegend()
+
+        # One sample per second, column 0 is the total and the rest are the phases
+        # Graph/HistoryHours=0 still keeps the latest sample
+        self.series = RingSeries(max(1, history_hours * 3600), ("total",) + PHASES)
+
+        # Phase lines from connect on are stacked, so each one shows the time spent up to the
+        # end of that phase. DNS is not part of the ping and is drawn on its own.
+        self.phase_lines = {}
+        for phase, color in zip(PHASES, ["#4FC3F7", "#81C784", "#FFD54F", "#BA68C8", "#FF8A65"]):
+            self.phase_lines[phase] = self.graphWidget.plot(
+                pen=pg.mkPen(color=color, width=1), name=phase, connect="finite")
+
+        self.data_line = self.graphWidget.plot(
+            pen=pg.mkPen(color="r", width=3), name="total", connect="finite")
+
+        # The main window passes its worker, so the proxies are not probed twice
+        self.worker = worker if worker is not None else PingWorker(self.get_proxies, self.history)
+        self.worker.sweep_signal.connect(self.on_sweep)
+        self.released = False
+
+        # Samples only mark the graph dirty; it is repainted at most max_fps times
+        # a second and only while it is on screen
+        self.dirty = False
+        self.render_timer = QTimer(self)
+        self.render_timer.setInterval(int(1000 / max(1, max_fps)))
+        self.render_timer.timeout.connect(self.render)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.render_timer.start()
+        self.render()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.render_timer.stop()
+
+    def is_exposed(self):
+        # A minimized or fully covered window is not exposed on most platforms
+        handle = self.window().windowHandle()
+        return (self.isVisible() and not self.visibleRegion().isEmpty()
+                and (handle is None or handle.isExposed()))
+
+    def render(self):
+        if self.dirty and self.is_exposed():
+            self.redraw()
+
+    def load_history(self):
+        """Refill the graph with the stored samples of the selected proxy."""
+        self.series.clear()
+        self.history_label.setText("")
+        proxy_info = self.get_proxy_info()
+        if self.history is None or not proxy_info:
+            self.redraw()
+            return
+        start = time.time() - self.series.capacity
+        for result in self.history.results(proxy_info['name'], start):
+            self.series.append(self.sample_row(result.ms, result.phases), result.timestamp)
+        self.show_history_summary(proxy_info['name'])
+        self.redraw()
+
+    def show_history_summary(self, name):
+        stats = self.history.aggregate(time.time() - HISTORY_SUMMARY_DAYS * 86400).get(name)
+        if not stats:
+            return
+        if stats["avg_ms"] is None:
+            self.history_label.setText(
+                f"Last {HISTORY_SUMMARY_DAYS} days: no answer in {stats['samples']} probes")
+            return
+        self.history_label.setText(
+            f"Last {HISTORY_SUMMARY_DAYS} days: avg {stats['avg_ms']:.0f}ms min {stats['min_ms']:.0f}ms "
+            f"max {stats['max_ms']:.0f}ms loss: {stats['loss']:.0%} ({stats['samples']} probes)")
 
     def start_ping(self):
-        self.worker.running = True
-        self.worker.start()
+        self.worker.attach(self, self.get_proxy_info)
 
     def stop_ping(self):
-        self.worker.running = False
-        self.worker.quit()
-        self.worker.wait()
+        self.worker.detach(self)
 
-    def update_plot_data(self, ping):
-        self.y = self.y[1:] + [ping]
-        self.data_line.setData(self.x, self.y)
+    def release(self):
+        """Detach from the worker for good; False if that was done already."""
+        if self.released:
+            return False
+        self.released = True
+        self.stop_ping()
+        self.worker.sweep_signal.disconnect(self.on_sweep)
+        return True
+
+    def on_sweep(self, results):
+        proxy_info = self.get_proxy_info()
+        if self not in self.worker.users or not proxy_info:
+            return
+        for result in results:
+            if result.proxy == proxy_info['name']:
+                self.update_plot_data(result.ms if result.ok else float("nan"), result.phases)
+
+    def update_plot_data(self, ping, phases):
+        self.series.append(self.sample_row(ping, phases))
+        self.dirty = True
+
+    def sample_row(self, ping, phases):
+        row = [float("nan") if ping is None else ping]
+        stacked = 0
+        for phase in PHASES:
+            if phase not in phases:
+                row.append(float("nan"))
+            elif phase == "dns":
+                row.append(phases[phase])
+            else:
+                stacked += phases[phase]
+                row.append(stacked)
+        return row
+
+    def redraw(self):
+        from byeblock_series import decimate
+
+        self.dirty = False
+        seconds = GRAPH_WINDOWS[self.window_combobox.currentText()]
+        times, values = self.series.window(seconds)
+        max_points = max(100, self.graphWidget.width())
+        times, values = decimate(times, values, max_points, self.decimate_combobox.currentText())
+        self.data_line.setData(times, values[:, 0])
+        for column, phase in enumerate(PHASES, 1):
+            self.phase_lines[phase].setData(times, values[:, column])
+
+        stats = self.series.stats(seconds)
+        if stats["samples"]:
+            self.stats_label.setText(
+                f"p50: {stats['p50']:.0f}ms p95: {stats['p95']:.0f}ms "
+                f"p99: {stats['p99']:.0f}ms loss: {stats['loss']:.0%}")
 
 class DiscordBrowser(QMainWindow):
     def capture_screen(self):
@@ -120,9 +550,14 @@ class DiscordBrowser(QMainWindow):
 
     def __init__(self, app):
         super().__init__()
-        self.settings = QSettings("Settings.ini", QSettings.IniFormat)
+        self.settings = open_settings(self)
         self.settings.setFallbacksEnabled(False)
+        self.registry = ProxyRegistry(self.settings)
+        # Proxy host names are looked up in the background while the window comes up
+        configure_resolver(self.settings)
+        RESOLVER.prefetch(target.host for target in self.registry.all())
         self.app = app
+        self.app.aboutToQuit.connect(self.settings.flush)
 
         # Set window icon
         self.setWindowIcon(QIcon("app.ico"))
@@ -130,6 +565,15 @@ class DiscordBrowser(QMainWindow):
         if self.settings.value("proxy/connect_automatically", False, type=bool):
             self.apply_proxy_from_settings()
 
+        self.targets = {}
+        self.history = None
+        self.selector = ProxySelector()
+        self.probe_worker = None
+        self.forwarder = None
+        self.balancing = False
+        self.routes = None
+        self.load_connection_settings()
+
         self.initUI()
         self.microphone_enabled = self.settings.value("Access/Microphone", False, type=bool)
         self.camera_enabled = self.settings.value("Access/Camera", False, type=bool)
@@ -166,6 +610,7 @@ class DiscordBrowser(QMainWindow):
 
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.show()
+        self.residency = TrayResidency(self)
 
 
     def exit_app(self):
@@ -227,7 +672,26 @@ class DiscordBrowser(QMainWindow):
         self.resize(width, height)
 
         self.view = QWebEngineView()
-        self.view.setPage(WebEnginePage(self))
+        # The profile is owned by the application so it outlives the page on exit
+        self.profile = open_web_profile(self.settings, self.app)
+        self.assets = None
+        if self.settings.value("Assets/Enabled", False, type=bool):
+            self.assets = open_asset_store(self.settings)
+            self.asset_handler = AssetSchemeHandler(self.assets, self.app)
+            self.profile.installUrlSchemeHandler(ASSET_SCHEME, self.asset_handler)
+        self.block_rules = None
+        if self.settings.value("Block/Enabled", False, type=bool):
+            self.block_rules = open_block_rules(self.settings)
+        self.network = NetworkMonitor(self)
+        self.interceptor = RequestInterceptor(self.block_rules, self.assets, self.network.stats, self.app)
+        self.profile.setUrlRequestInterceptor(self.interceptor)
+        # Rule files are picked up again as soon as they are saved
+        self.rules_timer = QTimer(self)
+        self.rules_timer.timeout.connect(self.reload_rule_files)
+        self.rules_timer.start(2000)
+        self.view.setPage(WebEnginePage(self.profile, self))
+        self.cache_stats = CacheStats(self)
+        self.page_timing = PageLoadTiming(self)
         self.view.load(QUrl('https://discord.com/app'))
 
         settings = self.view.settings()
@@ -235,6 +699,7 @@ class DiscordBrowser(QMainWindow):
         settings.setAttribute(QWebEngineSettings.JavascriptEnabled, True)
         settings.setAttribute(QWebEngineSettings.JavascriptCanOpenWindows, True)
         settings.setAttribute(QWebEngineSettings.LocalContentCanAccessRemoteUrls, True)
+        self.render = RenderMonitor(self)
 
         # Developer tools shortcut
         dev_tools_action = QAction(self)
@@ -249,6 +714,7 @@ class DiscordBrowser(QMainWindow):
 
     def tray_icon_activated(self, reason):
         if reason == QSystemTrayIcon.Trigger:
+            self.residency.shown()
             self.show()
             self.activateWindow()
 
@@ -258,9 +724,14 @@ class DiscordBrowser(QMainWindow):
             self.worker.wait()  # Ждем завершения потока
         event.ignore()  # Игнорируем стандартное закрытие
         self.hide()      # Скрываем окно
+        self.residency.hidden()
 
 
     def exit_app(self):
+        if self.probe_worker is not None:
+            self.probe_worker.shutdown()
+        self.stop_forwarder()
+        self.settings.flush()
         self.tray_icon.hide()  # Hide the tray icon
         self.close()  # Close the application
 
@@ -301,17 +772,234 @@ class DiscordBrowser(QMainWindow):
         all_action.triggered.connect(self.open_all_settings)
         settings_menu.addAction(all_action)
 
+        cache_action = QAction('Cache Stats', self)
+        cache_action.triggered.connect(self.show_cache_stats)
+        settings_menu.addAction(cache_action)
+
+        page_load_action = QAction('Page Load Times', self)
+        page_load_action.triggered.connect(self.show_page_load_times)
+        settings_menu.addAction(page_load_action)
+
+        blocked_action = QAction('Blocked Requests', self)
+        blocked_action.triggered.connect(self.show_blocked_requests)
+        settings_menu.addAction(blocked_action)
+
+        render_action = QAction('Render Cost', self)
+        render_action.triggered.connect(self.show_render_cost)
+        settings_menu.addAction(render_action)
+
+        clear_cache_action = QAction('Clear Cache', self)
+        clear_cache_action.triggered.connect(self.profile.clearHttpCache)
+        settings_menu.addAction(clear_cache_action)
+
         telegram_action = QAction('Telegram Support', self)
         telegram_action.triggered.connect(self.open_telegram)
         help_menu.addAction(telegram_action)
 
+    def show_cache_stats(self):
+        QMessageBox.information(self, "Cache Stats", self.cache_stats.report())
+
+    def show_page_load_times(self):
+        QMessageBox.information(self, "Page Load Times", self.page_timing.report())
+
+    def show_render_cost(self):
+        QMessageBox.information(self, "Render Cost", self.render.report())
+
+    def reload_rule_files(self):
+        if self.block_rules is not None:
+            self.block_rules.reload_if_changed()
+        if self.routes is not None:
+            self.routes.reload_if_changed()
+
+    def load_block_settings(self):
+        if not self.settings.value("Block/Enabled", False, type=bool):
+            self.block_rules = None
+        elif self.block_rules is None:
+            self.block_rules = open_block_rules(self.settings)
+        self.interceptor.rules = self.block_rules
+
+    def show_blocked_requests(self):
+        if self.block_rules is None:
+            QMessageBox.information(self, "Blocked Requests", "Request blocking is off.")
+            return
+        requests_seen, blocked, counts = self.block_rules.stats()
+        share = blocked / requests_seen if requests_seen else 0
+        lines = [f"{blocked} of {requests_seen} requests blocked ({share:.0%})",
+                 f"{len(self.block_rules.matcher.rules)} rules from: " + ", ".join(self.block_rules.paths), ""]
+        lines += [f"{hits:6d}  {rule}" for rule, hits in counts[:25]]
+        QMessageBox.information(self, "Blocked Requests", "\n".join(lines))
+
+    def load_cache_settings(self):
+        self.profile.setHttpCacheMaximumSize(self.settings.value("Cache/SizeMB", 512, type=int) * 1048576)
+        if self.assets is not None:
+            self.assets.max_bytes = self.settings.value("Assets/SizeMB", 256, type=int) * 1048576
+
     def open_telegram(self):
         QDesktopServices.openUrl(QUrl("https://t.me/Mazkalawzey"))
 
     def open_all_settings(self):
-        self.proxy_app = ProxyApp()
+        self.proxy_app = ProxyApp(self.probe_history(), self.forwarder, self.registry, self.network.stats,
+                                  self.ping_worker())
+        self.proxy_app.settings_saved.connect(self.load_connection_settings)
+        self.proxy_app.settings_saved.connect(self.load_cache_settings)
+        self.proxy_app.settings_saved.connect(self.load_block_settings)
+        self.proxy_app.settings_saved.connect(self.render.reload)
+        self.proxy_app.throughput_measured.connect(self.on_throughput)
         self.proxy_app.show()
 
+    def on_throughput(self, results):
+        for result in results:
+            if result.ok:
+                self.selector.set_bandwidth(result.proxy, result.sustained)
+
+    def probe_history(self):
+        if self.history is None:
+            self.history = open_probe_history(self.settings)
+        return self.history
+
+    def ping_worker(self):
+        """The one PingWorker of the app, shared with the graph of the settings window."""
+        if self.probe_worker is None:
+            self.probe_worker = PingWorker(self.get_proxies, self.probe_history())
+            self.probe_worker.scheduler.config = load_schedule_config(self.settings)
+            configure_probe_engine(self.probe_worker.engine, self.settings)
+            self.probe_worker.sweep_signal.connect(self.on_proxy_sweep)
+        return self.probe_worker
+
+    def load_connection_settings(self):
+        self.selector.config = load_failover_config(self.settings)
+        if self.probe_worker is not None:
+            self.probe_worker.scheduler.config = load_schedule_config(self.settings)
+        balance = self.settings.value("Forwarder/Enabled", False, type=bool)
+        split = self.settings.value("Routing/Enabled", False, type=bool)
+        if not split:
+            self.routes = None
+        elif self.routes is None:
+            self.routes = open_routes(self.settings)
+        self.balancing = balance
+        if balance or split:
+            self.start_forwarder()
+            self.forwarder.routes = self.routes
+            # Split routing alone tunnels through the one configured proxy
+            self.forwarder.set_upstreams(self.get_proxies() if balance else self.configured_upstreams())
+        else:
+            self.stop_forwarder()
+        if self.selector.config.enabled or balance:
+            self.start_probing()
+        else:
+            self.stop_probing()
+        if getattr(self, "proxy_app", None) is not None:
+            self.proxy_app.forwarder = self.forwarder
+
+    def start_forwarder(self):
+        if self.forwarder is not None:
+            return
+        from byeblock_forwarder import LocalForwarder
+
+        self.forwarder = LocalForwarder(pool_size=self.settings.value("Forwarder/PoolSize", 2, type=int))
+        port = self.forwarder.start()
+        self.apply_proxy("HTTP", "127.0.0.1", port)
+        if hasattr(self, "view"):
+            self.view.reload()
+
+    def stop_forwarder(self):
+        if self.forwarder is None:
+            return
+        self.forwarder.stop()
+        self.forwarder = None
+        QNetworkProxy.setApplicationProxy(QNetworkProxy(QNetworkProxy.NoProxy))
+        self.apply_proxy_from_settings()
+        if hasattr(self, "view"):
+            self.view.reload()
+
+    def configured_upstreams(self):
+        """The proxy saved in the proxy/* keys, as a list for set_upstreams."""
+        proxy_type = self.settings.value("proxy/type", "")
+        host = self.settings.value("proxy/host", "")
+        port = self.settings.value("proxy/port", 0, type=int)
+        if not (proxy_type and host and port):
+            return []
+        return [ProxyTarget(self.settings.value("proxy/name", "") or host, host, port, proxy_type,
+                            self.settings.value("proxy/user", ""), self.settings.value("proxy/password", ""))]
+
+    def start_probing(self):
+        worker = self.ping_worker()
+        if self in worker.users:
+            return
+        self.selector.active = self.active_proxy_name()
+        # Start ranking from what the last session measured
+        history = self.probe_history()
+        names = [target.name for target in self.get_proxies()]
+        self.selector.add_all(history.recent(10 * 60, names))
+        for name, (sustained, _) in history.latest_throughput(names).items():
+            self.selector.set_bandwidth(name, sustained)
+        worker.attach(self, self.get_active_proxy_info)
+
+    def stop_probing(self):
+        if self.probe_worker is not None:
+            self.probe_worker.detach(self)
+
+    def get_proxies(self):
+        self.targets = {target.name: target for target in self.registry.all()}
+        return list(self.targets.values())
+
+    def active_proxy_name(self):
+        host = self.settings.value("proxy/host", "")
+        port = self.settings.value("proxy/port", 0, type=int)
+        target = self.registry.find(host, port)
+        return target.name if target else None
+
+    def proxy_label(self):
+        """Name page loads are filed under: the proxy in use, "balanced" or "direct"."""
+        if self.forwarder is not None:
+            if self.balancing:
+                return "balanced"
+            upstreams = self.configured_upstreams()
+            return upstreams[0].name if upstreams else "direct"
+        proxy = QNetworkProxy.applicationProxy()
+        if proxy.type() == QNetworkProxy.NoProxy:
+            return "direct"
+        target = self.registry.find(proxy.hostName(), proxy.port())
+        return target.name if target else f"{proxy.hostName()}:{proxy.port()}"
+
+    def get_active_proxy_info(self):
+        target = self.targets.get(self.selector.active)
+        if target is None:
+            return None
+        return {"name": target.name, "host": target.host, "port": target.port}
+
+    def on_proxy_sweep(self, results):
+        # The worker may be running for the graph alone
+        if self not in self.probe_worker.users:
+            return
+        self.selector.forget_missing(self.targets)
+        self.selector.add_all(results)
+        if self.balancing:
+            healthy = [self.targets[name] for name, _ in self.selector.ranking()
+                       if name in self.targets and self.selector.is_healthy(name)]
+            self.forwarder.set_upstreams(healthy or self.targets.values())
+            return
+        if not self.selector.config.enabled:
+            return
+        name = self.selector.choose()
+        target = self.targets.get(name)
+        if target is None:
+            return
+        self.settings.setValue("proxy/name", target.name)
+        self.settings.setValue("proxy/type", target.type)
+        self.settings.setValue("proxy/host", target.host)
+        self.settings.setValue("proxy/port", target.port)
+        self.settings.setValue("proxy/user", target.user)
+        self.settings.setValue("proxy/password", target.password)
+        if self.forwarder is not None:
+            # Split routing: the web view keeps talking to the forwarder
+            self.forwarder.set_upstreams([target])
+        else:
+            self.apply_proxy(target.type, target.host, target.port, target.user, target.password)
+            # Connections that are already open keep the old proxy, reload to move them over
+            self.view.reload()
+        self.tray_icon.showMessage("ByeBlock Discord", f"Switched to proxy {target.name}")
+
     def show_proxy_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Proxy Settings")
@@ -325,7 +1013,8 @@ class DiscordBrowser(QMainWindow):
         proxy_type_label = QLabel("Proxy Type:")
         layout.addWidget(proxy_type_label)
         proxy_type_combobox = QComboBox()
-        proxy_type_combobox.addItems(["HTTP", "SOCKS5"])
+        # SOCKS5 gets the target's address from us, SOCKS5H resolves the name itself
+        proxy_type_combobox.addItems(PROXY_TYPES)
         layout.addWidget(proxy_type_combobox)
 
         proxy_host_label = QLabel("Proxy Host:")
@@ -362,26 +1051,40 @@ class DiscordBrowser(QMainWindow):
             self.settings.setValue("proxy/port", proxy_port)
             self.settings.setValue("proxy/connect_automatically", connect_automatically)
 
-            self.apply_proxy(proxy_type, proxy_host, proxy_port)
+            if self.forwarder is None:
+                self.apply_proxy(proxy_type, proxy_host, proxy_port)
+            elif not self.balancing:
+                self.forwarder.set_upstreams(self.configured_upstreams())
 
-    def apply_proxy(self, proxy_type, host, port):
+    def apply_proxy(self, proxy_type, host, port, user="", password=""):
         proxy = QNetworkProxy()
         if proxy_type == "HTTP":
             proxy.setType(QNetworkProxy.HttpProxy)
-        elif proxy_type == "SOCKS5":
+        elif proxy_type in ("SOCKS5", "SOCKS5H"):
             proxy.setType(QNetworkProxy.Socks5Proxy)
+            # Qt's own sockets follow this; Chromium always lets a SOCKS5 proxy resolve, so
+            # for the web view the difference only holds through the local forwarder
+            if proxy_type == "SOCKS5":
+                proxy.setCapabilities(proxy.capabilities() & ~QNetworkProxy.HostNameLookupCapability)
+            else:
+                proxy.setCapabilities(proxy.capabilities() | QNetworkProxy.HostNameLookupCapability)
 
         proxy.setHostName(host)
         proxy.setPort(port)
+        if user:
+            proxy.setUser(user)
+            proxy.setPassword(password)
         QNetworkProxy.setApplicationProxy(proxy)
 
     def apply_proxy_from_settings(self):
         proxy_type = self.settings.value("proxy/type", "")
         proxy_host = self.settings.value("proxy/host", "")
         proxy_port = self.settings.value("proxy/port", 0, type=int)
+        proxy_user = self.settings.value("proxy/user", "")
+        proxy_password = self.settings.value("proxy/password", "")
 
         if proxy_type and proxy_host and proxy_port:
-            self.apply_proxy(proxy_type, proxy_host, proxy_port)
+            self.apply_proxy(proxy_type, proxy_host, proxy_port, proxy_user, proxy_password)
 
     def show_resolution_dialog(self):
         dialog = QDialog(self)
@@ -424,12 +1127,684 @@ class DiscordBrowser(QMainWindow):
         self.resize(width, height)
 
     def check_access(self):
+        denied = []
         if not self.microphone_enabled:
-            QMessageBox.warning(self, "Access Denied", "Microphone access is denied.")
+            denied.append("Microphone access is denied.")
         if not self.camera_enabled:
-            QMessageBox.warning(self, "Access Denied", "Camera access is denied.")
+            denied.append("Camera access is denied.")
         if not self.screen_share_enabled:
-            QMessageBox.warning(self, "Access Denied", "Screen sharing access is denied.")
+            denied.append("Screen sharing access is denied.")
+        if not denied:
+            return
+        # One non-modal box, so startup and page loading are not held up waiting for OK
+        self.access_box = QMessageBox(QMessageBox.Warning, "Access Denied", "\n".join(denied),
+                                      QMessageBox.Ok, self)
+        self.access_box.setModal(False)
+        self.access_box.show()
+
+class StartupTiming:
+    """Measure launch latency for --startup-timing runs.
+
+    Prints one JSON line with the import time, the time until the main
+    window is shown and the time until discord.com finished loading, adds
+    it to StartupTiming.jsonl and quits.
+    """
+
+    def __init__(self, app, browser):
+        self.app = app
+        self.timings = {"import_ms": (STARTUP_IMPORTED - STARTUP_BEGIN) * 1000}
+        browser.view.loadFinished.connect(self.load_finished)
+        # Runs on the first pass of the event loop, right after the window is shown
+        QTimer.singleShot(0, self.window_shown)
+
+    def elapsed(self):
+        return (time.perf_counter() - STARTUP_BEGIN) * 1000
+
+    def window_shown(self):
+        self.timings["window_ms"] = self.elapsed()
+
+    def load_finished(self, ok):
+        self.timings["load_finished_ms"] = self.elapsed()
+        self.timings["load_ok"] = ok
+        self.timings["time"] = time.time()
+        line = json.dumps(self.timings)
+        print(line, flush=True)
+        with open("StartupTiming.jsonl", "a") as file:
+            file.write(line + "\n")
+        self.app.quit()
+
+class TrayResidency:
+    """Freeze the Discord page while the window sits in the tray.
+
+    After Tray/SuspendAfter seconds hidden the page is frozen, so its
+    renderer stops running scripts and timers. With Tray/DiscardAboveMB
+    set, a frozen page is discarded once the app and its renderer use
+    more than that, which frees the renderer memory at the price of a
+    reload on restore. RSS before and after is printed and shown in the
+    tray tooltip.
+    """
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.settings = browser.settings
+        self.suspend_timer = QTimer(browser)
+        self.suspend_timer.setSingleShot(True)
+        self.suspend_timer.timeout.connect(self.suspend)
+        self.budget_timer = QTimer(browser)
+        self.budget_timer.setInterval(30000)
+        self.budget_timer.timeout.connect(self.check_budget)
+        self.rss_before = None
+        self.report = ""
+
+    def page(self):
+        return self.browser.view.page()
+
+    def hidden(self):
+        delay = self.settings.value("Tray/SuspendAfter", 60, type=int)
+        if delay > 0:
+            self.suspend_timer.start(delay * 1000)
+
+    def shown(self):
+        self.suspend_timer.stop()
+        self.budget_timer.stop()
+        page = self.page()
+        if page.lifecycleState() != QWebEnginePage.Active:
+            state = "discarded" if page.lifecycleState() == QWebEnginePage.Discarded else "frozen"
+            page.setLifecycleState(QWebEnginePage.Active)
+            self.log(f"restored from {state}, RSS {format_mb(process_tree_rss())}")
+
+    def suspend(self):
+        page = self.page()
+        if self.browser.isVisible() or page.lifecycleState() != QWebEnginePage.Active:
+            return
+        if page.recommendedState() == QWebEnginePage.Active:
+            # Audio is playing (a voice call) or dev tools are open, look again later
+            self.suspend_timer.start()
+            return
+        self.rss_before = process_tree_rss()
+        page.setLifecycleState(QWebEnginePage.Frozen)
+        # Chromium gives memory back gradually, so measure a little later
+        QTimer.singleShot(5000, lambda: self.report_savings("frozen"))
+        self.budget_timer.start()
+        self.check_budget()
+
+    def check_budget(self):
+        page = self.page()
+        budget = self.settings.value("Tray/DiscardAboveMB", 0, type=int)
+        if not budget or page.lifecycleState() != QWebEnginePage.Frozen:
+            return
+        rss = process_tree_rss()
+        if rss is None or rss <= budget * 1048576:
+            return
+        self.budget_timer.stop()
+        page.setLifecycleState(QWebEnginePage.Discarded)
+        QTimer.singleShot(5000, lambda: self.report_savings("discarded"))
+
+    def report_savings(self, state):
+        if self.browser.isVisible():
+            return
+        self.log(f"{state}, RSS {format_mb(self.rss_before)} -> {format_mb(process_tree_rss())}")
+
+    def log(self, text):
+        self.report = text
+        self.browser.tray_icon.setToolTip(f"ByeBlock Discord ({text})")
+
+# Counts every navigation/resource timing entry of the page: a transfer of 0 bytes with a
+# body came from the HTTP cache. Cross-origin entries without Timing-Allow-Origin report
+# no sizes at all and are counted as unknown.
+CACHE_STATS_JS = """
+(() => {
+    const entries = performance.getEntriesByType("navigation").concat(performance.getEntriesByType("resource"));
+    let hits = 0, misses = 0, unknown = 0, network = 0, disk = 0;
+    for (const entry of entries) {
+        if (entry.transferSize > 0) {
+            misses++;
+            network += entry.transferSize;
+        } else if (entry.decodedBodySize > 0) {
+            hits++;
+            disk += entry.decodedBodySize;
+        } else {
+            unknown++;
+        }
+    }
+    return [hits, misses, unknown, network, disk];
+})()
+"""
+CACHE_STATS_DELAY = 15000
+
+class CacheStats:
+    """Cache hit/miss counts of the page loads since startup.
+
+    The counts are read from the page some seconds after each load
+    finished, when Discord has fetched its bundles.
+    """
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.loads = 0
+        self.hits = 0
+        self.misses = 0
+        self.unknown = 0
+        self.network_bytes = 0
+        self.disk_bytes = 0
+        self.last = None
+        browser.view.loadFinished.connect(self.load_finished)
+
+    def load_finished(self, ok):
+        if ok:
+            QTimer.singleShot(CACHE_STATS_DELAY, self.collect)
+
+    def collect(self):
+        self.browser.view.page().runJavaScript(CACHE_STATS_JS, self.collected)
+
+    def collected(self, counts):
+        if not counts:
+            return
+        hits, misses, unknown, network, disk = (int(count) for count in counts)
+        self.loads += 1
+        self.hits += hits
+        self.misses += misses
+        self.unknown += unknown
+        self.network_bytes += network
+        self.disk_bytes += disk
+        self.last = (hits, misses, unknown, network, disk)
+
+    def describe(self, hits, misses, unknown, network, disk):
+        rate = hits / (hits + misses) if hits + misses else 0
+        return (f"{hits} hits, {misses} misses ({rate:.0%} from disk), {unknown} unknown, "
+                f"{network / 1048576:.1f} MB from network, {disk / 1048576:.1f} MB from disk")
+
+    def report(self):
+        profile = self.browser.profile
+        lines = [f"Disk cache: {directory_size(profile.cachePath()) / 1048576:.0f} MB "
+                 f"of {profile.httpCacheMaximumSize() / 1048576:.0f} MB"]
+        if self.last is not None:
+            lines.append(f"Last load: {self.describe(*self.last)}")
+            lines.append(f"All {self.loads} loads: " + self.describe(
+                self.hits, self.misses, self.unknown, self.network_bytes, self.disk_bytes))
+        else:
+            lines.append("No page load measured yet.")
+        if self.browser.assets is not None:
+            stats = self.browser.assets.stats()
+            lines.append(
+                f"Asset store: {stats['files']} files, {stats['bytes'] / 1048576:.0f} MB "
+                f"of {stats['max_bytes'] / 1048576:.0f} MB")
+            lines.append(
+                f"This session: {stats['hits']} served locally, {stats['misses']} fetched, "
+                f"{stats['saved_bytes'] / 1048576:.1f} MB saved over the proxy")
+            handler = self.browser.asset_handler
+            if handler.failures:
+                lines.append(f"{handler.failures} fetches failed, the last one: {handler.last_failure}")
+        return "\n".join(lines)
+
+# Navigation Timing of the document and a summary of its resources, all in ms from the
+# start of the navigation. Through a proxy, dns and connect are those of the proxy.
+PAGE_TIMING_JS = """
+(() => {
+    const nav = performance.getEntriesByType("navigation")[0];
+    if (!nav) return null;
+    const resources = performance.getEntriesByType("resource");
+    let bytes = nav.transferSize || 0, end = 0;
+    for (const entry of resources) {
+        bytes += entry.transferSize || 0;
+        end = Math.max(end, entry.responseEnd);
+    }
+    return {
+        dns: nav.domainLookupEnd - nav.domainLookupStart,
+        connect: nav.connectEnd - nav.connectStart,
+        tls: nav.secureConnectionStart > 0 ? nav.connectEnd - nav.secureConnectionStart : 0,
+        ttfb: nav.responseStart - nav.requestStart,
+        dom_ms: nav.domContentLoadedEventEnd,
+        onload_ms: nav.loadEventEnd,
+        resources: resources.length,
+        transfer_bytes: bytes,
+        resources_ms: end,
+    };
+})()
+"""
+
+class PageLoadTiming:
+    """Time every load and reload of the client and file it under the proxy in use.
+
+    loadStarted/loadProgress/loadFinished give the wall-clock time, the
+    page's Navigation and Resource Timing are read CACHE_STATS_DELAY later,
+    when Discord has fetched its bundles. A load replaced by the next one
+    before that is not stored.
+    """
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.loads = 0
+        self.started = None
+        self.started_at = None
+        self.proxy = None
+        self.timings = {}
+        self.last = None
+        view = browser.view
+        view.loadStarted.connect(self.load_started)
+        view.loadProgress.connect(self.load_progress)
+        view.loadFinished.connect(self.load_finished)
+
+    def load_started(self):
+        self.loads += 1
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        # The proxy can change while the page loads, the one it started with counts
+        self.proxy = self.browser.proxy_label()
+        self.timings = {}
+
+    def load_progress(self, progress):
+        if self.started is not None and progress > 0 and "first_progress_ms" not in self.timings:
+            self.timings["first_progress_ms"] = (time.perf_counter() - self.started) * 1000
+
+    def load_finished(self, ok):
+        if self.started is None:
+            return
+        self.timings["load_ms"] = (time.perf_counter() - self.started) * 1000
+        self.started = None
+        if not ok:
+            self.store(self.loads, False, None)
+            return
+        load = self.loads
+        QTimer.singleShot(CACHE_STATS_DELAY, lambda: self.collect(load))
+
+    def collect(self, load):
+        if load != self.loads:
+            return
+        self.browser.view.page().runJavaScript(PAGE_TIMING_JS, lambda values: self.store(load, True, values))
+
+    def store(self, load, ok, values):
+        if load != self.loads:
+            return
+        timings = dict(self.timings)
+        if values:
+            timings.update((name, float(value)) for name, value in values.items())
+        self.last = (self.proxy, ok, timings)
+        self.browser.probe_history().append_page_load(self.proxy, ok, timings, self.started_at)
+
+    def describe(self, proxy, ok, timings):
+        if not ok:
+            return f"{proxy}: failed after {timings['load_ms'] / 1000:.1f} s"
+        parts = [f"{proxy}: loaded in {timings['load_ms'] / 1000:.1f} s"]
+        if timings.get("ttfb") is not None:
+            parts.append(f"first byte {timings['ttfb']:.0f} ms")
+        if timings.get("resources_ms") is not None:
+            parts.append(f"{timings['resources']:.0f} resources done at {timings['resources_ms'] / 1000:.1f} s")
+        return ", ".join(parts)
+
+    def report(self, days=7):
+        stats = self.browser.probe_history().page_load_stats(time.time() - days * 86400)
+        if not stats:
+            return "No page load measured yet."
+        best = next((entry["load_ms"] for entry in stats.values() if entry["load_ms"]), None)
+        lines = [f"Median page load per proxy, last {days} days:"]
+        for name, entry in stats.items():
+            line = f"{name}: {entry['loads']} loads, {entry['failures']} failed"
+            if entry["load_ms"] is not None:
+                line += f", load {entry['load_ms'] / 1000:.1f} s ({entry['load_ms'] / best:.1f}x)"
+            if entry["ttfb"] is not None:
+                line += f", first byte {entry['ttfb']:.0f} ms"
+            if entry["resources_ms"] is not None:
+                line += f", resources done {entry['resources_ms'] / 1000:.1f} s"
+            lines.append(line)
+        if self.last is not None:
+            lines += ["", "Last load: " + self.describe(*self.last)]
+        return "\n".join(lines)
+
+# Injected into every document. A PerformanceObserver adds up transferred bytes by host
+# and initiator type, and XHR/fetch are wrapped to count status codes (0 for network
+# errors). NETWORK_COLLECT_JS hands the counts over and starts them again from zero.
+NETWORK_JS = """
+(() => {
+    const net = window.__byeblockNet = {bytes: {}, status: {}};
+    const add = (map, key, count) => { map[key] = (map[key] || 0) + count; };
+    const host = url => { try { return new URL(url, location.href).hostname; } catch (e) { return ""; } };
+    try {
+        new PerformanceObserver(list => {
+            for (const entry of list.getEntries()) {
+                add(net.bytes, host(entry.name) + " " + entry.initiatorType, entry.transferSize || 0);
+            }
+        }).observe({entryTypes: ["navigation", "resource"]});
+    } catch (e) {}
+    const open = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.addEventListener("loadend", () => add(net.status, host(url) + " " + this.status, 1));
+        return open.apply(this, arguments);
+    };
+    const fetch = window.fetch;
+    window.fetch = function (input) {
+        const url = typeof input === "string" ? input : input && input.url;
+        return fetch.apply(this, arguments).then(
+            response => { add(net.status, host(url) + " " + response.status, 1); return response; },
+            error => { add(net.status, host(url) + " 0", 1); throw error; });
+    };
+})();
+"""
+NETWORK_COLLECT_JS = """
+(() => {
+    const net = window.__byeblockNet;
+    if (!net) return null;
+    const counts = [net.bytes, net.status];
+    net.bytes = {};
+    net.status = {};
+    return counts;
+})()
+"""
+NETWORK_POLL = 5000
+
+class NetworkMonitor:
+    """Fill a NetworkStats from the page and export it on a schedule.
+
+    Requests are counted by the request interceptor; bytes and status codes
+    are collected from the page every few seconds. With Network/JsonlFile or
+    Network/PrometheusFile set, the counters are written there every
+    Network/ExportInterval seconds.
+    """
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.stats = NetworkStats()
+        self.exported_at = time.monotonic()
+        self.timer = QTimer(browser)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(NETWORK_POLL)
+
+    def poll(self):
+        self.browser.view.page().runJavaScript(NETWORK_COLLECT_JS, self.collected)
+        settings = self.browser.settings
+        if time.monotonic() - self.exported_at >= settings.value("Network/ExportInterval", 60, type=int):
+            self.exported_at = time.monotonic()
+            self.export(settings.value("Network/JsonlFile", ""), settings.value("Network/PrometheusFile", ""))
+
+    def collected(self, counts):
+        if not counts:
+            return
+        transferred, statuses = counts
+        for key, size in transferred.items():
+            host, _, initiator = key.rpartition(" ")
+            if host and size:
+                self.stats.add(host, INITIATOR_TYPES.get(initiator, "other"), size=int(size))
+        for key, count in statuses.items():
+            host, _, code = key.rpartition(" ")
+            for _ in range(int(count)):
+                self.stats.add(host, "xhr", status=int(code))
+
+    def export(self, jsonl_path, prometheus_path):
+        try:
+            if jsonl_path:
+                self.stats.write_jsonl(jsonl_path, WINDOWS["1 min"])
+            if prometheus_path:
+                self.stats.write_prometheus(prometheus_path)
+        except OSError as e:
+            log.warning("Network statistics export failed: %s", e)
+
+# Injected into every document with window.__byeblockRender set in front of it. Each
+# knob is read when it is used, so running the same source again changes them in place.
+# Animations are cut to zero length rather than removed, so animationend still fires.
+# Videos only start on a click and call video (srcObject streams) is never held back.
+# Timers of a page in the background or without focus wait at least timerFloor ms.
+RENDER_JS = """
+(() => {
+    const config = window.__byeblockRender;
+    const css = "*, *::before, *::after { animation-duration: 0s !important; animation-delay: 0s !important;"
+        + " animation-iteration-count: 1 !important; transition-duration: 0s !important;"
+        + " transition-delay: 0s !important; scroll-behavior: auto !important; }";
+    const style = () => {
+        let element = document.getElementById("byeblock-reduce-motion");
+        if (!config.reduceMotion) {
+            if (element) element.remove();
+            return;
+        }
+        if (element || !document.documentElement) return;
+        element = document.createElement("style");
+        element.id = "byeblock-reduce-motion";
+        element.textContent = css;
+        (document.head || document.documentElement).appendChild(element);
+    };
+    style();
+    if (window.__byeblockRenderInstalled) return;
+    window.__byeblockRenderInstalled = true;
+    document.addEventListener("DOMContentLoaded", style);
+
+    const background = () => document.hidden || !document.hasFocus();
+    const setTimeout = window.setTimeout;
+    window.setTimeout = function (callback, delay, ...args) {
+        if (config.timerFloor > (delay | 0) && background()) delay = config.timerFloor;
+        return setTimeout.call(this, callback, delay, ...args);
+    };
+    const setInterval = window.setInterval;
+    window.setInterval = function (callback, delay, ...args) {
+        if (typeof callback !== "function") return setInterval.call(this, callback, delay, ...args);
+        let last = 0;
+        return setInterval.call(this, function (...values) {
+            if (config.timerFloor > (delay | 0) && background()) {
+                const now = performance.now();
+                if (now - last < config.timerFloor) return;
+                last = now;
+            }
+            return callback.apply(this, values);
+        }, delay, ...args);
+    };
+
+    const play = HTMLMediaElement.prototype.play;
+    HTMLVideoElement.prototype.play = function () {
+        const activation = navigator.userActivation;
+        if (config.blockAutoplay && !this.srcObject && activation && !activation.isActive) {
+            return Promise.resolve();
+        }
+        return play.apply(this, arguments);
+    };
+})();
+"""
+RENDER_SAMPLE_INTERVAL = 60000
+
+class RenderMonitor:
+    """Apply the rendering profile to the page and measure what it costs.
+
+    CPU and RSS of the app and its QtWebEngine helpers are sampled every
+    minute. The second minute of a session is stored in RenderCost.jsonl,
+    as the first one is mostly the page loading. When All Settings changes
+    the profile, the minute before and the minute after the change are
+    stored and printed side by side. Chromium switches only change with a
+    restart, so they are compared across sessions.
+    """
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.config = load_render_config(browser.settings)
+        # main() put these switches in place before Chromium started
+        self.started_flags = chromium_flags(self.config)
+        self.cost = RenderCost()
+        self.latest = None
+        self.samples = 0
+        self.change = None
+        self.last_change = ""
+        self.timer = QTimer(browser)
+        self.timer.setInterval(RENDER_SAMPLE_INTERVAL)
+        self.timer.timeout.connect(self.sample)
+        self.timer.start()
+        self.apply_attributes()
+
+    def apply_attributes(self):
+        settings = self.browser.view.settings()
+        low = self.config.low_resource
+        if low and self.config.block_autoplay:
+            settings.setAttribute(QWebEngineSettings.PlaybackRequiresUserGesture, True)
+        # Only takes effect for pages loaded afterwards
+        software = low and self.config.gpu == "software only"
+        settings.setAttribute(QWebEngineSettings.WebGLEnabled, not software)
+        settings.setAttribute(QWebEngineSettings.Accelerated2dCanvasEnabled, not software)
+
+    def reload(self):
+        config = load_render_config(self.browser.settings)
+        if config == self.config:
+            return
+        old, self.config = self.config, config
+        scripts = self.browser.profile.scripts()
+        for existing in scripts.findScripts("render-profile"):
+            scripts.remove(existing)
+        scripts.insert(render_profile_script(config))
+        self.browser.view.page().runJavaScript(render_source(config))
+        self.apply_attributes()
+        # The next sample covers exactly the first minute with the new knobs
+        self.change = (old, self.latest)
+        self.cost.measure()
+        self.timer.start()
+
+    def sample(self):
+        usage = self.cost.measure()
+        self.latest = usage
+        self.samples += 1
+        if self.samples == 2:
+            self.store("session", self.config, usage)
+        if self.change is None:
+            return
+        old, before = self.change
+        self.change = None
+        if before is not None:
+            self.store("before", old, before)
+            self.last_change = (f"Last change: {describe(old)} -> {describe(self.config)}: "
+                                f"CPU {before['cpu_percent']:.0f}% -> {usage['cpu_percent']:.0f}%, "
+                                f"RSS {format_mb(before['rss'])} -> {format_mb(usage['rss'])}")
+        self.store("after", self.config, usage)
+
+    def store(self, event, config, usage):
+        line = cost_line(event, config, active_flags(), usage, self.browser.isVisible())
+        try:
+            with open(COST_FILE, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        except OSError as e:
+            log.warning("Could not write %s: %s", COST_FILE, e)
+
+    def report(self):
+        lines = [f"Profile: {describe(self.config)}",
+                 "Chromium switches: " + (" ".join(active_flags()) or "none")]
+        if chromium_flags(self.config) != self.started_flags:
+            lines.append("Restart to apply the changed switches.")
+        if self.latest is not None:
+            usage = self.latest
+            lines.append(f"Last minute: CPU {usage['cpu_percent']:.0f}%, RSS {format_mb(usage['rss'])}; "
+                         f"{usage['helpers']} QtWebEngine processes: CPU {usage['helper_cpu_percent']:.0f}%, "
+                         f"RSS {format_mb(usage['helper_rss'])}")
+        else:
+            lines.append("Measuring, the first minute is not over yet.")
+        if self.last_change:
+            lines.append(self.last_change)
+        records = [record for record in read_costs() if record.get("event") in ("session", "after")]
+        if records:
+            # The mean of every profile that was measured, visible windows only
+            by_profile = {}
+            for record in records:
+                if record.get("visible"):
+                    by_profile.setdefault(record["profile"], []).append(record)
+            lines += ["", "Measured profiles (visible window):"]
+            for profile, entries in sorted(by_profile.items(),
+                                           key=lambda item: sum(r["cpu_percent"] for r in item[1]) / len(item[1])):
+                cpu = sum(entry["cpu_percent"] for entry in entries) / len(entries)
+                rss = sum(entry["rss"] for entry in entries) / len(entries)
+                lines.append(f"CPU {cpu:3.0f}%  RSS {format_mb(rss):>8}  ({len(entries)}x)  {profile}")
+        return "\n".join(lines)
+
+# Names used by "type:" block rules
+RESOURCE_TYPE_NAMES = {
+    QWebEngineUrlRequestInfo.ResourceTypeMainFrame: "main_frame",
+    QWebEngineUrlRequestInfo.ResourceTypeSubFrame: "sub_frame",
+    QWebEngineUrlRequestInfo.ResourceTypeStylesheet: "stylesheet",
+    QWebEngineUrlRequestInfo.ResourceTypeScript: "script",
+    QWebEngineUrlRequestInfo.ResourceTypeImage: "image",
+    QWebEngineUrlRequestInfo.ResourceTypeFontResource: "font",
+    QWebEngineUrlRequestInfo.ResourceTypeSubResource: "sub_resource",
+    QWebEngineUrlRequestInfo.ResourceTypeObject: "object",
+    QWebEngineUrlRequestInfo.ResourceTypeMedia: "media",
+    QWebEngineUrlRequestInfo.ResourceTypeWorker: "worker",
+    QWebEngineUrlRequestInfo.ResourceTypeSharedWorker: "shared_worker",
+    QWebEngineUrlRequestInfo.ResourceTypePrefetch: "prefetch",
+    QWebEngineUrlRequestInfo.ResourceTypeFavicon: "favicon",
+    QWebEngineUrlRequestInfo.ResourceTypeXhr: "xhr",
+    QWebEngineUrlRequestInfo.ResourceTypePing: "ping",
+    QWebEngineUrlRequestInfo.ResourceTypeServiceWorker: "service_worker",
+    QWebEngineUrlRequestInfo.ResourceTypeCspReport: "csp_report",
+    QWebEngineUrlRequestInfo.ResourceTypePluginResource: "plugin",
+}
+
+class RequestInterceptor(QWebEngineUrlRequestInterceptor):
+    """Block requests matched by the block rules and send immutable Discord
+    assets to the local asset store.
+
+    Fonts and XHR/fetch requests are never sent to the store: they are CORS
+    requests and a scheme handler cannot add the Access-Control-Allow-Origin
+    header. Stylesheets stay on https too, so the fonts they name by
+    relative URL keep resolving to discord.com.
+    """
+
+    ASSET_TYPES = {
+        QWebEngineUrlRequestInfo.ResourceTypeScript,
+        QWebEngineUrlRequestInfo.ResourceTypeImage,
+        QWebEngineUrlRequestInfo.ResourceTypeMedia,
+    }
+
+    def __init__(self, rules=None, store=None, network=None, parent=None):
+        super().__init__(parent)
+        self.rules = rules
+        self.store = store
+        self.network = network
+
+    def interceptRequest(self, info):
+        url = info.requestUrl()
+        resource_type = info.resourceType()
+        type_name = RESOURCE_TYPE_NAMES.get(resource_type)
+        rules = self.rules
+        blocked = rules is not None and rules.blocked(url.host(), url.path(), type_name)
+        if self.network is not None and url.host() and url.scheme() != ASSET_SCHEME.decode():
+            self.network.add(url.host(), type_name or "other", requests=1, blocked=int(blocked))
+        if blocked:
+            info.block(True)
+            return
+        if self.store is None or info.requestMethod() != b"GET" or resource_type not in self.ASSET_TYPES:
+            return
+        if url.scheme() == "https" and self.store.matches(url.toString()):
+            url.setScheme(ASSET_SCHEME.decode())
+            info.redirect(url)
+
+class AssetSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Answer byeblock-asset:// requests from the store, fetching misses over the proxy."""
+
+    finished = pyqtSignal(object, object, str)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="asset")
+        self.failures = 0
+        self.last_failure = ""
+        self.finished.connect(self.reply)
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        url.setScheme("https")
+        self.pool.submit(self.load, job, url.toString(), application_proxy_url())
+
+    def load(self, job, url, proxy_url):
+        try:
+            data, mime = self.store.fetch(url, proxy_url)
+        except Exception as e:
+            # Shown under Cache Stats
+            self.failures += 1
+            self.last_failure = f"{url}: {e}"
+            data, mime = None, ""
+        # Jobs are answered on the UI thread
+        self.finished.emit(job, data, mime)
+
+    def reply(self, job, data, mime):
+        if sip.isdeleted(job):
+            return
+        if data is None:
+            job.fail(QWebEngineUrlRequestJob.RequestFailed)
+            return
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(mime.encode(), buffer)
 
 class WebEnginePage(QWebEnginePage):
     def acceptNavigationRequest(self, url, _type, is_main_frame):
@@ -439,7 +1814,10 @@ class WebEnginePage(QWebEnginePage):
         return super().acceptNavigationRequest(url, _type, is_main_frame)
 
 class ProxyApp(QMainWindow):
-    def __init__(self):
+    settings_saved = pyqtSignal()
+    throughput_measured = pyqtSignal(list)
+
+    def __init__(self, history=None, forwarder=None, registry=None, network=None, ping_worker=None):
         super().__init__()
         self.setWindowTitle("All Settings - ByeBlock-Discord 0.0.0.1")
         self.setGeometry(200, 200, 600, 400)
@@ -447,7 +1825,16 @@ class ProxyApp(QMainWindow):
         
         self.setWindowIcon(QIcon("app.ico"))
 
-        self.settings = QSettings("Settings.ini", QSettings.IniFormat)
+        if registry is None:
+            self.settings = open_settings(self)
+            registry = ProxyRegistry(self.settings)
+        else:
+            self.settings = registry.settings
+        self.registry = registry
+        self.selected_proxy = ""
+        self.history = history if history is not None else open_probe_history(self.settings)
+        self.forwarder = forwarder
+        self.network = network
 
         self.tabs = QTabWidget()
         self.tabs.setStyleSheet("""
@@ -468,17 +1855,30 @@ class ProxyApp(QMainWindow):
         self.proxy_tab = QWidget()
         self.proxy_layout = QVBoxLayout()
 
-        self.ping_graph = ProxyPingGraph(self.get_proxy_info)
+        self.ping_graph = ProxyPingGraph(
+            self.get_proxy_info, self.get_proxies, self.settings.value("Graph/HistoryHours", 8, type=int),
+            self.history, self.settings.value("Graph/MaxFPS", 2, type=int), ping_worker)
+        self.ping_graph.worker.sweep_signal.connect(self.update_sweep_status)
         self.proxy_layout.addWidget(self.ping_graph)
 
         self.proxy_combobox = QComboBox()
         self.load_proxies()
+        self.proxy_combobox.currentTextChanged.connect(self.select_proxy)
         self.proxy_combobox.currentTextChanged.connect(self.save_settings)
         self.proxy_layout.addWidget(self.proxy_combobox)
 
         self.proxy_status_label = QLabel("Proxy Status:\nPing: 0ms")
         self.proxy_layout.addWidget(self.proxy_status_label)
 
+        self.probe_mode = QComboBox()
+        self.probe_mode.addItems(PROBE_MODES)
+        self.probe_mode.setCurrentText(self.settings.value("Probe/Mode", "phases"))
+        self.probe_mode.currentTextChanged.connect(self.save_settings)
+        self.proxy_layout.addWidget(self.probe_mode)
+        self.apply_probe_mode()
+        self.ping_graph.worker.scheduler.config = load_schedule_config(self.settings)
+        self.latest_results = {}
+
         self.start_button = QPushButton("Start Graph")
         self.start_button.clicked.connect(self.ping_graph.start_ping)
         self.proxy_layout.addWidget(self.start_button)
@@ -499,6 +1899,29 @@ class ProxyApp(QMainWindow):
         self.add_proxy_button.clicked.connect(self.add_proxy)
         self.proxy_layout.addWidget(self.add_proxy_button)
 
+        self.import_button = QPushButton("Import Proxy List")
+        self.import_button.clicked.connect(self.import_proxies)
+        self.proxy_layout.addWidget(self.import_button)
+
+        self.import_label = QLabel("")
+        self.proxy_layout.addWidget(self.import_label)
+        self.import_list = QListWidget()
+        self.import_list.hide()
+        self.proxy_layout.addWidget(self.import_list)
+        self.import_worker = None
+
+        self.throughput_button = QPushButton("Test Throughput")
+        self.throughput_button.clicked.connect(self.test_throughput)
+        self.proxy_layout.addWidget(self.throughput_button)
+
+        self.throughput_label = QLabel("")
+        self.proxy_layout.addWidget(self.throughput_label)
+        self.throughput_list = QListWidget()
+        self.throughput_list.hide()
+        self.proxy_layout.addWidget(self.throughput_list)
+        self.throughput_worker = None
+        self.throughput_results = {}
+
         self.proxy_tab.setLayout(self.proxy_layout)
         self.tabs.addTab(self.proxy_tab, "Proxy Settings")
 
@@ -535,30 +1958,240 @@ class ProxyApp(QMainWindow):
         self.connection_type.currentTextChanged.connect(self.save_settings)
         self.connect_layout.addWidget(self.connection_type)
 
+        self.failover_checkbox = QCheckBox("Switch to the best proxy automatically")
+        self.failover_checkbox.setChecked(self.settings.value("Failover/Enabled", False, type=bool))
+        self.failover_checkbox.stateChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.failover_checkbox)
+
+        self.connect_layout.addWidget(QLabel("Switch when ping is over (ms):"))
+        self.failover_latency = QSpinBox()
+        self.failover_latency.setRange(50, 10000)
+        self.failover_latency.setValue(self.settings.value("Failover/MaxLatency", 800, type=int))
+        self.failover_latency.valueChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.failover_latency)
+
+        self.connect_layout.addWidget(QLabel("Switch when loss is over (%):"))
+        self.failover_loss = QSpinBox()
+        self.failover_loss.setRange(1, 100)
+        self.failover_loss.setValue(self.settings.value("Failover/MaxLoss", 30, type=int))
+        self.failover_loss.valueChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.failover_loss)
+
+        self.block_checkbox = QCheckBox(f"Block telemetry and prefetch requests (rules in {RULES_FILE})")
+        self.block_checkbox.setChecked(self.settings.value("Block/Enabled", False, type=bool))
+        self.block_checkbox.stateChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.block_checkbox)
+
+        self.connect_layout.addWidget(QLabel("Probes per minute over all proxies:"))
+        self.probe_budget = QSpinBox()
+        self.probe_budget.setRange(10, 100000)
+        self.probe_budget.setValue(self.settings.value("Probe/BudgetPerMinute", 600, type=int))
+        self.probe_budget.valueChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.probe_budget)
+
+        self.forwarder_checkbox = QCheckBox("Spread connections over all healthy proxies")
+        self.forwarder_checkbox.setChecked(self.settings.value("Forwarder/Enabled", False, type=bool))
+        self.forwarder_checkbox.stateChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.forwarder_checkbox)
+
+        self.routing_checkbox = QCheckBox(f"Send only blocked hosts through the proxy (routes in {ROUTES_FILE})")
+        self.routing_checkbox.setChecked(self.settings.value("Routing/Enabled", False, type=bool))
+        self.routing_checkbox.stateChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.routing_checkbox)
+
+        self.connect_layout.addWidget(QLabel("Throughput test: parallel streams, seconds per proxy, MB per stream:"))
+        self.throughput_streams = QSpinBox()
+        self.throughput_streams.setRange(1, 32)
+        self.throughput_streams.setValue(self.settings.value("Throughput/Streams", 4, type=int))
+        self.throughput_streams.valueChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.throughput_streams)
+        self.throughput_seconds = QSpinBox()
+        self.throughput_seconds.setRange(2, 120)
+        self.throughput_seconds.setValue(self.settings.value("Throughput/Seconds", 10, type=int))
+        self.throughput_seconds.valueChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.throughput_seconds)
+        self.throughput_payload = QSpinBox()
+        self.throughput_payload.setRange(1, 1024)
+        self.throughput_payload.setValue(self.settings.value("Throughput/PayloadMB", 25, type=int))
+        self.throughput_payload.valueChanged.connect(self.save_settings)
+        self.connect_layout.addWidget(self.throughput_payload)
+
+        self.forwarder_label = QLabel("")
+        self.connect_layout.addWidget(self.forwarder_label)
+        self.forwarder_timer = QTimer(self)
+        self.forwarder_timer.timeout.connect(self.update_forwarder_status)
+        self.forwarder_timer.start(2000)
+
         self.connect_tab.setLayout(self.connect_layout)
         self.tabs.addTab(self.connect_tab, "Connection Settings")
 
+        self.tray_tab = QWidget()
+        self.tray_layout = QVBoxLayout()
+
+        self.tray_layout.addWidget(QLabel("Suspend Discord in the tray after (s, 0 = never):"))
+        self.suspend_after = QSpinBox()
+        self.suspend_after.setRange(0, 86400)
+        self.suspend_after.setValue(self.settings.value("Tray/SuspendAfter", 60, type=int))
+        self.suspend_after.valueChanged.connect(self.save_settings)
+        self.tray_layout.addWidget(self.suspend_after)
+
+        self.tray_layout.addWidget(QLabel("Unload a suspended Discord above (MB, 0 = never):"))
+        self.discard_above = QSpinBox()
+        self.discard_above.setRange(0, 65536)
+        self.discard_above.setValue(self.settings.value("Tray/DiscardAboveMB", 0, type=int))
+        self.discard_above.valueChanged.connect(self.save_settings)
+        self.tray_layout.addWidget(self.discard_above)
+
+        self.tray_layout.addWidget(QLabel("Disk cache size (MB):"))
+        self.cache_size = QSpinBox()
+        self.cache_size.setRange(16, 16384)
+        self.cache_size.setValue(self.settings.value("Cache/SizeMB", 512, type=int))
+        self.cache_size.valueChanged.connect(self.save_settings)
+        self.tray_layout.addWidget(self.cache_size)
+
+        self.assets_checkbox = QCheckBox("Keep Discord's static files in a local store (after restart)")
+        self.assets_checkbox.setChecked(self.settings.value("Assets/Enabled", False, type=bool))
+        self.assets_checkbox.stateChanged.connect(self.save_settings)
+        self.tray_layout.addWidget(self.assets_checkbox)
+
+        self.tray_layout.addWidget(QLabel("Local store size (MB):"))
+        self.assets_size = QSpinBox()
+        self.assets_size.setRange(16, 16384)
+        self.assets_size.setValue(self.settings.value("Assets/SizeMB", 256, type=int))
+        self.assets_size.valueChanged.connect(self.save_settings)
+        self.tray_layout.addWidget(self.assets_size)
+        self.tray_layout.addStretch()
+
+        self.tray_tab.setLayout(self.tray_layout)
+        self.tabs.addTab(self.tray_tab, "Tray and Cache")
+
+        self.render_tab = QWidget()
+        self.render_layout = QVBoxLayout()
+
+        self.render_checkbox = QCheckBox("Low-resource mode")
+        self.render_checkbox.setChecked(self.settings.value("Render/LowResource", False, type=bool))
+        self.render_checkbox.stateChanged.connect(self.save_settings)
+        self.render_layout.addWidget(self.render_checkbox)
+
+        self.render_layout.addWidget(QLabel("Renderer processes (0 = no limit, after restart):"))
+        self.renderer_limit = QSpinBox()
+        self.renderer_limit.setRange(0, 16)
+        self.renderer_limit.setValue(self.settings.value("Render/RendererLimit", 1, type=int))
+        self.renderer_limit.valueChanged.connect(self.save_settings)
+        self.render_layout.addWidget(self.renderer_limit)
+
+        self.render_layout.addWidget(QLabel("GPU (after restart):"))
+        self.render_gpu = QComboBox()
+        self.render_gpu.addItems(GPU_MODES)
+        self.render_gpu.setCurrentText(self.settings.value("Render/GPU", "software compositing"))
+        self.render_gpu.currentTextChanged.connect(self.save_settings)
+        self.render_layout.addWidget(self.render_gpu)
+
+        self.reduce_motion_checkbox = QCheckBox("No animations")
+        self.reduce_motion_checkbox.setChecked(self.settings.value("Render/ReduceMotion", True, type=bool))
+        self.reduce_motion_checkbox.stateChanged.connect(self.save_settings)
+        self.render_layout.addWidget(self.reduce_motion_checkbox)
+
+        self.block_autoplay_checkbox = QCheckBox("Play videos and GIFs only when clicked")
+        self.block_autoplay_checkbox.setChecked(self.settings.value("Render/BlockAutoplay", True, type=bool))
+        self.block_autoplay_checkbox.stateChanged.connect(self.save_settings)
+        self.render_layout.addWidget(self.block_autoplay_checkbox)
+
+        self.render_layout.addWidget(QLabel("Timers in the background at most every (ms, 0 = no limit):"))
+        self.timer_floor = QSpinBox()
+        self.timer_floor.setRange(0, 60000)
+        self.timer_floor.setSingleStep(500)
+        self.timer_floor.setValue(self.settings.value("Render/TimerFloorMs", 2000, type=int))
+        self.timer_floor.valueChanged.connect(self.save_settings)
+        self.render_layout.addWidget(self.timer_floor)
+
+        self.render_layout.addWidget(QLabel("Settings > Render Cost compares CPU and RSS before and after a change."))
+        self.render_layout.addStretch()
+
+        self.render_tab.setLayout(self.render_layout)
+        self.tabs.addTab(self.render_tab, "Rendering")
+
+        self.network_tab = QWidget()
+        self.network_layout = QVBoxLayout()
+
+        self.network_window = QComboBox()
+        self.network_window.addItems(WINDOWS)
+        self.network_window.setCurrentText("10 min")
+        self.network_window.currentTextChanged.connect(self.update_network_stats)
+        self.network_layout.addWidget(self.network_window)
+
+        self.network_label = QLabel("")
+        self.network_layout.addWidget(self.network_label)
+
+        self.network_table = QTableWidget(0, 6)
+        self.network_table.setHorizontalHeaderLabels(["Host", "Type", "Requests", "Blocked", "MB", "Errors"])
+        self.network_table.verticalHeader().hide()
+        self.network_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.network_layout.addWidget(self.network_table)
+
+        self.export_jsonl_button = QPushButton("Export JSON Lines")
+        self.export_jsonl_button.clicked.connect(self.export_network_jsonl)
+        self.network_layout.addWidget(self.export_jsonl_button)
+
+        self.export_prometheus_button = QPushButton("Export Prometheus")
+        self.export_prometheus_button.clicked.connect(self.export_network_prometheus)
+        self.network_layout.addWidget(self.export_prometheus_button)
+
+        self.network_layout.addWidget(QLabel("Write every minute to (JSON lines / Prometheus text file):"))
+        self.network_jsonl_file = QLineEdit(self.settings.value("Network/JsonlFile", ""))
+        self.network_jsonl_file.setPlaceholderText("NetworkStats.jsonl")
+        self.network_jsonl_file.editingFinished.connect(self.save_settings)
+        self.network_layout.addWidget(self.network_jsonl_file)
+        self.network_prometheus_file = QLineEdit(self.settings.value("Network/PrometheusFile", ""))
+        self.network_prometheus_file.setPlaceholderText("byeblock.prom")
+        self.network_prometheus_file.editingFinished.connect(self.save_settings)
+        self.network_layout.addWidget(self.network_prometheus_file)
+
+        self.network_tab.setLayout(self.network_layout)
+        self.tabs.addTab(self.network_tab, "Network")
+        self.network_timer = QTimer(self)
+        self.network_timer.timeout.connect(self.update_network_stats)
+        self.network_timer.start(2000)
+        self.tabs.currentChanged.connect(self.update_network_stats)
+
         self.update_proxy_details()
+        self.proxy_combobox.currentTextChanged.connect(self.ping_graph.load_history)
+        self.ping_graph.load_history()
+
+    def closeEvent(self, event):
+        if self.ping_graph.release():
+            self.ping_graph.worker.sweep_signal.disconnect(self.update_sweep_status)
+        if self.throughput_worker is not None:
+            self.throughput_worker.stop()
+            # Returns without waiting for streams still resolving or connecting,
+            # they see the stop flag and close on their own
+            self.throughput_worker.wait()
+        self.settings.flush()
+        super().closeEvent(event)
 
     def load_proxies(self):
+        selected = self.proxy_combobox.currentText() or self.settings.value("Proxy/Server", "")
+        self.proxy_combobox.blockSignals(True)
         self.proxy_combobox.clear()
-        for key in self.settings.childKeys():
-            if key.startswith("Proxy/") and "Host" in key:
-                proxy_server = key.split('/')[1]
-                self.proxy_combobox.addItem(proxy_server)
+        self.proxy_combobox.addItems(self.registry.names())
+        if selected in self.registry.names():
+            self.proxy_combobox.setCurrentText(selected)
+        self.proxy_combobox.blockSignals(False)
+        self.select_proxy(self.proxy_combobox.currentText())
+
+    def select_proxy(self, name):
+        # Kept in a plain attribute so the ping thread never touches the combobox
+        self.selected_proxy = name
 
     def add_proxy(self):
         host = self.host_input.text()
         port = self.port_input.text()
 
-        if not host or not port.isdigit():
+        if not host or not valid_host(host) or not port.isdigit():
             QMessageBox.warning(self, "Input Error", "Please enter valid Host and Port.")
             return
         
-        proxy_key = f"Proxy/{host}"
-        self.settings.setValue(f"{proxy_key}/Host", host)
-        self.settings.setValue(f"{proxy_key}/Port", int(port))
-        self.settings.sync()
+        self.registry.put(ProxyTarget(host, host, int(port)))
         
         self.host_input.clear()
         self.port_input.clear()
@@ -566,31 +2199,261 @@ class ProxyApp(QMainWindow):
         self.load_proxies()
         QMessageBox.information(self, "Success", "Proxy added successfully.")
 
+    def import_proxies(self):
+        if self.import_worker is not None:
+            self.import_worker.running = False
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Import Proxy List", "", "Text files (*.txt);;All files (*)")
+        if not path:
+            return
+        self.import_checked = 0
+        self.import_alive = 0
+        self.import_list.clear()
+        self.import_list.show()
+        self.import_button.setText("Stop Import")
+        self.import_worker = ImportWorker(path)
+        self.import_worker.result_signal.connect(self.on_import_result)
+        self.import_worker.done_signal.connect(self.on_import_done)
+        self.import_worker.running = True
+        self.import_worker.start()
+
+    def on_import_result(self, target, result):
+        self.import_checked += 1
+        if result.ok:
+            self.import_alive += 1
+            self.import_list.addItem(f"{target.type} {target.host}:{target.port} {result.ms:.0f}ms")
+        self.import_label.setText(f"Checked: {self.import_checked}, working: {self.import_alive}")
+
+    def on_import_done(self, alive):
+        self.import_worker.wait()
+        error = self.import_worker.error
+        self.import_worker = None
+        self.import_button.setText("Import Proxy List")
+        stored = self.registry.add(alive)
+        self.load_proxies()
+        text = f"Checked: {self.import_checked}, working: {self.import_alive}, added: {len(stored)}"
+        if error is not None:
+            text += f"\nImport stopped: {error}"
+        self.import_label.setText(text)
+
+    def test_throughput(self):
+        if self.throughput_worker is not None:
+            self.throughput_worker.stop()
+            return
+        targets = self.registry.all()
+        if not targets:
+            return
+        config = load_throughput_config(self.settings)
+        self.throughput_results = {}
+        self.throughput_list.clear()
+        self.throughput_list.show()
+        self.throughput_label.setText(f"Testing {len(targets)} proxies, up to {config.duration:.0f} s each")
+        self.throughput_button.setText("Stop Throughput Test")
+        self.throughput_worker = ThroughputWorker(targets, config)
+        self.throughput_worker.result_signal.connect(self.on_throughput_result)
+        self.throughput_worker.done_signal.connect(self.on_throughput_done)
+        self.throughput_worker.running = True
+        self.throughput_worker.start()
+
+    def on_throughput_result(self, result):
+        self.throughput_results[result.proxy] = result
+        self.history.append_throughput(result, self.throughput_worker.config.streams)
+        self.show_throughput_ranking()
+
+    def on_throughput_done(self, results):
+        self.throughput_worker.wait()
+        self.throughput_worker = None
+        self.throughput_button.setText("Test Throughput")
+        self.throughput_label.setText(f"Tested {len(results)} proxies, best score first "
+                                      f"(ping + ms to move {REFERENCE_BYTES // 1024} KB)")
+        self.throughput_measured.emit(results)
+
+    def show_throughput_ranking(self):
+        rows = []
+        for name, result in self.throughput_results.items():
+            probe = self.latest_results.get(name)
+            latency = probe.ms if probe is not None and probe.ok else None
+            if not result.ok:
+                rows.append((float("inf"), f"{name}: {result.error}"))
+                continue
+            score = transfer_ms(result.sustained) + (latency or 0)
+            ping = f"{latency:.0f}ms" if latency is not None else "no ping yet"
+            rows.append((score, f"{name}: {result.sustained / 1048576:.2f} MB/s sustained, "
+                                f"{result.peak / 1048576:.2f} MB/s peak, {ping}, score {score:.0f}"))
+        rows.sort(key=lambda row: row[0])
+        self.throughput_list.clear()
+        self.throughput_list.addItems([text for _, text in rows])
+
     def save_settings(self):
         self.settings.setValue("Proxy/Server", self.proxy_combobox.currentText())
         self.settings.setValue("Access/Microphone", self.mic_checkbox.isChecked())
         self.settings.setValue("Access/Camera", self.camera_checkbox.isChecked())
         self.settings.setValue("Access/Screen", self.screen_checkbox.isChecked())
         self.settings.setValue("Connection/Type", self.connection_type.currentText())
-        self.settings.sync()
+        self.settings.setValue("Probe/Mode", self.probe_mode.currentText())
+        self.settings.setValue("Failover/Enabled", self.failover_checkbox.isChecked())
+        self.settings.setValue("Failover/MaxLatency", self.failover_latency.value())
+        self.settings.setValue("Failover/MaxLoss", self.failover_loss.value())
+        self.settings.setValue("Probe/BudgetPerMinute", self.probe_budget.value())
+        self.settings.setValue("Throughput/Streams", self.throughput_streams.value())
+        self.settings.setValue("Throughput/Seconds", self.throughput_seconds.value())
+        self.settings.setValue("Throughput/PayloadMB", self.throughput_payload.value())
+        self.settings.setValue("Block/Enabled", self.block_checkbox.isChecked())
+        self.settings.setValue("Forwarder/Enabled", self.forwarder_checkbox.isChecked())
+        self.settings.setValue("Routing/Enabled", self.routing_checkbox.isChecked())
+        self.settings.setValue("Tray/SuspendAfter", self.suspend_after.value())
+        self.settings.setValue("Tray/DiscardAboveMB", self.discard_above.value())
+        self.settings.setValue("Cache/SizeMB", self.cache_size.value())
+        self.settings.setValue("Assets/Enabled", self.assets_checkbox.isChecked())
+        self.settings.setValue("Assets/SizeMB", self.assets_size.value())
+        self.settings.setValue("Render/LowResource", self.render_checkbox.isChecked())
+        self.settings.setValue("Render/RendererLimit", self.renderer_limit.value())
+        self.settings.setValue("Render/GPU", self.render_gpu.currentText())
+        self.settings.setValue("Render/ReduceMotion", self.reduce_motion_checkbox.isChecked())
+        self.settings.setValue("Render/BlockAutoplay", self.block_autoplay_checkbox.isChecked())
+        self.settings.setValue("Render/TimerFloorMs", self.timer_floor.value())
+        self.settings.setValue("Network/JsonlFile", self.network_jsonl_file.text().strip())
+        self.settings.setValue("Network/PrometheusFile", self.network_prometheus_file.text().strip())
+        self.apply_probe_mode()
+        self.ping_graph.worker.scheduler.config = load_schedule_config(self.settings)
+        self.settings_saved.emit()
         self.update_proxy_details()
 
+    def apply_probe_mode(self):
+        configure_probe_engine(self.ping_graph.worker.engine, self.settings, self.probe_mode.currentText())
+
+    def update_forwarder_status(self):
+        if self.forwarder is None:
+            self.forwarder_label.setText("")
+            return
+        lines = ["Upstream throughput:"]
+        for name, stats in self.forwarder.stats().items():
+            lines.append(
+                f"{name}: {stats['active']} open, down {stats['down_rate'] / 1024:.0f} KB/s, "
+                f"up {stats['up_rate'] / 1024:.0f} KB/s, {stats['failures']} failed")
+        routes = self.forwarder.routes
+        if routes is not None:
+            counts, winners = routes.stats()
+            lines.append(f"Routes: {len(routes.table[0])} rules, default {routes.table[1]}")
+            if counts:
+                lines.append("Routed: " + ", ".join(f"{route} {count}" for route, count in sorted(counts.items())))
+            if winners:
+                lines.append("Race winners: " + ", ".join(f"{host} {route}" for host, route in sorted(winners.items())))
+        self.forwarder_label.setText("\n".join(lines))
+
+    def update_network_stats(self):
+        if not self.isVisible() or self.tabs.currentWidget() is not self.network_tab:
+            return
+        if self.network is None:
+            self.network_label.setText("Network statistics are collected by the Discord window.")
+            return
+        rows = self.network.rows(WINDOWS[self.network_window.currentText()])
+        requests = sum(counters["requests"] for _, _, counters in rows)
+        size = sum(counters["bytes"] for _, _, counters in rows)
+        errors = sum(error_count(counters) for _, _, counters in rows)
+        self.network_label.setText(
+            f"{len(rows)} hosts and types, {requests} requests, {size / 1048576:.1f} MB, {errors} errors")
+        self.network_table.setRowCount(len(rows))
+        for row, (host, resource_type, counters) in enumerate(rows):
+            values = (host, resource_type, counters["requests"], counters["blocked"],
+                      f"{counters['bytes'] / 1048576:.2f}", error_count(counters))
+            for column, value in enumerate(values):
+                self.network_table.setItem(row, column, QTableWidgetItem(str(value)))
+        self.network_table.resizeColumnsToContents()
+
+    def export_network_jsonl(self):
+        if self.network is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export JSON Lines", "NetworkStats.jsonl",
+                                              "JSON lines (*.jsonl);;All files (*)")
+        if path:
+            try:
+                self.network.write_jsonl(path, WINDOWS[self.network_window.currentText()])
+            except OSError as e:
+                QMessageBox.warning(self, "Export Failed", f"Could not write {path}:\n{e}")
+
+    def export_network_prometheus(self):
+        if self.network is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Prometheus", "byeblock.prom",
+                                              "Prometheus text (*.prom);;All files (*)")
+        if path:
+            try:
+                self.network.write_prometheus(path)
+            except OSError as e:
+                QMessageBox.warning(self, "Export Failed", f"Could not write {path}:\n{e}")
+
+    def gateway_status(self, name):
+        gateway = self.ping_graph.worker.engine.gateway
+        if gateway is None or self.probe_mode.currentText() != "gateway":
+            return ""
+        stats = gateway.stats().get(name)
+        if stats is None:
+            return ""
+        text = (f"\nGateway: held {stats['held_s']:.0f} s, {stats['disconnects']} disconnects "
+                f"and {stats['stalls']} stalls in {stats['opened']} connections")
+        if stats["detect_ms"] is not None:
+            text += f", last stall noticed after {stats['detect_ms'] / 1000:.1f} s"
+        return text
+
     def update_proxy_details(self):
-        proxy_server = self.proxy_combobox.currentText()
-        host = self.settings.value(f"Proxy/{proxy_server}/Host", "None")
-        port = self.settings.value(f"Proxy/{proxy_server}/Port", "None")
+        target = self.registry.get(self.selected_proxy)
+        host = target.host if target else "None"
+        port = target.port if target else "None"
         self.proxy_status_label.setText(f"Proxy Status:\nHost: {host}, Port: {port}")
 
     def get_proxy_info(self):
-        proxy_server = self.proxy_combobox.currentText()
-        host = self.settings.value(f"Proxy/{proxy_server}/Host", "None")
-        port = self.settings.value(f"Proxy/{proxy_server}/Port", "None")
-
-        if host != "None" and port != "None":
-            return {"host": host, "port": int(port)}
+        target = self.registry.get(self.selected_proxy)
+        if target is not None:
+            return {"name": target.name, "host": target.host, "port": target.port}
         return None
 
+    def get_proxies(self):
+        return self.registry.all()
+
+    def update_sweep_status(self, results):
+        # Proxies are probed at their own pace, so keep the latest result of each
+        for result in results:
+            self.latest_results[result.proxy] = result
+        names = set(self.registry.names())
+        for name in set(self.latest_results) - names:
+            del self.latest_results[name]
+        results = list(self.latest_results.values())
+        alive = [result for result in results if result.ok]
+        text = f"Proxy Status:\nAlive: {len(alive)}/{len(results)}"
+        if alive:
+            best = min(alive, key=lambda result: result.ms)
+            text += f", Best: {best.proxy} {best.ms:.0f}ms"
+        proxy_info = self.get_proxy_info()
+        if proxy_info:
+            for result in results:
+                if result.proxy == proxy_info['name']:
+                    ping = f"{result.ms:.0f}ms" if result.ok else result.error
+                    text += f"\nSelected: {result.proxy} {ping}"
+                    if result.phases:
+                        text += "\n" + " / ".join(
+                            f"{phase} {result.phases[phase]:.0f}" for phase in PHASES if phase in result.phases)
+                        if result.ok and result.phases.get("dns", 0) > result.ms:
+                            text += "\nThe name lookup took longer than the connection"
+                    text += self.gateway_status(result.proxy)
+        text += self.dns_status(results)
+        self.proxy_status_label.setText(text)
+
+    def dns_status(self, results):
+        stats = RESOLVER.stats()
+        if not stats["lookups"]:
+            return ""
+        text = (f"\nDNS: {stats['hosts']} hosts cached, {stats['hit_rate']:.0%} hits, "
+                f"lookups {stats['lookup_ms']:.0f}ms")
+        failing = sum(1 for result in results if result.error == "DNSError")
+        if failing:
+            text += f", {failing} proxies fail on DNS"
+        return text
+
 def main():
+    register_asset_scheme()
+    # Chromium reads its switches once, when the QApplication starts it
+    apply_chromium_flags(load_render_config(QSettings("Settings.ini", QSettings.IniFormat)))
     app = QApplication(sys.argv)
 
     palette = QPalette()
@@ -600,6 +2463,8 @@ def main():
 
     discord_browser = DiscordBrowser(app)
     discord_browser.show()
+    if "--startup-timing" in sys.argv:
+        discord_browser.startup_timing = StartupTiming(app, discord_browser)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
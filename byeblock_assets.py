@@ -0,0 +1,186 @@
+"""Local store for Discord's immutable static assets.
+
+Files under /assets/ carry a content hash in their name, so once fetched
+they never change. They are kept here by the SHA-256 of their content,
+with an index from URL to hash, and the least recently used ones are
+dropped when the store grows over max_bytes. Two URLs with the same
+content share one file.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+ASSET_DIR = "Assets"
+ASSET_HOSTS = ("discord.com", "canary.discord.com", "ptb.discord.com", "discordapp.com")
+ASSET_PATH = re.compile(
+    r"^/assets/(?:[\w.-]+\.)?[0-9a-f]{8,}(?:\.[\w-]+)*"
+    r"\.(?:js|css|svg|png|jpe?g|gif|webp|webm|mp3|ogg|wasm|woff2?|ttf)$")
+FETCH_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    url TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER NOT NULL, mime TEXT NOT NULL, used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_used ON assets (used);
+CREATE INDEX IF NOT EXISTS assets_digest ON assets (digest);
+"""
+
+
+class AssetStore:
+    """Content-addressed asset files with an LRU index.
+
+    Safe to share between threads. fetch() serves a stored asset or
+    downloads and stores it; the counters say how many bytes were served
+    locally instead of crossing the proxy.
+    """
+
+    def __init__(self, root=ASSET_DIR, max_bytes=256 * 1048576, hosts=ASSET_HOSTS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hosts = hosts
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=10, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.executescript(SCHEMA)
+        self.total = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) size FROM assets GROUP BY digest)").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.saved_bytes = 0
+        self.fetched_bytes = 0
+        # requests.Session is not thread-safe, each fetch thread gets its own
+        self.local = threading.local()
+        self.sessions = []
+
+    def matches(self, url):
+        parts = urlsplit(url)
+        return (parts.scheme in ("http", "https") and parts.hostname in self.hosts
+                and not parts.query and ASSET_PATH.match(parts.path) is not None)
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def get(self, url):
+        """Return (data, mime) of a stored asset, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT digest, mime FROM assets WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            with self.db:
+                self.db.execute("UPDATE assets SET used = ? WHERE url = ?", (time.time(), url))
+        digest, mime = row
+        try:
+            with open(self.object_path(digest), "rb") as file:
+                data = file.read()
+        except OSError:
+            self.forget(url)
+            return None
+        with self.lock:
+            self.hits += 1
+            self.saved_bytes += len(data)
+        return data, mime
+
+    def put(self, url, data, mime):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp, "wb") as file:
+                file.write(data)
+            os.replace(temp, path)
+        with self.lock:
+            with self.db:
+                shared = self.db.execute("SELECT 1 FROM assets WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+                replaced = self.db.execute("SELECT digest FROM assets WHERE url = ?", (url,)).fetchone()
+                self.db.execute("INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?)",
+                                (url, digest, len(data), mime, time.time()))
+                if shared is None:
+                    self.total += len(data)
+                if replaced is not None and replaced[0] != digest:
+                    self.drop_unused(replaced[0])
+            self.evict()
+
+    def forget(self, url):
+        with self.lock:
+            with self.db:
+                row = self.db.execute("SELECT digest FROM assets WHERE url = ?", (url,)).fetchone()
+                if row is None:
+                    return
+                self.db.execute("DELETE FROM assets WHERE url = ?", (url,))
+                self.drop_unused(row[0])
+
+    def drop_unused(self, digest):
+        # Called with the lock held, inside a transaction
+        if self.db.execute("SELECT 1 FROM assets WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return
+        path = self.object_path(digest)
+        try:
+            self.total -= os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Drop least recently used assets until the store fits max_bytes."""
+        with self.db:
+            while self.total > self.max_bytes:
+                row = self.db.execute("SELECT url, digest FROM assets ORDER BY used LIMIT 1").fetchone()
+                if row is None:
+                    self.total = 0
+                    break
+                self.db.execute("DELETE FROM assets WHERE url = ?", (row[0],))
+                self.drop_unused(row[1])
+
+    def fetch(self, url, proxy_url=None, timeout=FETCH_TIMEOUT):
+        """Return (data, mime) from the store, downloading the asset first if needed."""
+        stored = self.get(url)
+        if stored is not None:
+            return stored
+        proxies = {"http": proxy_url, "https": proxy_url} if proxy_url else None
+        response = self.thread_session().get(url, proxies=proxies, timeout=timeout)
+        response.raise_for_status()
+        data = response.content
+        mime = response.headers.get("Content-Type", "application/octet-stream").split(";")[0].strip()
+        with self.lock:
+            self.misses += 1
+            self.fetched_bytes += len(data)
+        self.put(url, data, mime)
+        return data, mime
+
+    def thread_session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            import requests
+
+            session = self.local.session = requests.Session()
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def stats(self):
+        with self.lock:
+            files = self.db.execute("SELECT COUNT(DISTINCT digest) FROM assets").fetchone()[0]
+            return {
+                "files": files,
+                "bytes": self.total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "saved_bytes": self.saved_bytes,
+                "fetched_bytes": self.fetched_bytes,
+            }
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions.clear()
+            self.db.close()
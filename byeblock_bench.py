@@ -0,0 +1,360 @@
+"""Benchmarks of the probe path, the graph series, the registry and startup.
+
+    python byeblock_bench.py [--only probe,graph,...] [--delay MS] [--loss %] [--rate KB/s]
+
+Probes go through local stand-in HTTP and SOCKS5 proxies (see
+byeblock_standins) to a local origin, so runs do not depend on the
+network and the injected delay, loss and bandwidth cap are the only
+differences between proxies. Every measurement is appended to
+Benchmarks.jsonl as one JSON line tagged with the run, and --compare
+prints the last run next to the one before it.
+
+    probe       sweeps of 1, 50 and 1000 proxies with the ProbeEngine
+    throughput  measure_throughput through a proxy with the bandwidth cap
+    graph       RingSeries appends and the data side of a graph redraw
+    registry    loading Settings.ini proxies and looking them up
+    startup     cold start of the headless --probe and, with QtWebEngine,
+                of the window with --startup-timing
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = ("probe", "throughput", "graph", "registry", "startup")
+PROXY_COUNTS = (1, 50, 1000)
+RESULTS_FILE = "Benchmarks.jsonl"
+MAIN_SCRIPT = "ByeBlock-Discord-0.0.0.2.py"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def timed(function, repeat):
+    """Return the seconds per call of function, best of three batches."""
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        seconds = (time.perf_counter() - start) / repeat
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def bench_targets(count, servers):
+    """count ProxyTargets spread over the stand-in proxies, each with its own name."""
+    from byeblock_probe import ProxyTarget
+
+    return [ProxyTarget(f"bench-{index:04d}", "127.0.0.1", server.port, server.type)
+            for index, server in zip(range(count), itertools.cycle(servers))]
+
+
+def bench_probe(args):
+    from byeblock_probe import ProbeEngine
+    from byeblock_standins import start_origin, start_proxy
+
+    origin = start_origin()
+    servers = [start_proxy(proxy_type, args.delay / 1000, args.loss / 100)
+               for proxy_type in ("HTTP", "SOCKS5")]
+    records = []
+    try:
+        for count in args.proxies:
+            targets = bench_targets(count, servers)
+            engine = ProbeEngine(timeout=args.timeout)
+            engine.phase_url = f"http://127.0.0.1:{origin.port}/"
+            try:
+                engine.sweep(targets[:min(count, 32)])
+                results = []
+                start = time.perf_counter()
+                for _ in range(args.rounds):
+                    results += engine.sweep(targets)
+                seconds = time.perf_counter() - start
+            finally:
+                engine.close()
+            latencies = [result.ms for result in results if result.ok]
+            records.append({
+                "bench": "probe",
+                "params": {"proxies": count, "rounds": args.rounds, "delay_ms": args.delay, "loss": args.loss},
+                "probes_per_s": len(results) / seconds,
+                "sweep_ms": seconds / args.rounds * 1000,
+                "p50_ms": percentile(latencies, 0.5),
+                "p95_ms": percentile(latencies, 0.95),
+                "ok_share": len(latencies) / len(results) if results else 0,
+            })
+    finally:
+        for server in servers + [origin]:
+            server.stop()
+    return records
+
+
+def bench_throughput(args):
+    from byeblock_standins import start_origin, start_proxy
+    from byeblock_throughput import measure_throughput
+
+    origin = start_origin()
+    records = []
+    try:
+        for proxy_type in ("HTTP", "SOCKS5"):
+            server = start_proxy(proxy_type, rate=args.rate * 1024)
+            try:
+                target = bench_targets(1, [server])[0]
+                result = measure_throughput(target, f"http://127.0.0.1:{origin.port}/?bytes={{bytes}}",
+                                            payload=1 << 30, streams=2, duration=2)
+            finally:
+                server.stop()
+            records.append({
+                "bench": "throughput",
+                "params": {"type": proxy_type, "streams": 2, "cap_kb_s": args.rate},
+                "sustained_kb_s": result.sustained / 1024,
+                "peak_kb_s": result.peak / 1024,
+                "ok": result.ok,
+            })
+    finally:
+        origin.stop()
+    return records
+
+
+def bench_graph(args):
+    import numpy as np
+    from byeblock_probe import PHASES
+    from byeblock_series import RingSeries, decimate
+
+    records = []
+    # Eight hours at one sample a second, as ProxyPingGraph keeps
+    series = RingSeries(8 * 3600, ("total",) + PHASES)
+    row = [120.0, 5.0, 20.0, 45.0, 80.0, 120.0]
+    now = time.time()
+    count = series.capacity
+    start = time.perf_counter()
+    for index in range(count):
+        series.append(row, now - count + index)
+    seconds = time.perf_counter() - start
+    records.append({
+        "bench": "graph",
+        "params": {"step": "append", "columns": len(row)},
+        "samples_per_s": count / seconds,
+        "us_per_sample": seconds / count * 1e6,
+    })
+
+    for window in (60, 3600, 8 * 3600):
+        for mode in ("min/max", "p95"):
+            def redraw():
+                times, values = series.window(window, now)
+                decimate(times, values, 1000, mode)
+                series.stats(window, now=now)
+
+            with np.errstate(invalid="ignore"):
+                seconds = timed(redraw, 20)
+            records.append({
+                "bench": "graph",
+                "params": {"step": "redraw", "window_s": window, "mode": mode, "points": 1000},
+                "ms_per_redraw": seconds * 1000,
+            })
+    return records
+
+
+def write_settings(path, count):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[Proxy]\n")
+        for index in range(count):
+            name = f"bench-{index:04d}"
+            file.write(f"{name}\\Host=10.{index // 65536}.{index // 256 % 256}.{index % 256}\n")
+            file.write(f"{name}\\Port={8000 + index % 1000}\n")
+            file.write(f"{name}\\Type={'SOCKS5' if index % 2 else 'HTTP'}\n")
+
+
+def bench_registry(args):
+    from byeblock_registry import DeferredSettings, IniSettings, ProxyRegistry
+
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.proxies:
+            path = os.path.join(directory, f"Settings-{count}.ini")
+            write_settings(path, count)
+            settings = DeferredSettings(IniSettings(path))
+            registry = ProxyRegistry(settings)
+            targets = registry.all()
+            middle = targets[len(targets) // 2]
+            repeat = 10000
+
+            def proxy_info():
+                target = registry.get(middle.name)
+                return {"name": target.name, "host": target.host, "port": target.port}
+
+            records.append({
+                "bench": "registry",
+                "params": {"proxies": count},
+                "load_ms": timed(lambda: ProxyRegistry(settings), 3) * 1000,
+                "names_us": timed(registry.names, 1000) * 1e6,
+                "get_proxy_info_us": timed(proxy_info, repeat) * 1e6,
+                "find_us": timed(lambda: registry.find(middle.host, middle.port), repeat) * 1e6,
+                "settings_value_us": timed(lambda: settings.value(f"Proxy/{middle.name}/Port", 0, type=int),
+                                           repeat) * 1e6,
+            })
+    return records
+
+
+def run_startup(command, timeout):
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=HERE, capture_output=True, text=True, timeout=timeout)
+    return (time.perf_counter() - start) * 1000, completed
+
+
+def bench_startup(args):
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        empty = os.path.join(directory, "Settings.ini")
+        open(empty, "w").close()
+        command = [sys.executable, MAIN_SCRIPT, "--probe", "--settings", empty]
+        runs = [run_startup(command, 60)[0] for _ in range(args.startup_runs)]
+        records.append({
+            "bench": "startup",
+            "params": {"mode": "probe", "runs": args.startup_runs},
+            "median_ms": statistics.median(runs),
+            "min_ms": min(runs),
+        })
+
+    if args.no_window:
+        return records
+    record = {"bench": "startup", "params": {"mode": "window"}}
+    try:
+        import PyQt5.QtWebEngineWidgets  # noqa: F401
+    except ImportError as e:
+        record["error"] = f"no QtWebEngine: {e}"
+        return records + [record]
+    try:
+        ms, completed = run_startup([sys.executable, MAIN_SCRIPT, "--startup-timing"], 120)
+    except subprocess.TimeoutExpired:
+        record["error"] = "Timeout"
+        return records + [record]
+    timings = None
+    for line in completed.stdout.splitlines():
+        try:
+            timings = json.loads(line)
+        except ValueError:
+            continue
+    if not isinstance(timings, dict):
+        record["error"] = f"no timing line, exit status {completed.returncode}"
+    else:
+        record.update({key: value for key, value in timings.items() if key.endswith("_ms")})
+        record["process_ms"] = ms
+    return records + [record]
+
+
+def run_info():
+    info = {
+        "run": time.strftime("%Y%m%d-%H%M%S"),
+        "time": round(time.time(), 3),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+    try:
+        info["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                        capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        info["commit"] = None
+    return info
+
+
+def record_key(record):
+    return record["bench"], json.dumps(record["params"], sort_keys=True)
+
+
+def compare(path):
+    """Print every number of the last run next to the run before it."""
+    runs = {}
+    try:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                runs.setdefault(record["run"], []).append(record)
+    except FileNotFoundError:
+        pass
+    if len(runs) < 2:
+        print(f"Need two runs in {path} to compare", file=sys.stderr)
+        return 1
+    before, after = (runs[run] for run in sorted(runs)[-2:])
+    old = {record_key(record): record for record in before}
+    for record in after:
+        previous = old.get(record_key(record), {})
+        print(f"{record['bench']} {record['params']}")
+        for name, value in record.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or name == "time":
+                continue
+            base = previous.get(name)
+            change = ""
+            if isinstance(base, (int, float)) and base:
+                change = f" ({(value - base) / base:+.1%})"
+            print(f"    {name}: {format_number(base)} -> {format_number(value)}{change}")
+    return 0
+
+
+def format_number(value):
+    if value is None:
+        return "-"
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="byeblock_bench", description="Benchmark ByeBlock-Discord.")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help="comma-separated benchmarks to run (default: %(default)s)")
+    parser.add_argument("--proxies", default=",".join(map(str, PROXY_COUNTS)),
+                        help="proxy counts of the probe and registry benchmarks (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=3, help="sweeps per proxy count (default: 3)")
+    parser.add_argument("--timeout", type=float, default=5, help="seconds per probe (default: 5)")
+    parser.add_argument("--delay", type=float, default=0, help="ms the stand-in proxies wait before answering")
+    parser.add_argument("--loss", type=float, default=0, help="%% of connections the stand-in proxies drop")
+    parser.add_argument("--rate", type=float, default=2048,
+                        help="KB/s cap per connection of the throughput proxies (default: %(default)s)")
+    parser.add_argument("--startup-runs", type=int, default=3, help="cold starts of --probe (default: 3)")
+    parser.add_argument("--no-window", action="store_true", help="skip the --startup-timing run of the window")
+    parser.add_argument("--out", default=RESULTS_FILE, help="results file (default: %(default)s)")
+    parser.add_argument("--compare", action="store_true", help="compare the last two runs in --out and exit")
+    args = parser.parse_args(argv)
+    args.only = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(args.only) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+    args.proxies = [int(count) for count in args.proxies.split(",")]
+    return args
+
+
+def bench_main(argv):
+    args = parse_args(argv)
+    if args.compare:
+        return compare(args.out)
+    sys.path.insert(0, HERE)
+    info = run_info()
+    benches = {"probe": bench_probe, "throughput": bench_throughput, "graph": bench_graph,
+               "registry": bench_registry, "startup": bench_startup}
+    with open(args.out, "a", encoding="utf-8") as file:
+        for name in args.only:
+            print(f"Running {name}...", file=sys.stderr)
+            for record in benches[name](args):
+                record = {**info, **record}
+                line = json.dumps(record)
+                print(line, flush=True)
+                file.write(line + "\n")
+                file.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(bench_main(sys.argv[1:]))
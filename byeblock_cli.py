@@ -0,0 +1,140 @@
+"""Headless proxy checks for jump hosts and cron.
+
+    python ByeBlock-Discord-0.0.0.2.py --probe [--format jsonl|csv] [--rounds N] ...
+
+Reads the proxies and the health limits from Settings.ini without Qt,
+probes every proxy concurrently with the same engine as the app and
+writes one line per result to stdout. The exit status says how healthy
+the proxies were:
+
+    0  every proxy is healthy
+    1  some proxies are unhealthy
+    2  no proxy is healthy
+    3  no proxy to probe
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+
+from byeblock_dns import configure_resolver
+from byeblock_probe import ProbeEngine, PROBE_MODES, PHASES
+from byeblock_registry import IniSettings, read_proxy_targets
+from byeblock_selector import ProxySelector, FailoverConfig
+
+EXIT_HEALTHY = 0
+EXIT_DEGRADED = 1
+EXIT_DOWN = 2
+EXIT_NO_PROXIES = 3
+
+# Phase columns get a suffix, "proxy" is already the name of the proxy
+CSV_FIELDS = ("time", "proxy", "host", "port", "type", "ok", "ms", "error") + tuple(f"{phase}_ms" for phase in PHASES)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="ByeBlock-Discord --probe",
+                                     description="Probe the proxies stored in Settings.ini.")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--settings", default="Settings.ini", help="settings file (default: %(default)s)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--mode", choices=PROBE_MODES, default=None,
+                        help="probe mode (default: Probe/Mode from the settings, or phases)")
+    parser.add_argument("--proxy", action="append", default=[], metavar="NAME",
+                        help="probe only this proxy; may be given more than once")
+    parser.add_argument("--rounds", type=int, default=1, help="sweeps over all proxies (default: 1)")
+    parser.add_argument("--interval", type=float, default=1, help="seconds between sweeps (default: 1)")
+    parser.add_argument("--timeout", type=float, default=5, help="seconds per probe (default: 5)")
+    parser.add_argument("--max-latency", type=float, default=None,
+                        help="healthy up to this median ms (default: Failover/MaxLatency or 800)")
+    parser.add_argument("--max-loss", type=float, default=None,
+                        help="healthy up to this loss in %% (default: Failover/MaxLoss or 30)")
+    parser.add_argument("--history", action="store_true", help="also store the results in ProbeHistory.sqlite")
+    return parser.parse_args(argv)
+
+
+def result_row(result, target):
+    row = {
+        "time": round(result.timestamp, 3),
+        "proxy": result.proxy,
+        "host": target.host,
+        "port": target.port,
+        "type": target.type,
+        "ok": result.ok,
+        "ms": round(result.ms, 1) if result.ok else None,
+        "error": result.error,
+    }
+    for phase in PHASES:
+        row[f"{phase}_ms"] = round(result.phases[phase], 1) if phase in result.phases else None
+    return row
+
+
+def probe_main(argv):
+    args = parse_args(argv)
+    settings = IniSettings(args.settings)
+    configure_resolver(settings)
+    targets = read_proxy_targets(settings)
+    if args.proxy:
+        targets = [target for target in targets if target.name in args.proxy]
+    if not targets:
+        print(f"No proxies to probe in {args.settings}", file=sys.stderr)
+        return EXIT_NO_PROXIES
+
+    config = FailoverConfig(
+        max_latency=args.max_latency if args.max_latency is not None
+        else settings.value("Failover/MaxLatency", 800, type=int),
+        max_loss=(args.max_loss if args.max_loss is not None
+                  else settings.value("Failover/MaxLoss", 30, type=int)) / 100,
+        min_samples=1,
+    )
+    selector = ProxySelector(config, window=max(1, args.rounds))
+    engine = ProbeEngine(timeout=args.timeout, mode=args.mode or settings.value("Probe/Mode", "phases"))
+    if engine.mode == "gateway":
+        gateway = engine.gateway_probe()
+        gateway.url = settings.value("Probe/GatewayURL", "") or gateway.url
+        gateway.stall_timeout = settings.value("Probe/StallTimeout", gateway.stall_timeout, type=float)
+    history = None
+    if args.history:
+        from byeblock_history import ProbeHistory
+        history = ProbeHistory(raw_hours=settings.value("History/RawHours", 24, type=int),
+                               keep_days=settings.value("History/KeepDays", 30, type=int))
+
+    by_name = {target.name: target for target in targets}
+    writer = None
+    if args.format == "csv":
+        writer = csv.DictWriter(sys.stdout, CSV_FIELDS, lineterminator="\n")
+        writer.writeheader()
+
+    def emit(result):
+        row = result_row(result, by_name[result.proxy])
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            sys.stdout.write(json.dumps(row) + "\n")
+        sys.stdout.flush()
+
+    try:
+        for round_number in range(args.rounds):
+            if round_number:
+                time.sleep(args.interval)
+            results = engine.sweep(targets, emit)
+            selector.add_all(results)
+            if history is not None:
+                history.append(results)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+        if history is not None:
+            history.close()
+
+    healthy = [name for name in by_name if name in selector.history and selector.is_healthy(name)]
+    print(f"{len(healthy)}/{len(by_name)} proxies healthy", file=sys.stderr)
+    if len(healthy) == len(by_name):
+        return EXIT_HEALTHY
+    return EXIT_DEGRADED if healthy else EXIT_DOWN
+
+
+if __name__ == "__main__":
+    sys.exit(probe_main(sys.argv[1:]))
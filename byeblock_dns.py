@@ -0,0 +1,195 @@
+"""Shared DNS cache of the probes, the throughput test and the forwarder.
+
+Name lookups are kept for DNS/TTL seconds and failed ones for
+DNS/NegativeTTL, so a sweep over a thousand proxies does not ask the
+system resolver a thousand times, and a blocked name fails at once
+instead of timing out on every probe. Lookups of the same name that
+overlap share one call. prefetch() resolves the stored proxy hosts on a
+background thread before their entries run out, so probes find them in
+the cache.
+
+getaddrinfo does not tell the record's TTL, so one TTL is used for all.
+Addresses are cached per host and the port is filled in on the way out.
+
+SOCKS5H proxies resolve the target themselves; only their own host name
+goes through here.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DNS_TTL = 300
+NEGATIVE_TTL = 30
+MAX_ENTRIES = 4096
+PREFETCH_INTERVAL = 5
+
+
+class Resolver:
+    def __init__(self, ttl=DNS_TTL, negative_ttl=NEGATIVE_TTL, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # host: (expires, addresses or the gaierror)
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.pool = None
+        self.prefetched_at = 0
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.lookup_ms = 0.0
+        self.slowest = None
+
+    def getaddrinfo(self, host, port):
+        """Like socket.getaddrinfo(host, port, type=SOCK_STREAM), from the cache when possible."""
+        if is_address(host):
+            return socket.getaddrinfo(host, port, type=socket.SOCK_STREAM, flags=socket.AI_NUMERICHOST)
+        return with_port(self.lookup(host), port)
+
+    def cached(self, host, port):
+        """The cached addresses of host, or None when it has to be looked up."""
+        if is_address(host):
+            return self.getaddrinfo(host, port)
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry is None or entry[0] < time.monotonic() or isinstance(entry[1], Exception):
+                return None
+            self.hits += 1
+            return with_port(entry[1], port)
+
+    def lookup(self, host):
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry is not None and entry[0] >= time.monotonic():
+                self.hits += 1
+                self.entries.move_to_end(host)
+                if isinstance(entry[1], Exception):
+                    # A fresh one, so tracebacks do not pile up on the cached error
+                    raise socket.gaierror(*entry[1].args)
+                return entry[1]
+            future = self.inflight.get(host)
+            owner = future is None
+            if owner:
+                future = self.inflight[host] = Future()
+        if not owner:
+            return future.result()
+        try:
+            addresses = self.resolve(host)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[host]
+        future.set_result(addresses)
+        return addresses
+
+    def resolve(self, host):
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            self.store(host, e, self.negative_ttl, start)
+            raise
+        self.store(host, addresses, self.ttl, start)
+        return addresses
+
+    def store(self, host, value, ttl, start):
+        ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.misses += 1
+            if isinstance(value, Exception):
+                self.failures += 1
+            # Mean over the last lookups, a new one weighs a tenth
+            self.lookup_ms = ms if self.misses == 1 else self.lookup_ms * 0.9 + ms * 0.1
+            if self.slowest is None or ms > self.slowest[1]:
+                self.slowest = (host, ms)
+            self.entries[host] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(host)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def prefetch(self, hosts):
+        """Look up hosts in the background whose entries are missing or run out soon.
+
+        Cheap to call often: it does nothing for PREFETCH_INTERVAL seconds
+        after the previous call.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if now - self.prefetched_at < PREFETCH_INTERVAL:
+                return
+            self.prefetched_at = now
+            due = set()
+            for host in hosts:
+                if host in due or host in self.inflight or is_address(host):
+                    continue
+                entry = self.entries.get(host)
+                # Refreshed a quarter of the TTL early so probes keep hitting the cache
+                if entry is None or entry[0] - now < self.ttl / 4:
+                    due.add(host)
+            if due and self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dns")
+        for host in due:
+            self.pool.submit(self.refresh, host)
+
+    def refresh(self, host):
+        with self.lock:
+            if host in self.inflight:
+                return
+            self.inflight[host] = future = Future()
+        try:
+            future.set_result(self.resolve(host))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.inflight[host]
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            live = [value for expires, value in self.entries.values() if expires >= now]
+            lookups = self.hits + self.misses
+            return {
+                "hosts": sum(1 for value in live if not isinstance(value, Exception)),
+                "failing": sum(1 for value in live if isinstance(value, Exception)),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "lookups": lookups,
+                "failures": self.failures,
+                "lookup_ms": self.lookup_ms,
+                "slowest": self.slowest,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def is_address(host):
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def with_port(addresses, port):
+    # Both IPv4 (host, port) and IPv6 (host, port, flowinfo, scope_id) sockaddrs
+    return [(family, kind, proto, canonname, (address[0], port) + tuple(address[2:]))
+            for family, kind, proto, canonname, address in addresses]
+
+
+def configure_resolver(settings, resolver=None):
+    """Apply DNS/TTL and DNS/NegativeTTL from a QSettings-like object."""
+    resolver = resolver or RESOLVER
+    resolver.ttl = settings.value("DNS/TTL", DNS_TTL, type=int)
+    resolver.negative_ttl = settings.value("DNS/NegativeTTL", NEGATIVE_TTL, type=int)
+
+
+RESOLVER = Resolver()
@@ -0,0 +1,451 @@
+"""Local forwarding proxy that spreads connections over several upstreams.
+
+The web view talks to one local port (HTTP CONNECT or SOCKS5, sniffed
+from the first byte). Every new client connection is sent to the healthy
+upstream proxy with the fewest open tunnels. A few idle TCP connections
+to each upstream are kept open so a new tunnel skips the connect to the
+proxy itself.
+
+With a RouteTable set as routes, each tunnel is sent through the
+proxies, straight to the host, or both at once with the faster path kept,
+depending on the host.
+
+Names are looked up through the shared cache of byeblock_dns. Upstream
+SOCKS5 proxies get the address of the target, SOCKS5H proxies its name.
+
+Everything runs on one asyncio loop in a daemon thread. Use the public
+methods from any thread.
+"""
+
+import asyncio
+import struct
+import threading
+import time
+from collections import deque
+
+from byeblock_dns import RESOLVER
+from byeblock_probe import SOCKS_TYPES, socks5_destination
+
+POOL_SIZE = 2
+IDLE_TIMEOUT = 30
+FAILURE_COOLDOWN = 30
+CONNECT_TIMEOUT = 10
+BUFFER_SIZE = 64 * 1024
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class Upstream:
+    def __init__(self, target):
+        self.target = target
+        self.idle = deque()
+        self.active = 0
+        self.connections = 0
+        self.failures = 0
+        self.failed_at = -FAILURE_COOLDOWN
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.rate_mark = (time.monotonic(), 0, 0)
+
+    def rates(self):
+        """Return (up, down) bytes per second since the previous call."""
+        now = time.monotonic()
+        then, up, down = self.rate_mark
+        self.rate_mark = (now, self.bytes_up, self.bytes_down)
+        elapsed = max(now - then, 1e-6)
+        return (self.bytes_up - up) / elapsed, (self.bytes_down - down) / elapsed
+
+    def failed(self):
+        self.failures += 1
+        self.failed_at = time.monotonic()
+
+    def cooling_down(self):
+        return time.monotonic() - self.failed_at < FAILURE_COOLDOWN
+
+
+async def resolve(host, port):
+    """The addresses of host; lookups the cache cannot answer run on a worker thread."""
+    addresses = RESOLVER.cached(host, port)
+    if addresses is None:
+        addresses = await asyncio.get_running_loop().run_in_executor(None, RESOLVER.getaddrinfo, host, port)
+    return list(dict.fromkeys(address[4][0] for address in addresses))
+
+
+async def open_connection(host, port, timeout=CONNECT_TIMEOUT):
+    """Connect to the addresses of host in turn until one answers."""
+    addresses = await asyncio.wait_for(resolve(host, port), timeout)
+    for address in addresses[:-1]:
+        try:
+            return await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+        except OSError:
+            pass
+    return await asyncio.wait_for(asyncio.open_connection(addresses[-1], port), timeout)
+
+
+async def open_upstream(target, timeout=CONNECT_TIMEOUT):
+    """Open a TCP connection to an upstream proxy, ready for a tunnel request."""
+    reader, writer = await open_connection(target.host, target.port, timeout)
+    if target.type in SOCKS_TYPES:
+        try:
+            writer.write(b"\x05\x02\x00\x02" if target.user else b"\x05\x01\x00")
+            method = await asyncio.wait_for(reader.readexactly(2), timeout)
+            if method == b"\x05\x02" and target.user:
+                user, password = target.user.encode(), target.password.encode()
+                writer.write(b"\x01" + bytes([len(user)]) + user + bytes([len(password)]) + password)
+                if (await asyncio.wait_for(reader.readexactly(2), timeout))[1] != 0:
+                    raise UpstreamError("SOCKS5 login refused")
+            elif method != b"\x05\x00":
+                raise UpstreamError("SOCKS5 authentication refused")
+        except BaseException:
+            writer.close()
+            raise
+    return reader, writer
+
+
+async def open_tunnel(reader, writer, target, host, port, timeout=CONNECT_TIMEOUT):
+    """Ask an open upstream connection to tunnel to host:port."""
+    if target.type in SOCKS_TYPES:
+        # SOCKS5H proxies look the name up themselves
+        address = (await asyncio.wait_for(resolve(host, port), timeout))[0] if target.type == "SOCKS5" else None
+        writer.write(b"\x05\x01\x00" + socks5_destination(host, address) + struct.pack(">H", port))
+        reply = await asyncio.wait_for(reader.readexactly(4), timeout)
+        if reply[1] != 0:
+            raise UpstreamError(f"SOCKS5 connect failed with code {reply[1]}")
+        if reply[3] == 1:
+            await reader.readexactly(4 + 2)
+        elif reply[3] == 4:
+            await reader.readexactly(16 + 2)
+        else:
+            await reader.readexactly((await reader.readexactly(1))[0] + 2)
+    else:
+        auth = f"Proxy-Authorization: {target.basic_auth()}\r\n" if target.user else ""
+        writer.write(f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n{auth}\r\n".encode())
+        reply = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        status = reply.split(b"\r\n", 1)[0].split()
+        if len(status) < 2 or status[1] != b"200":
+            raise UpstreamError(reply.split(b"\r\n", 1)[0].decode(errors="replace"))
+
+
+def split_host_port(value, default_port):
+    host, _, port = value.rpartition(":")
+    if not host or not port.isdigit():
+        return value.strip("[]"), default_port
+    return host.strip("[]"), int(port)
+
+
+class LocalForwarder:
+    def __init__(self, host="127.0.0.1", port=0, pool_size=POOL_SIZE, idle_timeout=IDLE_TIMEOUT, routes=None):
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.routes = routes
+        self.upstreams = {}
+        # Counters of the tunnels that bypass the proxies
+        self.direct = Upstream(None)
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    def start(self):
+        """Start serving and return the local port."""
+        self.thread = threading.Thread(target=self.run, name="forwarder", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self.port
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle_client, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.loop.create_task(self.maintain_pools())
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            for upstream in self.upstreams.values():
+                self.drain_pool(upstream)
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    def set_upstreams(self, targets):
+        """Use these ProxyTargets, best first. Counters of kept proxies survive."""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.replace_upstreams, list(targets))
+
+    def replace_upstreams(self, targets):
+        upstreams = {}
+        for target in targets:
+            upstream = self.upstreams.pop(target.name, None)
+            if upstream is None or upstream.target != target:
+                if upstream is not None:
+                    self.drain_pool(upstream)
+                upstream = Upstream(target)
+            upstreams[target.name] = upstream
+        for upstream in self.upstreams.values():
+            self.drain_pool(upstream)
+        self.upstreams = upstreams
+
+    def stats(self):
+        """Return {name: {active, connections, failures, bytes_up, bytes_down, up_rate, down_rate}}."""
+        stats = {}
+        upstreams = list(self.upstreams.items())
+        if self.direct.connections:
+            upstreams.append(("direct", self.direct))
+        for name, upstream in upstreams:
+            up_rate, down_rate = upstream.rates()
+            stats[name] = {
+                "active": upstream.active,
+                "connections": upstream.connections,
+                "failures": upstream.failures,
+                "bytes_up": upstream.bytes_up,
+                "bytes_down": upstream.bytes_down,
+                "up_rate": up_rate,
+                "down_rate": down_rate,
+            }
+        return stats
+
+    def drain_pool(self, upstream):
+        while upstream.idle:
+            upstream.idle.popleft()[1].close()
+
+    async def maintain_pools(self):
+        while True:
+            now = time.monotonic()
+            for upstream in list(self.upstreams.values()):
+                while upstream.idle and (now - upstream.idle[0][2] > self.idle_timeout
+                                         or upstream.idle[0][0].at_eof()):
+                    upstream.idle.popleft()[1].close()
+            await asyncio.gather(*(self.refill(upstream) for upstream in list(self.upstreams.values())))
+            await asyncio.sleep(1)
+
+    async def refill(self, upstream):
+        # A proxy that just failed is left alone until its cooldown is over
+        while len(upstream.idle) < self.pool_size and not upstream.cooling_down():
+            try:
+                reader, writer = await open_upstream(upstream.target)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, UpstreamError):
+                upstream.failed()
+                return
+            upstream.idle.append((reader, writer, time.monotonic()))
+
+    def candidates(self, types=None):
+        upstreams = [upstream for upstream in self.upstreams.values()
+                     if types is None or upstream.target.type in types]
+        # sorted() is stable, so ties keep the ranking order
+        return sorted(upstreams, key=lambda upstream: (upstream.cooling_down(), upstream.active))
+
+    async def take_connection(self, upstream):
+        while upstream.idle:
+            reader, writer, _ = upstream.idle.popleft()
+            if not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await open_upstream(upstream.target)
+
+    async def connect_via_any(self, host, port):
+        for upstream in self.candidates()[:3]:
+            try:
+                reader, writer = await self.take_connection(upstream)
+                try:
+                    await open_tunnel(reader, writer, upstream.target, host, port)
+                except BaseException:
+                    writer.close()
+                    raise
+                return upstream, reader, writer
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError, UpstreamError):
+                upstream.failed()
+        raise UpstreamError("no upstream proxy could reach " + host)
+
+    async def connect_direct(self, host, port):
+        try:
+            reader, writer = await open_connection(host, port)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.direct.failed()
+            raise UpstreamError(f"direct connection to {host} failed: {e}")
+        return self.direct, reader, writer
+
+    async def connect(self, host, port):
+        """Open a tunnel to host:port the way the routes say; return (upstream, reader, writer)."""
+        routes = self.routes
+        route = routes.route(host) if routes is not None else "proxy"
+        raced = route == "race"
+        if raced:
+            route = routes.winner(host) or "race"
+        if routes is not None:
+            routes.count(route)
+        if route == "race":
+            return await self.race(host, port)
+        if route == "direct":
+            try:
+                return await self.connect_direct(host, port)
+            except UpstreamError:
+                if not raced:
+                    raise
+                # The remembered winner stopped working, use the proxies until the next race
+                routes.remember(host, "proxy")
+        return await self.connect_via_any(host, port)
+
+    async def race(self, host, port):
+        attempts = {asyncio.ensure_future(self.connect_direct(host, port)): "direct",
+                    asyncio.ensure_future(self.connect_via_any(host, port)): "proxy"}
+        pending = set(attempts)
+        result = None
+        try:
+            while pending and result is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    if result is None:
+                        result = task.result()
+                        self.routes.remember(host, attempts[task])
+                    else:
+                        # Both connected in the same round, the second one is not needed
+                        _, _, loser_writer = task.result()
+                        loser_writer.close()
+        finally:
+            for task in pending:
+                task.cancel()
+            # A loser that connected anyway is closed, not leaked
+            for task in pending:
+                try:
+                    _, _, loser_writer = await task
+                    loser_writer.close()
+                except BaseException:
+                    pass
+        if result is None:
+            raise UpstreamError(f"neither direct nor proxy reached {host}")
+        return result
+
+    def tunnel_closed(self, host, upstream, sent, received):
+        # A direct tunnel that was cut before the first reply byte looks like a block
+        if upstream is self.direct and self.routes is not None and sent and not received:
+            if self.routes.route(host) == "race":
+                self.routes.remember(host, "proxy")
+
+    async def handle_client(self, reader, writer):
+        try:
+            first = await reader.readexactly(1)
+            if first == b"\x05":
+                await self.handle_socks5(reader, writer)
+            else:
+                await self.handle_http(first, reader, writer)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError, UpstreamError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # Forwarder is stopping, the streams callback would log a cancelled task
+            pass
+        finally:
+            writer.close()
+
+    async def handle_socks5(self, reader, writer):
+        methods = await reader.readexactly((await reader.readexactly(1))[0])
+        if 0 not in methods:
+            writer.write(b"\x05\xff")
+            return
+        writer.write(b"\x05\x00")
+        version, command, _, address_type = await reader.readexactly(4)
+        if address_type == 1:
+            host = ".".join(str(part) for part in await reader.readexactly(4))
+        elif address_type == 3:
+            host = (await reader.readexactly((await reader.readexactly(1))[0])).decode("idna")
+        elif address_type == 4:
+            raw = await reader.readexactly(16)
+            host = ":".join(raw[i:i + 2].hex() for i in range(0, 16, 2))
+        else:
+            raise ValueError("bad SOCKS5 address type")
+        port = struct.unpack(">H", await reader.readexactly(2))[0]
+        if command != 1:
+            writer.write(b"\x05\x07\x00\x01" + bytes(6))
+            return
+        try:
+            upstream, up_reader, up_writer = await self.connect(host, port)
+        except UpstreamError:
+            writer.write(b"\x05\x05\x00\x01" + bytes(6))
+            raise
+        writer.write(b"\x05\x00\x00\x01" + bytes(6))
+        sent, received = await self.relay(upstream, reader, writer, up_reader, up_writer)
+        self.tunnel_closed(host, upstream, sent, received)
+
+    async def handle_http(self, first, reader, writer):
+        head = first + await reader.readuntil(b"\r\n\r\n")
+        method, target, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+        if method == "CONNECT":
+            host, port = split_host_port(target, 443)
+            try:
+                upstream, up_reader, up_writer = await self.connect(host, port)
+            except UpstreamError:
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+                raise
+            writer.write(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+            sent, received = await self.relay(upstream, reader, writer, up_reader, up_writer)
+            self.tunnel_closed(host, upstream, sent, received)
+            return
+
+        # Plain http:// requests can only be passed on unchanged to an HTTP upstream,
+        # the client may send the next request on this connection to another host
+        for upstream in self.candidates(types=("HTTP",))[:3]:
+            try:
+                up_reader, up_writer = await self.take_connection(upstream)
+                break
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, UpstreamError):
+                upstream.failed()
+        else:
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+            return
+        if upstream.target.user:
+            request_line, rest = head.split(b"\r\n", 1)
+            auth = f"Proxy-Authorization: {upstream.target.basic_auth()}\r\n".encode()
+            head = request_line + b"\r\n" + auth + rest
+        up_writer.write(head)
+        upstream.bytes_up += len(head)
+        await self.relay(upstream, reader, writer, up_reader, up_writer)
+
+    async def relay(self, upstream, reader, writer, up_reader, up_writer):
+        """Copy both ways until either side closes; return (bytes sent, bytes received)."""
+        upstream.active += 1
+        upstream.connections += 1
+        totals = {"bytes_up": 0, "bytes_down": 0}
+
+        async def pipe(source, sink, counter):
+            try:
+                while True:
+                    data = await source.read(BUFFER_SIZE)
+                    if not data:
+                        break
+                    sink.write(data)
+                    setattr(upstream, counter, getattr(upstream, counter) + len(data))
+                    totals[counter] += len(data)
+                    await sink.drain()
+                # Half-close, the other direction may still have data to send
+                if sink.can_write_eof():
+                    sink.write_eof()
+                else:
+                    sink.close()
+            except OSError:
+                sink.close()
+
+        try:
+            await asyncio.gather(pipe(reader, up_writer, "bytes_up"), pipe(up_reader, writer, "bytes_down"))
+        finally:
+            upstream.active -= 1
+            up_writer.close()
+        return totals["bytes_up"], totals["bytes_down"]
@@ -0,0 +1,272 @@
+"""WebSocket probe of the Discord gateway through a proxy.
+
+Each proxy keeps one WebSocket open between probes, tunnelled with HTTP
+CONNECT or SOCKS5 like the phase probe. Opening it is timed per phase,
+with the upgrade response as "ttfb". Every probe after that is a ping
+frame on the held connection, and the pong round trip is the result.
+
+A pong that does not come within stall_timeout is a stall. The
+connection is then dropped, as the Discord client would do after a
+missed heartbeat ACK. The time from the last pong to that point is how
+long the stall took to notice. Connections the server or the proxy
+close count as disconnects. stats() has both, per proxy.
+
+When the server sends Discord's Hello, op 1 heartbeats are sent at the
+interval it asks for, so the gateway keeps the connection open.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+import time
+
+from byeblock_probe import ProbeError, ProbeResult, open_url
+
+GATEWAY_URL = "wss://gateway.discord.gg/?v=10&encoding=json"
+STALL_TIMEOUT = 5
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocket:
+    """Just enough of a RFC 6455 client to hold a connection and ping it."""
+
+    def __init__(self, sock, buffer=b""):
+        self.sock = sock
+        self.buffer = buffer
+        self.heartbeat_interval = None
+        self.heartbeat_at = 0
+
+    def read(self, size):
+        while len(self.buffer) < size:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ProbeError("Disconnected", "connection closed")
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def send(self, opcode, payload=b""):
+        mask = os.urandom(4)
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", 0x80 | opcode, 0x80 | length)
+        elif length < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 0x80 | 127, length)
+        masked = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+        self.sock.sendall(header + mask + masked)
+
+    def receive(self):
+        """Return (opcode, payload) of the next frame."""
+        first, second = self.read(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self.read(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self.read(8))[0]
+        mask = self.read(4) if second & 0x80 else None
+        payload = self.read(length)
+        if mask:
+            payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+        return first & 0x0F, payload
+
+    def ping(self, timeout):
+        """Return the round trip of one ping in ms, answering whatever else comes meanwhile."""
+        self.heartbeat()
+        token = struct.pack(">d", time.perf_counter())
+        start = time.perf_counter()
+        self.send(OP_PING, token)
+        while True:
+            remaining = timeout - (time.perf_counter() - start)
+            if remaining <= 0:
+                raise socket.timeout()
+            self.sock.settimeout(remaining)
+            opcode, payload = self.receive()
+            if opcode == OP_PONG and payload == token:
+                return (time.perf_counter() - start) * 1000
+            if opcode == OP_PING:
+                self.send(OP_PONG, payload)
+            elif opcode == OP_CLOSE:
+                code = struct.unpack(">H", payload[:2])[0] if len(payload) >= 2 else None
+                raise ProbeError("Disconnected", f"closed by the server ({code})")
+            elif opcode == OP_TEXT:
+                self.hello(payload)
+
+    def hello(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if isinstance(message, dict) and message.get("op") == 10:
+            self.heartbeat_interval = message["d"]["heartbeat_interval"] / 1000
+            self.heartbeat_at = time.monotonic()
+
+    def heartbeat(self):
+        if self.heartbeat_interval and time.monotonic() - self.heartbeat_at > self.heartbeat_interval * 0.9:
+            self.send(OP_TEXT, b'{"op":1,"d":null}')
+            self.heartbeat_at = time.monotonic()
+
+
+def open_websocket(target, url=GATEWAY_URL, timeout=STALL_TIMEOUT, context=None, sockets=None):
+    """Open a WebSocket to url through a proxy; return (WebSocket, phases in ms)."""
+    phases = {}
+    mark = time.perf_counter()
+
+    def lap(phase):
+        nonlocal mark
+        now = time.perf_counter()
+        phases[phase] = (now - mark) * 1000
+        mark = now
+
+    # A WebSocket always needs a tunnel, also through a plain HTTP proxy
+    sock, host, path = open_url(target, url, timeout, lap, context, sockets, tunnel=True)
+    try:
+        key = base64.b64encode(os.urandom(16))
+        sock.sendall(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key.decode()}\r\nSec-WebSocket-Version: 13\r\n"
+            f"Origin: https://discord.com\r\n\r\n".encode())
+        reply = b""
+        while b"\r\n\r\n" not in reply:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ProbeError("HTTPError", "connection closed during the upgrade")
+            reply += chunk
+        lap("ttfb")
+        head, _, rest = reply.partition(b"\r\n\r\n")
+        lines = head.split(b"\r\n")
+        status = lines[0].split()
+        if len(status) < 2 or status[1] != b"101":
+            raise ProbeError("HTTPError", lines[0].decode(errors="replace"))
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(b":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get(b"sec-websocket-accept") != base64.b64encode(hashlib.sha1(key + WS_GUID).digest()):
+            raise ProbeError("HTTPError", "bad Sec-WebSocket-Accept")
+    except socket.timeout:
+        sock.close()
+        raise ProbeError("Timeout")
+    except BaseException:
+        sock.close()
+        raise
+    finally:
+        # Held from here on, the probe closes it itself
+        if sockets is not None:
+            sockets.discard(sock)
+    return WebSocket(sock, rest), phases
+
+
+class GatewayStats:
+    def __init__(self):
+        self.opened = 0
+        self.disconnects = 0
+        self.stalls = 0
+        self.detect_ms = None
+        self.connected_at = None
+        self.last_pong = None
+
+
+class GatewayProbe:
+    """Hold one gateway WebSocket per proxy and ping it on every probe.
+
+    Safe to use from the probe pool as long as one proxy is not probed by
+    two threads at once, which the scheduler and sweep() guarantee.
+    """
+
+    def __init__(self, url=GATEWAY_URL, timeout=STALL_TIMEOUT, stall_timeout=STALL_TIMEOUT, sockets=None):
+        self.url = url
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.sockets = sockets
+        self.lock = threading.Lock()
+        self.connections = {}
+        self.stats_by_name = {}
+
+    def probe(self, target):
+        with self.lock:
+            ws = self.connections.get(target)
+            stats = self.stats_by_name.setdefault(target.name, GatewayStats())
+        phases = {}
+        if ws is None:
+            try:
+                ws, phases = open_websocket(target, self.url, self.timeout, sockets=self.sockets)
+            except ProbeError as e:
+                return ProbeResult(target.name, False, error=e.kind)
+            except OSError as e:
+                return ProbeResult(target.name, False, error=type(e).__name__)
+            with self.lock:
+                self.connections[target] = ws
+                stats.opened += 1
+                stats.connected_at = stats.last_pong = time.time()
+        try:
+            ms = ws.ping(self.stall_timeout)
+        except (ProbeError, OSError) as e:
+            with self.lock:
+                if self.connections.get(target) is not ws:
+                    # Closed by close() or forget_missing(), not by the network
+                    return ProbeResult(target.name, False, error="Cancelled")
+                del self.connections[target]
+                if isinstance(e, socket.timeout):
+                    stats.stalls += 1
+                    stats.detect_ms = (time.time() - stats.last_pong) * 1000
+                    error = "Stall"
+                else:
+                    stats.disconnects += 1
+                    error = "Disconnected"
+                stats.connected_at = None
+            ws.sock.close()
+            return ProbeResult(target.name, False, error=error)
+        with self.lock:
+            stats.last_pong = time.time()
+        return ProbeResult(target.name, True, ms, phases=phases)
+
+    def stats(self):
+        """Return {name: {opened, disconnects, stalls, disconnect_rate, detect_ms, held_s}}."""
+        now = time.time()
+        with self.lock:
+            return {
+                name: {
+                    "opened": stats.opened,
+                    "disconnects": stats.disconnects,
+                    "stalls": stats.stalls,
+                    "disconnect_rate": (stats.disconnects + stats.stalls) / stats.opened if stats.opened else 0,
+                    "detect_ms": stats.detect_ms,
+                    "held_s": now - stats.connected_at if stats.connected_at else 0,
+                }
+                for name, stats in self.stats_by_name.items()
+            }
+
+    def drop(self, targets):
+        # Called with the lock held
+        for target in targets:
+            ws = self.connections.pop(target)
+            stats = self.stats_by_name.get(target.name)
+            if stats is not None:
+                stats.connected_at = None
+            try:
+                ws.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            ws.sock.close()
+
+    def forget_missing(self, targets):
+        with self.lock:
+            self.drop(set(self.connections) - set(targets))
+            names = {target.name for target in targets}
+            for name in set(self.stats_by_name) - names:
+                del self.stats_by_name[name]
+
+    def close(self):
+        with self.lock:
+            self.drop(list(self.connections))
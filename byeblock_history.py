@@ -0,0 +1,202 @@
+"""On-disk history of probe results.
+
+Raw samples are kept for raw_hours and then compacted into one row per
+proxy and minute, which is kept for keep_days. Both tables are keyed by
+(proxy, timestamp) with no extra rowid, so a day of one-second sweeps
+stays small and a per-proxy range read is a single index scan.
+
+Page loads of the Discord client and throughput tests are kept next to
+the probes, one row each, for keep_days.
+"""
+
+import sqlite3
+import statistics
+import threading
+import time
+
+from byeblock_probe import PHASES, ProbeResult
+
+HISTORY_FILE = "ProbeHistory.sqlite"
+COMPACT_EVERY = 15 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proxies (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS samples (
+    proxy INTEGER NOT NULL, ts INTEGER NOT NULL, ms REAL,
+    dns REAL, connect REAL, proxy_ms REAL, tls REAL, ttfb REAL, error TEXT,
+    PRIMARY KEY (proxy, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS minutes (
+    proxy INTEGER NOT NULL, ts INTEGER NOT NULL, samples INTEGER NOT NULL, failures INTEGER NOT NULL,
+    ms_sum REAL, ms_min REAL, ms_max REAL,
+    PRIMARY KEY (proxy, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS page_loads (
+    proxy INTEGER NOT NULL, ts INTEGER NOT NULL, ok INTEGER NOT NULL, load_ms REAL, first_progress_ms REAL,
+    dns REAL, connect REAL, tls REAL, ttfb REAL, dom_ms REAL, onload_ms REAL,
+    resources INTEGER, transfer_bytes INTEGER, resources_ms REAL,
+    PRIMARY KEY (proxy, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS throughput (
+    proxy INTEGER NOT NULL, ts INTEGER NOT NULL, sustained REAL, peak REAL, bytes INTEGER, seconds REAL,
+    streams INTEGER, error TEXT,
+    PRIMARY KEY (proxy, ts)
+) WITHOUT ROWID;
+"""
+
+# Columns of page_loads after proxy, ts and ok; missing ones are stored as NULL
+PAGE_LOAD_FIELDS = ("load_ms", "first_progress_ms", "dns", "connect", "tls", "ttfb",
+                    "dom_ms", "onload_ms", "resources", "transfer_bytes", "resources_ms")
+
+
+class ProbeHistory:
+    """Append probe results and answer per-proxy questions about them.
+
+    One instance may be shared by several threads; every call takes the
+    instance lock.
+    """
+
+    def __init__(self, path=HISTORY_FILE, raw_hours=24, keep_days=30):
+        self.raw_hours = raw_hours
+        self.keep_days = keep_days
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.executescript(SCHEMA)
+        self.proxy_ids = dict((name, id) for id, name in self.db.execute("SELECT id, name FROM proxies"))
+        self.compacted_at = 0
+
+    def proxy_id(self, name):
+        id = self.proxy_ids.get(name)
+        if id is None:
+            self.db.execute("INSERT OR IGNORE INTO proxies (name) VALUES (?)", (name,))
+            id = self.db.execute("SELECT id FROM proxies WHERE name = ?", (name,)).fetchone()[0]
+            self.proxy_ids[name] = id
+        return id
+
+    def append(self, results):
+        """Store one sweep of results in a single transaction."""
+        with self.lock, self.db:
+            rows = [(self.proxy_id(result.proxy), int(result.timestamp * 1000),
+                     result.ms if result.ok else None,
+                     *(result.phases.get(phase) for phase in PHASES),
+                     None if result.ok else result.error or "Error")
+                    for result in results]
+            self.db.executemany("INSERT OR IGNORE INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        if time.time() - self.compacted_at > COMPACT_EVERY:
+            self.compact()
+
+    def compact(self, now=None):
+        """Fold raw samples older than raw_hours into per-minute rows."""
+        now = time.time() if now is None else now
+        raw_cutoff = int(now - self.raw_hours * 3600) // 60 * 60 * 1000
+        keep_cutoff = int((now - self.keep_days * 86400) * 1000)
+        with self.lock:
+            with self.db:
+                self.db.execute("""
+                    INSERT OR REPLACE INTO minutes
+                    SELECT proxy, ts / 60000 * 60000, COUNT(*), SUM(ms IS NULL), SUM(ms), MIN(ms), MAX(ms)
+                    FROM samples WHERE ts < ? GROUP BY proxy, ts / 60000""", (raw_cutoff,))
+                self.db.execute("DELETE FROM samples WHERE ts < ?", (raw_cutoff,))
+                self.db.execute("DELETE FROM minutes WHERE ts < ?", (keep_cutoff,))
+                self.db.execute("DELETE FROM page_loads WHERE ts < ?", (keep_cutoff,))
+                self.db.execute("DELETE FROM throughput WHERE ts < ?", (keep_cutoff,))
+            self.db.execute("PRAGMA incremental_vacuum")
+            self.compacted_at = now
+
+    def aggregate(self, start, end=None):
+        """Return {name: {samples, loss, avg_ms, min_ms, max_ms}} for start <= t < end."""
+        end = time.time() if end is None else end
+        bounds = (int(start * 1000), int(end * 1000))
+        with self.lock:
+            rows = self.db.execute("""
+                SELECT name, SUM(n), SUM(f), SUM(s), MIN(lo), MAX(hi) FROM (
+                    SELECT p.name, COUNT(*) n, SUM(ms IS NULL) f, SUM(ms) s, MIN(ms) lo, MAX(ms) hi
+                    FROM proxies p JOIN samples ON proxy = p.id AND ts >= ? AND ts < ? GROUP BY p.id
+                    UNION ALL
+                    SELECT p.name, SUM(samples), SUM(failures), SUM(ms_sum), MIN(ms_min), MAX(ms_max)
+                    FROM proxies p JOIN minutes ON proxy = p.id AND ts >= ? AND ts < ? GROUP BY p.id
+                ) GROUP BY name""", bounds + bounds).fetchall()
+        stats = {}
+        for name, samples, failures, ms_sum, ms_min, ms_max in rows:
+            ok = samples - failures
+            stats[name] = {
+                "samples": samples,
+                "loss": failures / samples,
+                "avg_ms": ms_sum / ok if ok else None,
+                "min_ms": ms_min,
+                "max_ms": ms_max,
+            }
+        return stats
+
+    def results(self, name, start, end=None):
+        """Return the raw ProbeResults of one proxy, oldest first."""
+        end = time.time() if end is None else end
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT ts, ms, dns, connect, proxy_ms, tls, ttfb, error FROM samples "
+                "WHERE proxy = (SELECT id FROM proxies WHERE name = ?) AND ts >= ? AND ts < ? ORDER BY ts",
+                (name, int(start * 1000), int(end * 1000))).fetchall()
+        return [ProbeResult(name, error is None, ms, error or "", ts / 1000,
+                            {phase: value for phase, value in zip(PHASES, phases) if value is not None})
+                for ts, ms, *phases, error in rows]
+
+    def recent(self, seconds, names):
+        """Return the last seconds of raw results for every named proxy."""
+        start = time.time() - seconds
+        results = []
+        for name in names:
+            results.extend(self.results(name, start))
+        results.sort(key=lambda result: result.timestamp)
+        return results
+
+    def append_page_load(self, name, ok, timings, timestamp=None):
+        """Store one page load; timings maps PAGE_LOAD_FIELDS names to values."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO page_loads VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (self.proxy_id(name), int(timestamp * 1000), int(ok),
+                             *(timings.get(field) for field in PAGE_LOAD_FIELDS)))
+
+    def page_load_stats(self, start, end=None):
+        """Return {name: {loads, failures, <field>: median}} for start <= t < end, fastest load first."""
+        end = time.time() if end is None else end
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT p.name, ok, {', '.join(PAGE_LOAD_FIELDS)} FROM proxies p "
+                "JOIN page_loads ON proxy = p.id AND ts >= ? AND ts < ?",
+                (int(start * 1000), int(end * 1000))).fetchall()
+        loads = {}
+        for name, ok, *values in rows:
+            loads.setdefault(name, []).append((ok, values))
+        stats = {}
+        for name, samples in loads.items():
+            entry = {"loads": len(samples), "failures": sum(not ok for ok, _ in samples)}
+            for index, field in enumerate(PAGE_LOAD_FIELDS):
+                values = [values[index] for ok, values in samples if ok and values[index] is not None]
+                entry[field] = statistics.median(values) if values else None
+            stats[name] = entry
+        return dict(sorted(stats.items(), key=lambda item: (item[1]["load_ms"] is None, item[1]["load_ms"] or 0)))
+
+    def append_throughput(self, result, streams):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO throughput VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (self.proxy_id(result.proxy), int(result.timestamp * 1000),
+                             result.sustained if result.ok else None, result.peak if result.ok else None,
+                             result.bytes, result.seconds, streams, result.error or None))
+
+    def latest_throughput(self, names):
+        """Return {name: (sustained, peak)} of the last test of each proxy that got data through."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT p.name, sustained, peak FROM proxies p JOIN throughput t ON t.proxy = p.id "
+                "AND t.ts = (SELECT MAX(ts) FROM throughput WHERE proxy = p.id AND sustained IS NOT NULL)").fetchall()
+        names = set(names)
+        return {name: (sustained, peak) for name, sustained, peak in rows if name in names}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,125 @@
+"""Resident memory and CPU time of the app and its Chromium helper processes.
+
+QtWebEngine renders in separate QtWebEngineProcess children, so the
+number that matters is the RSS of this process plus all its children.
+psutil is used when installed; otherwise /proc is read on Linux, and on
+Windows only this process is counted.
+"""
+
+import os
+import sys
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def process_tree_rss(pid=None):
+    """Return the RSS in bytes of pid and its children, or None if unknown."""
+    processes = process_tree(pid)
+    if processes is None:
+        return None
+    return sum(process[2] for process in processes)
+
+
+def process_tree(pid=None):
+    """Return [(pid, name, rss bytes, cpu seconds)] of pid and its children, or None if unknown."""
+    pid = os.getpid() if pid is None else pid
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = []
+            for process in [root] + root.children(recursive=True):
+                try:
+                    with process.oneshot():
+                        times = process.cpu_times()
+                        processes.append((process.pid, process.name(), process.memory_info().rss,
+                                          times.user + times.system))
+                except psutil.Error:
+                    pass
+            return processes
+        except psutil.Error:
+            return None
+    if os.path.isdir("/proc"):
+        return proc_tree(pid)
+    if sys.platform == "win32" and pid == os.getpid():
+        rss = windows_rss()
+        return None if rss is None else [(pid, os.path.basename(sys.executable), rss, windows_cpu())]
+    return None
+
+
+def proc_tree(pid):
+    children = {}
+    usage = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    ticks = os.sysconf("SC_CLK_TCK")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                stat = file.read()
+            with open(f"/proc/{entry}/statm") as file:
+                pages = int(file.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        # The command name may contain spaces, the fields after it do not
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        fields = stat[stat.rindex(")") + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        # utime and stime, in clock ticks
+        usage[int(entry)] = (name, pages * page_size, (int(fields[11]) + int(fields[12])) / ticks)
+    if pid not in usage:
+        return None
+    processes = []
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        if current in usage:
+            processes.append((current,) + usage[current])
+        pending.extend(children.get(current, ()))
+    return processes
+
+
+def windows_rss():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def windows_cpu():
+    import ctypes
+    from ctypes import wintypes
+
+    created, exited, kernel, user = (wintypes.FILETIME() for _ in range(4))
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.kernel32.GetProcessTimes(process, ctypes.byref(created), ctypes.byref(exited),
+                                                  ctypes.byref(kernel), ctypes.byref(user)):
+        return 0.0
+    # FILETIMEs count 100 ns steps
+    return sum((filetime.dwHighDateTime << 32 | filetime.dwLowDateTime) / 1e7 for filetime in (kernel, user))
+
+
+def format_mb(size):
+    return "?" if size is None else f"{size / 1048576:.0f} MB"
@@ -0,0 +1,153 @@
+"""Per-host network counters of the web view.
+
+Requests and blocked requests come from the request interceptor, bytes
+and HTTP status codes from a script in the page (Resource Timing and
+wrapped XHR/fetch). Everything is counted by (host, resource type) in
+one-minute buckets for the last hour and in session totals, which is
+what the Prometheus export reports since its counters must only grow.
+
+Used from the UI thread only.
+"""
+
+import json
+import os
+import time
+from collections import deque
+
+WINDOWS = {"1 min": 60, "10 min": 600, "1 hour": 3600, "session": None}
+BUCKET = 60
+BUCKETS = 60
+
+# Resource Timing initiator types mapped to the interceptor's resource type names
+INITIATOR_TYPES = {
+    "navigation": "main_frame",
+    "iframe": "sub_frame",
+    "link": "stylesheet",
+    "css": "sub_resource",
+    "script": "script",
+    "img": "image",
+    "image": "image",
+    "video": "media",
+    "audio": "media",
+    "xmlhttprequest": "xhr",
+    "fetch": "xhr",
+    "beacon": "ping",
+}
+
+
+def new_counters():
+    return {"requests": 0, "blocked": 0, "bytes": 0, "responses": {}}
+
+
+def add_counters(into, counters):
+    into["requests"] += counters["requests"]
+    into["blocked"] += counters["blocked"]
+    into["bytes"] += counters["bytes"]
+    for code, count in counters["responses"].items():
+        into["responses"][code] = into["responses"].get(code, 0) + count
+
+
+def error_count(counters):
+    """Responses that failed: network errors (status 0) and HTTP 4xx/5xx."""
+    return sum(count for code, count in counters["responses"].items() if code == 0 or code >= 400)
+
+
+class NetworkStats:
+    def __init__(self):
+        self.buckets = deque(maxlen=BUCKETS)
+        self.totals = {}
+        self.started = time.time()
+
+    def bucket(self, now):
+        start = int(now // BUCKET * BUCKET)
+        if not self.buckets or self.buckets[-1][0] != start:
+            self.buckets.append((start, {}))
+        return self.buckets[-1][1]
+
+    def add(self, host, resource_type, requests=0, blocked=0, size=0, status=None, now=None):
+        now = time.time() if now is None else now
+        key = (host, resource_type)
+        for counters in (self.bucket(now).setdefault(key, new_counters()),
+                         self.totals.setdefault(key, new_counters())):
+            counters["requests"] += requests
+            counters["blocked"] += blocked
+            counters["bytes"] += size
+            if status is not None:
+                counters["responses"][status] = counters["responses"].get(status, 0) + 1
+
+    def window(self, seconds=None, now=None):
+        """Return {(host, type): counters} of the last seconds, or the session for None."""
+        if seconds is None:
+            return self.totals
+        now = time.time() if now is None else now
+        merged = {}
+        for start, counters in self.buckets:
+            if start + BUCKET <= now - seconds:
+                continue
+            for key, values in counters.items():
+                add_counters(merged.setdefault(key, new_counters()), values)
+        return merged
+
+    def rows(self, seconds=None, now=None):
+        """Return (host, type, counters) rows, most bytes first."""
+        rows = [(host, resource_type, counters)
+                for (host, resource_type), counters in self.window(seconds, now).items()]
+        rows.sort(key=lambda row: (-row[2]["bytes"], -row[2]["requests"], row[0]))
+        return rows
+
+    def jsonl_lines(self, seconds=None, now=None):
+        now = time.time() if now is None else now
+        lines = []
+        for host, resource_type, counters in self.rows(seconds, now):
+            lines.append(json.dumps({
+                "time": round(now, 3),
+                "window": seconds,
+                "host": host,
+                "type": resource_type,
+                "requests": counters["requests"],
+                "blocked": counters["blocked"],
+                "bytes": counters["bytes"],
+                "errors": error_count(counters),
+                "responses": {str(code): count for code, count in sorted(counters["responses"].items())},
+            }))
+        return lines
+
+    def write_jsonl(self, path, seconds=None):
+        """Append one line per host and type to path."""
+        with open(path, "a", encoding="utf-8") as file:
+            for line in self.jsonl_lines(seconds):
+                file.write(line + "\n")
+
+    def prometheus_text(self):
+        def labels(host, resource_type, **extra):
+            pairs = {"host": host, "type": resource_type, **extra}
+            return ",".join(f'{name}="{escape(str(value))}"' for name, value in pairs.items())
+
+        lines = []
+        for name, field, text in (("byeblock_requests_total", "requests", "Requests made by the web view"),
+                                  ("byeblock_blocked_total", "blocked", "Requests stopped by the block rules"),
+                                  ("byeblock_bytes_total", "bytes", "Bytes transferred, from Resource Timing")):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} counter")
+            for (host, resource_type), counters in sorted(self.totals.items()):
+                lines.append(f"{name}{{{labels(host, resource_type)}}} {counters[field]}")
+        lines.append("# HELP byeblock_responses_total XHR/fetch responses by status code, 0 is a network error")
+        lines.append("# TYPE byeblock_responses_total counter")
+        for (host, resource_type), counters in sorted(self.totals.items()):
+            for code, count in sorted(counters["responses"].items()):
+                lines.append(f"byeblock_responses_total{{{labels(host, resource_type, code=code)}}} {count}")
+        lines.append("# HELP byeblock_session_start_seconds When the counters started")
+        lines.append("# TYPE byeblock_session_start_seconds gauge")
+        lines.append(f"byeblock_session_start_seconds {self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the text exposition format; replaced in one step for textfile collectors."""
+        temp = path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as file:
+            file.write(self.prometheus_text())
+        os.replace(temp, path)
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,380 @@
+"""In-memory proxy registry backed by Settings.ini.
+
+The Proxy/<name>/... entries are read once into ProxyTargets. Lookups by
+name, host or type are plain dict reads of an index that is swapped in
+whole after every change, so worker threads may read without locking.
+
+Writes go through DeferredSettings, which keeps the latest value of every
+changed key and hands them to the real settings object in one flush.
+Until then its reads and child listings already show the pending
+changes, removed groups included.
+IniSettings reads the same file without Qt, for the headless probe.
+"""
+
+import re
+import threading
+
+from byeblock_probe import ProxyTarget
+
+REMOVED = object()
+UNSET = object()
+
+
+class DeferredSettings:
+    """Wrap a QSettings-like object and coalesce writes until flush().
+
+    on_dirty is called after each change that makes a flush necessary,
+    the app uses it to restart a debounce timer.
+    """
+
+    def __init__(self, settings, on_dirty=None):
+        self.settings = settings
+        self.on_dirty = on_dirty
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def pending_value(self, key):
+        """The pending value of key, REMOVED if it or a parent group was removed, else UNSET.
+
+        Called with the lock held.
+        """
+        value = self.pending.get(key, UNSET)
+        if value is not UNSET:
+            return value
+        parts = key.split("/")
+        for end in range(len(parts) - 1, 0, -1):
+            if self.pending.get("/".join(parts[:end]), UNSET) is REMOVED:
+                return REMOVED
+        return UNSET
+
+    def full_key(self, key):
+        # Pending keys are full paths, reads and writes may be inside a beginGroup().
+        # flush() runs from the event loop, outside of any group.
+        group = self.settings.group()
+        return f"{group}/{key}" if group else key
+
+    def value(self, key, default=None, type=None):
+        key_path = self.full_key(key)
+        with self.lock:
+            value = self.pending_value(key_path)
+        if value is REMOVED:
+            return default
+        if value is UNSET:
+            if type is None:
+                return self.settings.value(key, default)
+            return self.settings.value(key, default, type=type)
+        if type is bool and isinstance(value, str):
+            return value.lower() == "true"
+        return value if type is None else type(value)
+
+    def setValue(self, key, value):
+        key = self.full_key(key)
+        with self.lock:
+            if self.pending.get(key, REMOVED) == value:
+                return
+            # Re-insert so the flush order follows the order of the changes
+            self.pending.pop(key, None)
+            self.pending[key] = value
+        if self.on_dirty is not None:
+            self.on_dirty()
+
+    def remove(self, key):
+        key = self.full_key(key)
+        with self.lock:
+            for pending_key in list(self.pending):
+                if pending_key == key or pending_key.startswith(key + "/"):
+                    del self.pending[pending_key]
+            self.pending[key] = REMOVED
+        if self.on_dirty is not None:
+            self.on_dirty()
+
+    def flush(self):
+        """Write every pending change and sync once."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        for key, value in pending.items():
+            if value is REMOVED:
+                self.settings.remove(key)
+            else:
+                self.settings.setValue(key, value)
+        self.settings.sync()
+
+    def sync(self):
+        self.flush()
+
+    def contains(self, key):
+        key_path = self.full_key(key)
+        with self.lock:
+            value = self.pending_value(key_path)
+        if value is UNSET:
+            return self.settings.contains(key)
+        return value is not REMOVED
+
+    def children(self):
+        prefix = self.full_key("")
+        keys = list(self.settings.childKeys())
+        groups = list(self.settings.childGroups())
+        with self.lock:
+            keys = [key for key in keys if self.pending_value(prefix + key) is not REMOVED]
+            groups = [name for name in groups if self.pending_value(prefix + name) is not REMOVED]
+            # Keys written since the last flush, also under a removed group written anew
+            for key, value in self.pending.items():
+                if value is REMOVED or not key.startswith(prefix):
+                    continue
+                name, slash, _ = key[len(prefix):].partition("/")
+                target = groups if slash else keys
+                if name not in target:
+                    target.append(name)
+        return keys, groups
+
+    def childKeys(self):
+        return self.children()[0]
+
+    def childGroups(self):
+        return self.children()[1]
+
+    def __getattr__(self, name):
+        # beginGroup, childGroups, fileName, ... go straight to the wrapped object
+        return getattr(self.settings, name)
+
+
+INI_ESCAPES = {"a": "\a", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v",
+               '"': '"', "\\": "\\", ";": ";", ",": ",", "'": "'", "?": "?"}
+INI_KEY_ESCAPE = re.compile(r"%U([0-9A-Fa-f]{4})|%([0-9A-Fa-f]{2})")
+
+
+def unescape_ini_key(text):
+    """Undo QSettings' key escaping: %XX and %UXXXX, and \\ as the group separator."""
+    text = INI_KEY_ESCAPE.sub(lambda match: chr(int(match.group(1) or match.group(2), 16)), text)
+    return text.replace("\\", "/")
+
+
+def parse_ini_value(text):
+    """Return a str, or a list for QSettings' comma separated string lists."""
+    # @ByteArray(...) holds plain text; @Variant(...) is binary QDataStream, not read here
+    if text.startswith("@ByteArray(") and text.endswith(")"):
+        return text[len("@ByteArray("):-1]
+    if text.startswith(("@Variant(", "@Invalid(")):
+        return None
+    if text.startswith("@@"):
+        text = text[1:]
+    items = []
+    current = []
+    quoted = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '"':
+            quoted = not quoted
+        elif char == "\\" and index + 1 < len(text):
+            index += 1
+            escape = text[index]
+            if escape == "x":
+                digits = re.match(r"[0-9A-Fa-f]+", text[index + 1:])
+                if digits:
+                    current.append(chr(int(digits.group(), 16)))
+                    index += len(digits.group())
+            elif escape in "01234567":
+                digits = re.match(r"[0-7]+", text[index:]).group()
+                current.append(chr(int(digits, 8)))
+                index += len(digits) - 1
+            else:
+                current.append(INI_ESCAPES.get(escape, escape))
+        elif char == "," and not quoted:
+            items.append("".join(current).strip())
+            current = []
+        elif quoted or not char.isspace() or current:
+            current.append(char)
+        index += 1
+    last = "".join(current)
+    items.append(last if text.rstrip().endswith('"') else last.rstrip())
+    return items[0] if len(items) == 1 else items
+
+
+class IniSettings:
+    """Read-only stand-in for QSettings on a file written in QSettings.IniFormat.
+
+    Covers what the probe needs: value() with type conversion, groups and
+    child listing. Values QSettings stored as @Variant read as None.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.values = {}
+        self.groups = []
+        section = ""
+        try:
+            with open(path, encoding="utf-8", errors="replace") as file:
+                lines = file.read().splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(";"):
+                continue
+            if line.startswith("[") and line.endswith("]"):
+                name = line[1:-1]
+                # [General] holds the keys outside any group, a group called General is [%General]
+                section = "" if name == "General" else "General" if name == "%General" else unescape_ini_key(name)
+                continue
+            key, equals, value = line.partition("=")
+            if not equals:
+                continue
+            key = unescape_ini_key(key.strip())
+            self.values[f"{section}/{key}" if section else key] = parse_ini_value(value.strip())
+
+    def fileName(self):
+        return self.path
+
+    def key(self, key):
+        return "/".join(self.groups + [key]) if self.groups else key
+
+    def value(self, key, default=None, type=None):
+        value = self.values.get(self.key(key))
+        if value is None:
+            return default
+        if type is None:
+            return value
+        if type is bool:
+            return value.lower() == "true" if isinstance(value, str) else bool(value)
+        if type is list:
+            return value if isinstance(value, list) else [value]
+        try:
+            return type(value)
+        except (TypeError, ValueError):
+            return default
+
+    def contains(self, key):
+        return self.key(key) in self.values
+
+    def group(self):
+        return "/".join(self.groups)
+
+    def beginGroup(self, prefix):
+        self.groups.append(prefix.strip("/"))
+
+    def endGroup(self):
+        self.groups.pop()
+
+    def children(self):
+        prefix = self.key("") if self.groups else ""
+        keys = []
+        groups = []
+        for key in self.values:
+            if not key.startswith(prefix):
+                continue
+            name, slash, _ = key[len(prefix):].partition("/")
+            target = groups if slash else keys
+            if name not in target:
+                target.append(name)
+        return keys, groups
+
+    def childKeys(self):
+        return self.children()[0]
+
+    def childGroups(self):
+        return self.children()[1]
+
+
+def read_proxy_targets(settings):
+    proxies = []
+    settings.beginGroup("Proxy")
+    for name in settings.childGroups():
+        host = settings.value(f"{name}/Host", "")
+        port = settings.value(f"{name}/Port", 0, type=int)
+        proxy_type = settings.value(f"{name}/Type", "HTTP")
+        user = settings.value(f"{name}/User", "")
+        password = settings.value(f"{name}/Password", "")
+        if host and port:
+            proxies.append(ProxyTarget(name, host, port, proxy_type, user, password))
+    settings.endGroup()
+    return proxies
+
+
+class ProxyIndex:
+    def __init__(self, targets):
+        self.targets = tuple(targets)
+        self.by_name = {target.name: target for target in self.targets}
+        self.by_host = {}
+        self.by_type = {}
+        self.by_key = {}
+        for target in self.targets:
+            self.by_host.setdefault(target.host, []).append(target)
+            self.by_type.setdefault(target.type, []).append(target)
+            self.by_key[(target.type, target.host, target.port)] = target
+
+
+class ProxyRegistry:
+    def __init__(self, settings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.index = ProxyIndex(read_proxy_targets(settings))
+
+    def all(self):
+        return self.index.targets
+
+    def names(self):
+        return [target.name for target in self.index.targets]
+
+    def get(self, name):
+        return self.index.by_name.get(name)
+
+    def by_host(self, host):
+        return list(self.index.by_host.get(host, ()))
+
+    def by_type(self, proxy_type):
+        return list(self.index.by_type.get(proxy_type, ()))
+
+    def find(self, host, port):
+        for target in self.index.by_host.get(host, ()):
+            if target.port == port:
+                return target
+        return None
+
+    def put(self, target):
+        """Store target under its name, replacing what was there."""
+        with self.lock:
+            targets = [old for old in self.index.targets if old.name != target.name] + [target]
+            if target.name in self.index.by_name:
+                self.settings.remove(f"Proxy/{target.name}")
+            self.write(target)
+            self.index = ProxyIndex(targets)
+
+    def add(self, targets):
+        """Add new proxies, skipping ones already stored; return the added ones."""
+        with self.lock:
+            index = self.index
+            names = set(index.by_name)
+            seen = set(index.by_key)
+            added = []
+            for target in targets:
+                key = (target.type, target.host, target.port)
+                if key in seen:
+                    continue
+                seen.add(key)
+                name = target.host if target.host not in names else f"{target.host}:{target.port}"
+                names.add(name)
+                target = ProxyTarget(name, target.host, target.port, target.type, target.user, target.password)
+                self.write(target)
+                added.append(target)
+            if added:
+                self.index = ProxyIndex(index.targets + tuple(added))
+        return added
+
+    def remove(self, name):
+        with self.lock:
+            if name not in self.index.by_name:
+                return
+            self.settings.remove(f"Proxy/{name}")
+            self.index = ProxyIndex(target for target in self.index.targets if target.name != name)
+
+    def write(self, target):
+        key = f"Proxy/{target.name}"
+        self.settings.setValue(f"{key}/Host", target.host)
+        self.settings.setValue(f"{key}/Port", target.port)
+        self.settings.setValue(f"{key}/Type", target.type)
+        if target.user:
+            self.settings.setValue(f"{key}/User", target.user)
+            self.settings.setValue(f"{key}/Password", target.password)
@@ -0,0 +1,160 @@
+"""Low-resource rendering profile of the embedded Discord client.
+
+Two kinds of knobs:
+
+* Chromium switches (renderer process limit, GPU and compositing). They
+  go into QTWEBENGINE_CHROMIUM_FLAGS before the QApplication exists, so
+  they only change with a restart.
+* Page knobs (no CSS animations, no video autoplay, a floor for timers
+  of a page in the background). An injected script reads them, so they
+  change at once.
+
+RenderCost samples the CPU time and RSS of the app and its
+QtWebEngineProcess helpers, so the effect of a knob can be put in
+numbers: the minute before a change against the minute after it, and
+one minute of every session once the page has loaded, which covers the
+switches.
+"""
+
+import json
+import os
+import shlex
+import time
+from dataclasses import asdict, dataclass
+
+from byeblock_memory import process_tree
+
+GPU_MODES = ("auto", "software compositing", "software only")
+HELPER_NAME = "QtWebEngineProc"
+COST_FILE = "RenderCost.jsonl"
+
+
+@dataclass
+class RenderConfig:
+    low_resource: bool = False
+    renderer_limit: int = 1
+    gpu: str = "software compositing"
+    reduce_motion: bool = True
+    block_autoplay: bool = True
+    timer_floor: int = 2000
+
+
+def chromium_flags(config):
+    if not config.low_resource:
+        return []
+    flags = ["--enable-low-end-device-mode"]
+    if config.renderer_limit:
+        flags.append(f"--renderer-process-limit={config.renderer_limit}")
+    if config.gpu == "software compositing":
+        flags.append("--disable-gpu-compositing")
+    elif config.gpu == "software only":
+        flags.append("--disable-gpu")
+    if config.reduce_motion:
+        flags.append("--disable-smooth-scrolling")
+    return flags
+
+
+def merge_flags(existing, flags):
+    """Add flags to a QTWEBENGINE_CHROMIUM_FLAGS value; switches set there by hand win."""
+    current = shlex.split(existing or "")
+    names = {flag.split("=", 1)[0] for flag in current}
+    return " ".join(current + [flag for flag in flags if flag.split("=", 1)[0] not in names])
+
+
+def page_config(config):
+    """The knobs the injected script reads; all off outside the low-resource profile."""
+    return {
+        "reduceMotion": config.low_resource and config.reduce_motion,
+        "blockAutoplay": config.low_resource and config.block_autoplay,
+        "timerFloor": config.timer_floor if config.low_resource else 0,
+    }
+
+
+def describe(config):
+    if not config.low_resource:
+        return "full"
+    parts = [f"renderers {config.renderer_limit or 'any'}", f"GPU {config.gpu}"]
+    if config.reduce_motion:
+        parts.append("no animations")
+    if config.block_autoplay:
+        parts.append("no autoplay")
+    if config.timer_floor:
+        parts.append(f"background timers >= {config.timer_floor} ms")
+    return ", ".join(parts)
+
+
+class RenderCost:
+    """CPU share and RSS between two samples of the process tree."""
+
+    def __init__(self):
+        self.last = self.sample()
+
+    @staticmethod
+    def sample():
+        processes = process_tree()
+        return time.monotonic(), {pid: (name, rss, cpu) for pid, name, rss, cpu in processes or ()}
+
+    def measure(self):
+        """Return the usage since the previous call, or since the object was made."""
+        before, self.last = self.last, self.sample()
+        return usage_between(before, self.last)
+
+
+def usage_between(before, after):
+    seconds = max(after[0] - before[0], 1e-6)
+    cpu = helper_cpu = rss = helper_rss = 0
+    for pid, (name, size, used) in after[1].items():
+        previous = before[1].get(pid)
+        # Helpers started in between count from zero
+        used -= previous[2] if previous is not None and previous[0] == name else 0
+        cpu += used
+        rss += size
+        if name.startswith(HELPER_NAME):
+            helper_cpu += used
+            helper_rss += size
+    return {
+        "seconds": seconds,
+        "cpu_percent": cpu / seconds * 100,
+        "rss": rss,
+        "helper_cpu_percent": helper_cpu / seconds * 100,
+        "helper_rss": helper_rss,
+        "helpers": sum(1 for name, _, _ in after[1].values() if name.startswith(HELPER_NAME)),
+    }
+
+
+def cost_line(event, config, flags, usage, visible):
+    return json.dumps({
+        "time": round(time.time(), 3),
+        "event": event,
+        "profile": describe(config),
+        "config": asdict(config),
+        "flags": flags,
+        "visible": visible,
+        **{key: round(value, 1) if isinstance(value, float) else value for key, value in usage.items()},
+    })
+
+
+def read_costs(path=COST_FILE):
+    records = []
+    try:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def apply_chromium_flags(config, environ=os.environ):
+    """Put the switches of config into QTWEBENGINE_CHROMIUM_FLAGS; must run before the QApplication exists."""
+    flags = chromium_flags(config)
+    if flags:
+        environ["QTWEBENGINE_CHROMIUM_FLAGS"] = merge_flags(environ.get("QTWEBENGINE_CHROMIUM_FLAGS"), flags)
+
+
+def active_flags(environ=os.environ):
+    return shlex.split(environ.get("QTWEBENGINE_CHROMIUM_FLAGS", ""))
+
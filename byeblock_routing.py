@@ -0,0 +1,97 @@
+"""Per-host routing for the local forwarder: proxy, direct or race.
+
+One rule per line, # starts a comment:
+
+    proxy discord.com        discord.com and its subdomains go through the proxy
+    direct example.org       straight to the host
+    race cdn.discordapp.com  try both at once, keep using the faster one
+    default direct           hosts no rule matches, direct if left out
+
+Hosts are matched by suffix on label boundaries, the longest match wins.
+The winner of a race is remembered per host for RACE_TTL seconds. A
+direct connection that is cut before any byte came back (what a DPI
+block usually looks like) counts as a lost race for the direct path.
+"""
+
+import os
+import time
+
+from byeblock_rules import RuleFiles
+
+ROUTES_FILE = "Routes.txt"
+ROUTES = ("proxy", "direct", "race")
+RACE_TTL = 10 * 60
+
+DEFAULT_ROUTES = """\
+# How the local forwarder reaches each host: proxy, direct or race.
+# race tries direct and proxy at once and keeps using the faster one.
+# Only Discord goes through the proxy, everything else direct.
+
+proxy discord.com
+proxy discord.gg
+proxy discordapp.com
+proxy discord.media
+race discordapp.net
+race cdn.discordapp.com
+default direct
+"""
+
+
+class RouteTable(RuleFiles):
+    def __init__(self, paths=(ROUTES_FILE,)):
+        self.winners = {}
+        self.counts = {}
+        super().__init__(paths)
+
+    def compile(self, lines):
+        routes = {}
+        default = "direct"
+        for line in lines:
+            parts = line.split("#", 1)[0].split()
+            if len(parts) != 2:
+                continue
+            route, host = parts[0].lower(), parts[1].lower().lstrip(".")
+            if route == "default" and host in ROUTES:
+                default = host
+            elif route in ROUTES:
+                routes[host] = route
+        # Swapped in together, a lookup never sees half of a reload
+        self.table = (routes, default)
+
+    def route(self, host):
+        routes, default = self.table
+        host = host.lower()
+        while True:
+            route = routes.get(host)
+            if route is not None:
+                return route
+            dot = host.find(".")
+            if dot < 0:
+                return default
+            host = host[dot + 1:]
+
+    def winner(self, host, now=None):
+        """Return "direct" or "proxy" if a recent race for host decided it, else None."""
+        now = time.monotonic() if now is None else now
+        winner = self.winners.get(host)
+        if winner is None or now - winner[1] > RACE_TTL:
+            return None
+        return winner[0]
+
+    def remember(self, host, route, now=None):
+        self.winners[host] = (route, time.monotonic() if now is None else now)
+
+    def count(self, route):
+        self.counts[route] = self.counts.get(route, 0) + 1
+
+    def stats(self):
+        """Return ({decision: connections}, {host: winner}) for the status display."""
+        now = time.monotonic()
+        winners = {host: route for host, (route, at) in list(self.winners.items()) if now - at <= RACE_TTL}
+        return dict(self.counts), winners
+
+
+def write_default_routes(path=ROUTES_FILE):
+    if not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(DEFAULT_ROUTES)
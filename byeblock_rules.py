@@ -0,0 +1,168 @@
+"""Rules for requests that should never reach the proxy.
+
+One rule per line, # starts a comment:
+
+    sentry.io                      sentry.io and all of its subdomains
+    discord.com/api/v9/science     discord.com/api/v9/science and the paths below it
+    type:prefetch                  every request of that resource type
+
+Hosts are matched by suffix on label boundaries, so a lookup costs one
+dict probe per label of the request host. Paths are matched by prefix on
+segment boundaries: /api/v9/science does not block /api/v9/sciencefoo. Rule files are re-read when
+their modification time changes; hit counts survive the reload.
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+RULES_FILE = "BlockRules.txt"
+
+DEFAULT_RULES = """\
+# Requests matching these rules are blocked before they reach the proxy.
+# host suffix, host suffix + path prefix, or type:<resource type>
+
+# Discord analytics and error reporting
+discord.com/api/v9/science
+discord.com/api/v10/science
+discord.com/api/v9/metrics
+discord.com/api/v10/metrics
+discord.com/error-reporting-proxy
+sentry.io
+
+# Third-party trackers
+google-analytics.com
+googletagmanager.com
+doubleclick.net
+
+# Speculative and fire-and-forget requests
+type:prefetch
+type:ping
+type:csp_report
+"""
+
+
+def path_matches(path, prefix):
+    if not path.startswith(prefix):
+        return False
+    # A prefix ending in "/" is already on a boundary
+    return len(path) == len(prefix) or prefix.endswith("/") or path[len(prefix)] == "/"
+
+
+def parse_rule(line):
+    """Return (host, path) or ("type:", name) for a rule line, None for blanks and comments."""
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return None
+    if line.startswith("type:"):
+        return "type:", line[5:].strip().lower()
+    host, slash, path = line.partition("/")
+    return host.lower().lstrip("."), slash + path
+
+
+class RuleMatcher:
+    def __init__(self, rules):
+        self.rules = []
+        self.by_host = {}
+        self.by_type = {}
+        for rule in rules:
+            parsed = parse_rule(rule)
+            if parsed is None:
+                continue
+            rule = rule.split("#", 1)[0].strip()
+            self.rules.append(rule)
+            host, path = parsed
+            if host == "type:":
+                self.by_type[path] = rule
+            else:
+                self.by_host.setdefault(host, []).append((path, rule))
+        for entries in self.by_host.values():
+            # Longest prefix first, so the most specific rule gets the hit
+            entries.sort(key=lambda entry: -len(entry[0]))
+
+    def match(self, host, path, resource_type=None):
+        """Return the rule that blocks the request, or None."""
+        rule = self.by_type.get(resource_type)
+        if rule is not None:
+            return rule
+        host = host.lower()
+        while True:
+            for prefix, rule in self.by_host.get(host, ()):
+                if path_matches(path, prefix):
+                    return rule
+            dot = host.find(".")
+            if dot < 0:
+                return None
+            host = host[dot + 1:]
+
+
+class RuleFiles(ABC):
+    """Lines read from a list of files, read again when one of them changes.
+
+    Subclasses turn the lines into whatever they match with in compile().
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.mtimes = {}
+        self.reload()
+
+    @abstractmethod
+    def compile(self, lines):
+        """Build the matcher from the lines of all files."""
+
+    def reload(self):
+        lines = []
+        mtimes = {}
+        for path in self.paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+                with open(path, encoding="utf-8", errors="replace") as file:
+                    lines.extend(file)
+            except OSError:
+                mtimes[path] = None
+        self.mtimes = mtimes
+        self.compile(lines)
+
+    def reload_if_changed(self):
+        for path in self.paths:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self.mtimes.get(path):
+                self.reload()
+                return True
+        return False
+
+
+class RuleSet(RuleFiles):
+    """Block rules from a list of files with hit counters."""
+
+    def __init__(self, paths=(RULES_FILE,)):
+        self.hits = {}
+        self.requests = 0
+        super().__init__(paths)
+
+    def compile(self, lines):
+        # Swapped in whole, the matcher in use is never half built
+        self.matcher = RuleMatcher(lines)
+
+    def blocked(self, host, path, resource_type=None):
+        self.requests += 1
+        rule = self.matcher.match(host, path, resource_type)
+        if rule is None:
+            return False
+        self.hits[rule] = self.hits.get(rule, 0) + 1
+        return True
+
+    def stats(self):
+        """Return (requests seen, requests blocked, [(rule, hits)] most hit first)."""
+        counts = [(rule, self.hits.get(rule, 0)) for rule in self.matcher.rules]
+        counts.sort(key=lambda item: -item[1])
+        return self.requests, sum(self.hits.values()), counts
+
+
+def write_default_rules(path=RULES_FILE):
+    if not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(DEFAULT_RULES)
@@ -0,0 +1,158 @@
+"""Decide when each proxy is probed next.
+
+A proxy starts at the base interval. One that keeps answering steadily
+is probed less and less often, down to max_interval. One that keeps
+failing backs off exponentially up to max_backoff. When the latency of a
+proxy suddenly swings much more than it used to, it gets a short burst
+of fast probes so the graph and the failover see what is going on.
+Every interval is jittered so proxies added together do not stay in
+lockstep, and a token bucket caps the probes per minute over all proxies.
+"""
+
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+
+STABLE_STEP = 10
+RECENT = 5
+BASELINE_WEIGHT = 0.1
+MIN_SWING_MS = 20
+
+
+@dataclass
+class ScheduleConfig:
+    interval: float = 1
+    max_interval: float = 10
+    max_backoff: float = 60
+    jitter: float = 0.2
+    burst_interval: float = 0.25
+    burst_seconds: float = 10
+    burst_factor: float = 3
+    budget: int = 600
+
+
+class ProxySchedule:
+    def __init__(self, due):
+        self.due = due
+        self.interval = 0
+        self.failures = 0
+        self.streak = 0
+        self.latencies = deque(maxlen=RECENT)
+        self.baseline = None
+        self.burst_until = 0
+        self.running = False
+
+
+def mean_swing(latencies):
+    values = list(latencies)
+    return sum(abs(b - a) for a, b in zip(values, values[1:])) / (len(values) - 1)
+
+
+class ProbeScheduler:
+    """Hand out the proxies that are due, within the per-minute budget.
+
+    Call due() to get the names to probe now and done() with every result.
+    Pinned proxies (the one on the graph, the active one) never slow down
+    past the base interval and go first when the budget is short.
+    """
+
+    def __init__(self, config=None, rng=None):
+        self.config = config or ScheduleConfig()
+        self.rng = rng or random.Random()
+        self.proxies = {}
+        self.pinned = set()
+        self.tokens = self.capacity()
+        self.refilled_at = time.monotonic()
+
+    def capacity(self):
+        # A quarter of a minute's worth, enough for a first pass over a long list
+        return max(1, self.config.budget / 4)
+
+    def rate(self):
+        return max(1, self.config.budget) / 60
+
+    def refill(self, now):
+        rate = self.rate()
+        self.tokens = min(self.capacity(), self.tokens + (now - self.refilled_at) * rate)
+        self.refilled_at = now
+
+    def forget_missing(self, names):
+        for name in set(self.proxies) - set(names):
+            del self.proxies[name]
+
+    def reset(self):
+        """Forget the probes in flight, whose results will never come, e.g. after a stop."""
+        for schedule in self.proxies.values():
+            schedule.running = False
+
+    def due(self, names, now=None):
+        """Return the names to probe now; they count as running until done()."""
+        now = time.monotonic() if now is None else now
+        self.refill(now)
+        ready = []
+        for name in names:
+            schedule = self.proxies.get(name)
+            if schedule is None:
+                # Spread a new list over the first interval instead of probing it all at once
+                schedule = self.proxies[name] = ProxySchedule(now + self.rng.uniform(0, self.config.interval))
+            if not schedule.running and schedule.due <= now:
+                ready.append(name)
+        ready.sort(key=lambda name: (name not in self.pinned,
+                                     self.proxies[name].burst_until <= now,
+                                     self.proxies[name].due))
+        ready = ready[:int(self.tokens)]
+        self.tokens -= len(ready)
+        for name in ready:
+            self.proxies[name].running = True
+        return ready
+
+    def done(self, result, now=None):
+        now = time.monotonic() if now is None else now
+        schedule = self.proxies.get(result.proxy)
+        if schedule is None:
+            return
+        schedule.running = False
+        config = self.config
+        if not result.ok:
+            schedule.failures += 1
+            schedule.streak = 0
+            interval = min(config.max_backoff, config.interval * 2 ** schedule.failures)
+        else:
+            schedule.failures = 0
+            schedule.streak += 1
+            self.track_swing(schedule, result.ms, now)
+            if schedule.burst_until > now:
+                interval = config.burst_interval
+            else:
+                interval = min(config.max_interval, config.interval * 2 ** (schedule.streak // STABLE_STEP))
+        if result.proxy in self.pinned:
+            interval = min(interval, config.interval)
+        schedule.interval = interval
+        schedule.due = now + interval * self.rng.uniform(1 - config.jitter, 1 + config.jitter)
+
+    def track_swing(self, schedule, ms, now):
+        if schedule.latencies:
+            step = abs(ms - schedule.latencies[-1])
+            schedule.latencies.append(ms)
+            if len(schedule.latencies) == RECENT and schedule.baseline is not None:
+                swing = mean_swing(schedule.latencies)
+                if swing > MIN_SWING_MS and swing > self.config.burst_factor * schedule.baseline:
+                    if schedule.burst_until <= now:
+                        schedule.burst_until = now + self.config.burst_seconds
+                    schedule.streak = 0
+            if schedule.baseline is None:
+                schedule.baseline = step
+            else:
+                schedule.baseline += BASELINE_WEIGHT * (step - schedule.baseline)
+        else:
+            schedule.latencies.append(ms)
+
+    def next_wakeup(self, now=None):
+        """Seconds until something may be due, between 50 ms and 1 s."""
+        now = time.monotonic() if now is None else now
+        waiting = [schedule.due for schedule in self.proxies.values() if not schedule.running]
+        delay = min(waiting) - now if waiting else 1
+        if self.tokens < 1:
+            delay = max(delay, (1 - self.tokens) / self.rate())
+        return min(1, max(0.05, delay))
@@ -0,0 +1,148 @@
+"""Rank stored proxies by recent probe results and pick the best one.
+
+Proxies are also charged the time a REFERENCE_BYTES transfer takes at
+their measured bandwidth, so a fast-answering but throttled proxy ranks
+below a slower one that moves attachments and video quickly. Proxies
+without a measurement are charged at the median of the measured ones,
+so not being tested is neither a penalty nor a way to rank first.
+"""
+
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+
+WINDOW = 30
+LOSS_PENALTY_MS = 2000
+JITTER_WEIGHT = 2
+REFERENCE_BYTES = 256 * 1024
+
+
+def transfer_ms(bandwidth):
+    """Milliseconds to move REFERENCE_BYTES at bandwidth bytes per second."""
+    return REFERENCE_BYTES / bandwidth * 1000 if bandwidth else math.inf
+
+
+@dataclass
+class ProxyStats:
+    samples: int
+    latency: float
+    loss: float
+    jitter: float
+    bandwidth: float = None
+
+    def score(self):
+        """Lower is better; a proxy with no samples scores infinity."""
+        if not self.samples or math.isnan(self.latency):
+            return math.inf
+        score = self.latency + JITTER_WEIGHT * self.jitter + LOSS_PENALTY_MS * self.loss
+        if self.bandwidth is not None:
+            score += transfer_ms(self.bandwidth)
+        return score
+
+
+@dataclass
+class FailoverConfig:
+    enabled: bool = False
+    max_latency: float = 800
+    max_loss: float = 0.3
+    hysteresis: float = 0.2
+    min_dwell: float = 30
+    min_samples: int = 5
+
+
+class ProxySelector:
+    """Keep a rolling window of probe results per proxy.
+
+    choose() only moves away from the active proxy when it is unhealthy
+    (over max_latency or max_loss), the candidate beats it by the
+    hysteresis margin, and the active proxy has been in use for at least
+    min_dwell seconds. That keeps two similar proxies from flapping.
+    """
+
+    def __init__(self, config=None, window=WINDOW):
+        self.config = config or FailoverConfig()
+        self.window = window
+        self.history = {}
+        self.bandwidth = {}
+        self.active = None
+        self.switched_at = 0
+
+    def add(self, result):
+        samples = self.history.setdefault(result.proxy, deque(maxlen=self.window))
+        samples.append(result.ms if result.ok else None)
+
+    def add_all(self, results):
+        for result in results:
+            self.add(result)
+
+    def set_bandwidth(self, name, bandwidth):
+        """Sustained bytes per second from the last throughput test that got data through."""
+        self.bandwidth[name] = bandwidth
+
+    def forget_missing(self, names):
+        for name in set(self.history) - set(names):
+            del self.history[name]
+        for name in set(self.bandwidth) - set(names):
+            del self.bandwidth[name]
+
+    def median_bandwidth(self):
+        measured = sorted(self.bandwidth.values())
+        return measured[len(measured) // 2] if measured else None
+
+    def stats(self, name):
+        samples = self.history.get(name, ())
+        latencies = [ms for ms in samples if ms is not None]
+        bandwidth = self.bandwidth.get(name)
+        if bandwidth is None:
+            bandwidth = self.median_bandwidth()
+        if not samples:
+            return ProxyStats(0, math.nan, 0, 0, bandwidth)
+        loss = 1 - len(latencies) / len(samples)
+        if not latencies:
+            return ProxyStats(len(samples), math.nan, loss, 0, bandwidth)
+        latency = sorted(latencies)[len(latencies) // 2]
+        jitter = 0
+        if len(latencies) > 1:
+            jitter = sum(abs(b - a) for a, b in zip(latencies, latencies[1:])) / (len(latencies) - 1)
+        return ProxyStats(len(samples), latency, loss, jitter, bandwidth)
+
+    def ranking(self):
+        """Return (name, stats) pairs, best first."""
+        ranked = [(name, self.stats(name)) for name in self.history]
+        ranked.sort(key=lambda item: item[1].score())
+        return ranked
+
+    def is_healthy(self, name):
+        stats = self.stats(name)
+        if stats.samples < self.config.min_samples:
+            return True
+        if math.isnan(stats.latency):
+            return False
+        return stats.latency <= self.config.max_latency and stats.loss <= self.config.max_loss
+
+    def choose(self, now=None):
+        """Return the proxy to switch to, or None to keep the active one."""
+        now = time.time() if now is None else now
+        ranked = [(name, stats) for name, stats in self.ranking()
+                  if stats.samples >= self.config.min_samples and math.isfinite(stats.score())]
+        if not ranked:
+            return None
+        best, best_stats = ranked[0]
+        if best == self.active:
+            return None
+        if self.active is None or self.active not in self.history:
+            return self.switch(best, now)
+        if self.is_healthy(self.active):
+            return None
+        if now - self.switched_at < self.config.min_dwell:
+            return None
+        active_score = self.stats(self.active).score()
+        if best_stats.score() > active_score * (1 - self.config.hysteresis):
+            return None
+        return self.switch(best, now)
+
+    def switch(self, name, now):
+        self.active = name
+        self.switched_at = now
+        return name
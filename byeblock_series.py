@@ -0,0 +1,102 @@
+"""Fixed-size time series used by the ping graph.
+
+Samples go into preallocated NumPy arrays, so appending never allocates
+and memory stays the same however long the graph runs. A lost probe is
+stored as NaN.
+"""
+
+import time
+
+import numpy as np
+
+DECIMATE_MODES = ("min/max", "p50", "p95", "p99")
+
+
+class RingSeries:
+    def __init__(self, capacity, columns=("value",)):
+        self.capacity = capacity
+        self.columns = list(columns)
+        self.times = np.full(capacity, np.nan)
+        self.values = np.full((capacity, len(self.columns)), np.nan)
+        self.pos = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.times.fill(np.nan)
+        self.values.fill(np.nan)
+        self.pos = 0
+        self.count = 0
+
+    def append(self, row, timestamp=None):
+        """Store one sample; row is a sequence with one value per column."""
+        self.times[self.pos] = time.time() if timestamp is None else timestamp
+        self.values[self.pos] = row
+        self.pos = (self.pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        """Return (times, values) oldest first."""
+        if self.count < self.capacity:
+            return self.times[:self.count], self.values[:self.count]
+        return (np.concatenate((self.times[self.pos:], self.times[:self.pos])),
+                np.concatenate((self.values[self.pos:], self.values[:self.pos])))
+
+    def window(self, seconds, now=None):
+        """Return (times, values) of the samples from the last seconds."""
+        times, values = self.ordered()
+        now = time.time() if now is None else now
+        start = np.searchsorted(times, now - seconds)
+        return times[start:], values[start:]
+
+    def stats(self, seconds, column=0, now=None):
+        """Return p50/p95/p99 latency and loss rate over the last seconds."""
+        values = self.window(seconds, now)[1][:, column]
+        if not len(values):
+            return {"p50": np.nan, "p95": np.nan, "p99": np.nan, "loss": 0.0, "samples": 0}
+        finite = values[np.isfinite(values)]
+        if len(finite):
+            p50, p95, p99 = np.percentile(finite, (50, 95, 99))
+        else:
+            p50 = p95 = p99 = np.nan
+        return {"p50": p50, "p95": p95, "p99": p99,
+                "loss": 1 - len(finite) / len(values), "samples": len(values)}
+
+
+def decimate(times, values, max_points, mode="min/max"):
+    """Reduce a series to about max_points points for drawing.
+
+    "min/max" keeps the lowest and highest value of every bucket so spikes
+    stay visible; "p50"/"p95"/"p99" keep that percentile of every bucket.
+    Buckets with nothing but lost probes stay NaN.
+    """
+    count = len(times)
+    if count <= max_points:
+        return times, values
+    if mode == "min/max":
+        buckets = max(1, max_points // 2)
+        edges = np.linspace(0, count, buckets + 1).astype(int)
+        starts, ends = edges[:-1], edges[1:] - 1
+        out_times = np.empty(buckets * 2)
+        out_times[0::2] = times[starts]
+        out_times[1::2] = times[ends]
+        out_values = np.empty((buckets * 2,) + values.shape[1:])
+        with np.errstate(invalid="ignore"):
+            out_values[0::2] = np.fmin.reduceat(values, starts, axis=0)
+            out_values[1::2] = np.fmax.reduceat(values, starts, axis=0)
+        return out_times, out_values
+
+    size = -(-count // max_points)
+    trimmed = count - count % size
+    times = times[count - trimmed:]
+    values = values[count - trimmed:]
+    # np.sort puts NaN last, so the rank can be picked among the finite values
+    shaped = np.sort(values.reshape((trimmed // size, size) + values.shape[1:]), axis=1)
+    finite = np.isfinite(shaped).sum(axis=1)
+    rank = np.maximum(finite - 1, 0) * float(mode[1:]) // 100
+    out_values = np.take_along_axis(shaped, rank.astype(int)[:, None], axis=1)[:, 0]
+    out_values[finite == 0] = np.nan
+    return times[size - 1::size], out_values
+
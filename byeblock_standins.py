@@ -0,0 +1,288 @@
+"""Local stand-ins for an origin server, a WebSocket server and HTTP/SOCKS5 proxies.
+
+Used by the benchmarks and the tests, so the probe path can be measured
+without the network. Every server listens on 127.0.0.1 on a free port and serves
+each connection on its own thread.
+
+The proxies can be made slower and less reliable:
+
+    delay  seconds before the proxy answers CONNECT, the SOCKS5 request
+           or a forwarded request
+    loss   share of connections, 0 to 1, closed at once without a reply
+    rate   bytes per second per connection towards the client, 0 for no cap
+"""
+
+import base64
+import hashlib
+import random
+import re
+import select
+import socket
+import socketserver
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import urlsplit
+
+from byeblock_gateway import OP_CLOSE, OP_PING, OP_PONG, OP_TEXT, WS_GUID
+
+RELAY_CHUNK = 65536
+
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, handler, proxy_type=None, delay=0, loss=0, rate=0):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.type = proxy_type
+        self.delay = delay
+        self.loss = loss
+        self.rate = rate
+        self.thread = threading.Thread(target=self.serve_forever, name="standin", daemon=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class OriginHandler(socketserver.StreamRequestHandler):
+    """Answer HEAD and GET; "bytes=N" in the query sets the body size."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+            pass
+        parts = line.split()
+        if len(parts) < 2:
+            return
+        match = re.search(rb"bytes=(\d+)", parts[1])
+        size = int(match.group(1)) if match else 0
+        self.wfile.write(f"HTTP/1.1 200 OK\r\nContent-Length: {size}\r\nConnection: close\r\n\r\n".encode())
+        if parts[0] == b"HEAD":
+            return
+        chunk = b"x" * RELAY_CHUNK
+        try:
+            while size > 0:
+                self.wfile.write(chunk[:size])
+                size -= RELAY_CHUNK
+        except OSError:
+            pass
+
+
+class WebSocketHandler(socketserver.StreamRequestHandler):
+    """WebSocket echo server: pongs pings and echoes text frames.
+
+    server.pongs is how many pings of a connection are answered before it
+    goes silent, a stall; server.close_after is the number of pings after
+    which the server closes the connection. None for neither.
+    """
+
+    def read(self, size):
+        data = self.rfile.read(size)
+        if len(data) < size:
+            raise ConnectionError("client closed the connection")
+        return data
+
+    def send(self, opcode, payload=b""):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+        self.wfile.write(header + payload)
+
+    def receive(self):
+        first, second = self.read(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self.read(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self.read(8))[0]
+        mask = self.read(4) if second & 0x80 else bytes(4)
+        payload = self.read(length)
+        return first & 0x0F, bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+
+    def handle(self):
+        self.rfile.readline()
+        key = None
+        while True:
+            header = self.rfile.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.partition(b":")
+            if name.strip().lower() == b"sec-websocket-key":
+                key = value.strip()
+        if key is None:
+            self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            return
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest())
+        self.wfile.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        pongs = getattr(self.server, "pongs", None)
+        close_after = getattr(self.server, "close_after", None)
+        pings = 0
+        try:
+            while True:
+                opcode, payload = self.receive()
+                if opcode == OP_PING:
+                    pings += 1
+                    if close_after is not None and pings > close_after:
+                        self.send(OP_CLOSE, struct.pack(">H", 1001))
+                        return
+                    if pongs is None or pings <= pongs:
+                        self.send(OP_PONG, payload)
+                elif opcode == OP_TEXT:
+                    self.send(OP_TEXT, payload)
+                elif opcode == OP_CLOSE:
+                    self.send(OP_CLOSE, payload[:2])
+                    return
+        except OSError:
+            pass
+
+
+class ProxyHandler(socketserver.StreamRequestHandler, ABC):
+    # Unbuffered, so nothing the client sends after the request head is
+    # stuck in rfile when the relay switches to the raw socket
+    rbufsize = 0
+
+    def read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.rfile.read(size - len(data))
+            if not chunk:
+                raise ConnectionError("client closed the connection")
+            data += chunk
+        return data
+
+    def handle(self):
+        if self.server.loss and random.random() < self.server.loss:
+            return
+        try:
+            upstream = self.open_upstream()
+        except OSError:
+            return
+        if upstream is not None:
+            with upstream:
+                self.relay(upstream)
+
+    @abstractmethod
+    def open_upstream(self):
+        """Read the client's request and return the connected upstream socket, or None to drop it."""
+
+    def relay(self, upstream):
+        client = self.connection
+        rate = self.server.rate
+        start = time.perf_counter()
+        sent = 0
+        while True:
+            readable, _, _ = select.select([client, upstream], [], [])
+            for sock in readable:
+                try:
+                    data = sock.recv(RELAY_CHUNK)
+                    if not data:
+                        return
+                    if sock is client:
+                        upstream.sendall(data)
+                        continue
+                    client.sendall(data)
+                except OSError:
+                    return
+                sent += len(data)
+                if rate:
+                    wait = start + sent / rate - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+
+
+class ConnectProxyHandler(ProxyHandler):
+    """HTTP proxy: CONNECT tunnels and absolute-URL forwarding."""
+
+    def open_upstream(self):
+        line = self.rfile.readline().decode("latin-1")
+        headers = []
+        while True:
+            header = self.rfile.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            if not header.lower().startswith(b"proxy-"):
+                headers.append(header)
+        parts = line.split()
+        if len(parts) < 3:
+            return None
+        method, target, version = parts
+        time.sleep(self.server.delay)
+        if method == "CONNECT":
+            host, _, port = target.rpartition(":")
+            upstream = socket.create_connection((host, int(port)))
+            self.wfile.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            return upstream
+        url = urlsplit(target)
+        path = url.path or "/"
+        if url.query:
+            path += "?" + url.query
+        upstream = socket.create_connection((url.hostname, url.port or 80))
+        upstream.sendall(f"{method} {path} {version}\r\n".encode("latin-1") + b"".join(headers) + b"\r\n")
+        return upstream
+
+
+class Socks5ProxyHandler(ProxyHandler):
+    """SOCKS5 proxy without authentication, CONNECT only."""
+
+    def open_upstream(self):
+        read = self.read
+        head = read(2)
+        if head[0] != 5:
+            return None
+        if 0 not in read(head[1]):
+            self.wfile.write(b"\x05\xff")
+            return None
+        self.wfile.write(b"\x05\x00")
+        request = read(4)
+        if request[1] != 1:
+            return None
+        if request[3] == 1:
+            host = socket.inet_ntoa(read(4))
+        elif request[3] == 3:
+            host = read(read(1)[0]).decode("idna")
+        elif request[3] == 4:
+            host = socket.inet_ntop(socket.AF_INET6, read(16))
+        else:
+            return None
+        port = struct.unpack(">H", read(2))[0]
+        time.sleep(self.server.delay)
+        try:
+            upstream = socket.create_connection((host, port))
+        except OSError:
+            self.wfile.write(b"\x05\x05\x00\x01" + bytes(6))
+            return None
+        self.wfile.write(b"\x05\x00\x00\x01" + bytes(6))
+        return upstream
+
+
+def start_origin():
+    return StandinServer(OriginHandler).start()
+
+
+def start_websocket(pongs=None, close_after=None):
+    server = StandinServer(WebSocketHandler)
+    server.pongs = pongs
+    server.close_after = close_after
+    return server.start()
+
+
+def start_proxy(proxy_type="HTTP", delay=0, loss=0, rate=0):
+    handler = Socks5ProxyHandler if proxy_type == "SOCKS5" else ConnectProxyHandler
+    return StandinServer(handler, proxy_type, delay, loss, rate).start()
@@ -0,0 +1,163 @@
+"""Bandwidth test of a proxy: download a payload over parallel streams.
+
+Every stream tunnels through the proxy like the phase probe and reads
+the response body until the payload is done or the time is up. Bytes
+are counted in short slices over all streams. The peak is the best
+one-second window, and sustained is the average from the first byte to
+the end. Proxies are tested one after the other, so they do not share
+the local link.
+"""
+
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+
+from byeblock_probe import ProbeError, open_url
+
+THROUGHPUT_URL = "https://speed.cloudflare.com/__down?bytes={bytes}"
+PAYLOAD_BYTES = 25 * 1048576
+STREAMS = 4
+DURATION = 10
+SLICE = 0.1
+
+
+@dataclass
+class ThroughputConfig:
+    url: str = THROUGHPUT_URL
+    payload: int = PAYLOAD_BYTES
+    streams: int = STREAMS
+    duration: float = DURATION
+
+
+@dataclass
+class ThroughputResult:
+    proxy: str
+    ok: bool
+    sustained: float = 0
+    peak: float = 0
+    bytes: int = 0
+    seconds: float = 0
+    error: str = ""
+    timestamp: float = field(default_factory=time.time)
+
+
+class Meter:
+    """Bytes per SLICE of all streams, from the first byte on."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slices = []
+        self.first = None
+        self.last = None
+
+    def add(self, size):
+        now = time.perf_counter()
+        with self.lock:
+            if self.first is None:
+                self.first = now
+            index = int((now - self.first) / SLICE)
+            if index >= len(self.slices):
+                self.slices.extend([0] * (index + 1 - len(self.slices)))
+            self.slices[index] += size
+            self.last = now
+
+    def total(self):
+        return sum(self.slices)
+
+    def seconds(self):
+        return self.last - self.first if self.first is not None else 0
+
+    def peak(self):
+        """Bytes per second of the best one-second window."""
+        width = int(round(1 / SLICE))
+        if len(self.slices) <= width:
+            return self.total() / max(self.seconds(), SLICE)
+        window = sum(self.slices[:width])
+        best = window
+        for index in range(width, len(self.slices)):
+            window += self.slices[index] - self.slices[index - width]
+            best = max(best, window)
+        return best
+
+
+def stream(target, url, meter, deadline, timeout, sockets, stop=None):
+    sock, host, path = open_url(target, url, timeout, lambda phase: None, sockets=sockets)
+    try:
+        if stop is not None and stop.is_set():
+            return
+        auth = ""
+        if target.user and target.type == "HTTP" and path == url:
+            auth = f"Proxy-Authorization: {target.basic_auth()}\r\n"
+        sock.sendall(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{auth}Connection: close\r\n\r\n".encode())
+        head = b""
+        while b"\r\n\r\n" not in head:
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise ProbeError("HTTPError", "empty response")
+            head += chunk
+        head, _, body = head.partition(b"\r\n\r\n")
+        status = head.split(b"\r\n", 1)[0].split()
+        if len(status) < 2 or status[1] != b"200":
+            raise ProbeError("HTTPError", head.split(b"\r\n", 1)[0].decode(errors="replace"))
+        if body:
+            meter.add(len(body))
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or stop is not None and stop.is_set():
+                return
+            sock.settimeout(min(timeout, remaining))
+            try:
+                chunk = sock.recv(262144)
+            except socket.timeout:
+                if time.perf_counter() >= deadline:
+                    return
+                raise ProbeError("Timeout")
+            if not chunk:
+                return
+            meter.add(len(chunk))
+    finally:
+        if sockets is not None:
+            sockets.discard(sock)
+        sock.close()
+
+
+def measure_throughput(target, url=THROUGHPUT_URL, payload=PAYLOAD_BYTES, streams=STREAMS,
+                       duration=DURATION, timeout=5, sockets=None, stop=None):
+    """Download payload bytes over streams connections through target for at most duration seconds.
+
+    "{bytes}" in url is replaced by the payload size. Streams that fail
+    while others carry on only lower the result; it is a failure when no
+    byte came through at all.
+
+    Setting the stop event ends the test within a slice. Shutting down
+    sockets cannot interrupt a DNS lookup or a connect, so streams still
+    opening are left behind; they close their socket once it is open.
+    """
+    url = url.replace("{bytes}", str(payload))
+    meter = Meter()
+    deadline = time.perf_counter() + duration
+    errors = []
+
+    def run():
+        try:
+            stream(target, url, meter, deadline, timeout, sockets, stop)
+        except ProbeError as e:
+            errors.append(e.kind)
+        except OSError as e:
+            errors.append(type(e).__name__)
+
+    threads = [threading.Thread(target=run, name="throughput", daemon=True) for _ in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            if stop is not None and stop.is_set():
+                return ThroughputResult(target.name, False, error="Cancelled")
+            thread.join(SLICE)
+    total = meter.total()
+    if not total:
+        return ThroughputResult(target.name, False, error=errors[0] if errors else "NoData")
+    seconds = max(meter.seconds(), SLICE)
+    return ThroughputResult(target.name, True, total / seconds, meter.peak(), total, seconds,
+                            errors[0] if errors else "")
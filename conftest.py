@@ -0,0 +1,2 @@
+# Makes pytest put this directory on sys.path, so the tests import the
+# byeblock_* modules without installing anything.
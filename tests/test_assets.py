@@ -0,0 +1,96 @@
+import socketserver
+
+import pytest
+
+from byeblock_assets import AssetStore
+from byeblock_standins import StandinServer, start_proxy
+
+ASSETS = {
+    "/assets/app.0123abcd4567.js": b"console.log('app');" * 100,
+    "/assets/copy.89abcdef0123.js": b"console.log('app');" * 100,
+    "/assets/logo.fedcba987654.svg": b"<svg/>" * 400,
+}
+
+
+class AssetOriginHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+            pass
+        self.server.requests += 1
+        path = line.split()[1].decode()
+        body = ASSETS.get(path)
+        if body is None:
+            self.wfile.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            return
+        mime = "image/svg+xml" if path.endswith(".svg") else "text/javascript; charset=utf-8"
+        self.wfile.write(f"HTTP/1.1 200 OK\r\nContent-Type: {mime}\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode() + body)
+
+
+@pytest.fixture
+def origin():
+    server = StandinServer(AssetOriginHandler)
+    server.requests = 0
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AssetStore(str(tmp_path), hosts=("127.0.0.1",))
+    yield store
+    store.close()
+
+
+def asset_url(origin, path):
+    return f"http://127.0.0.1:{origin.port}{path}"
+
+
+def test_matches_only_hashed_assets(store, origin):
+    assert store.matches(asset_url(origin, "/assets/app.0123abcd4567.js"))
+    assert not store.matches(asset_url(origin, "/assets/app.js"))
+    assert not store.matches(asset_url(origin, "/assets/app.0123abcd4567.js?v=1"))
+    assert not store.matches("https://example.com/assets/app.0123abcd4567.js")
+
+
+def test_second_fetch_is_served_locally(store, origin):
+    url = asset_url(origin, "/assets/app.0123abcd4567.js")
+    data, mime = store.fetch(url)
+    assert data == ASSETS["/assets/app.0123abcd4567.js"]
+    assert mime == "text/javascript"
+    assert store.fetch(url) == (data, mime)
+    assert origin.requests == 1
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["saved_bytes"] == stats["fetched_bytes"] == len(data)
+
+
+def test_identical_content_shares_one_file(store, origin):
+    store.fetch(asset_url(origin, "/assets/app.0123abcd4567.js"))
+    store.fetch(asset_url(origin, "/assets/copy.89abcdef0123.js"))
+    stats = store.stats()
+    assert stats["files"] == 1
+    assert stats["bytes"] == len(ASSETS["/assets/app.0123abcd4567.js"])
+
+
+def test_least_recently_used_asset_is_evicted(store, origin):
+    store.max_bytes = 3000
+    first = asset_url(origin, "/assets/app.0123abcd4567.js")
+    store.fetch(first)
+    store.fetch(asset_url(origin, "/assets/logo.fedcba987654.svg"))
+    assert store.get(first) is None
+    assert store.stats()["bytes"] <= store.max_bytes
+
+
+def test_misses_are_fetched_through_the_proxy(store, origin):
+    proxy = start_proxy("HTTP")
+    try:
+        url = asset_url(origin, "/assets/logo.fedcba987654.svg")
+        data, mime = store.fetch(url, proxy_url=f"http://127.0.0.1:{proxy.port}")
+    finally:
+        proxy.stop()
+    assert data == ASSETS["/assets/logo.fedcba987654.svg"]
+    assert mime == "image/svg+xml"
+    assert origin.requests == 1
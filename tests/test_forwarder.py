@@ -0,0 +1,83 @@
+import socket
+import socketserver
+import struct
+import time
+
+from byeblock_forwarder import LocalForwarder
+from byeblock_probe import ProxyTarget
+from byeblock_routing import DEFAULT_ROUTES, RouteTable
+from byeblock_standins import StandinServer
+
+
+class ReplyAtEofHandler(socketserver.BaseRequestHandler):
+    """Read until the client half-closes, then answer with what came in."""
+
+    def handle(self):
+        data = b""
+        while True:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        self.request.sendall(b"got " + data)
+
+
+def socks5_connect(port, host, target_port):
+    sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+    sock.sendall(b"\x05\x01\x00")
+    assert sock.recv(2) == b"\x05\x00"
+    sock.sendall(b"\x05\x01\x00\x01" + socket.inet_aton(host) + struct.pack(">H", target_port))
+    reply = b""
+    while len(reply) < 10:
+        reply += sock.recv(10 - len(reply))
+    assert reply[1] == 0
+    return sock
+
+
+def test_half_close_reaches_the_other_side(tmp_path):
+    routes_file = tmp_path / "Routes.txt"
+    routes_file.write_text("default direct\n")
+    origin = StandinServer(ReplyAtEofHandler).start()
+    forwarder = LocalForwarder(routes=RouteTable([str(routes_file)]))
+    forwarder.start()
+    try:
+        sock = socks5_connect(forwarder.port, "127.0.0.1", origin.port)
+        with sock:
+            sock.sendall(b"request")
+            sock.shutdown(socket.SHUT_WR)
+            reply = b""
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                reply += chunk
+        assert reply == b"got request"
+    finally:
+        forwarder.stop()
+        origin.stop()
+
+
+def test_dead_upstream_is_not_refilled_during_its_cooldown():
+    dead = socket.socket()
+    dead.bind(("127.0.0.1", 0))
+    port = dead.getsockname()[1]
+    dead.close()
+    forwarder = LocalForwarder(pool_size=1)
+    forwarder.start()
+    try:
+        forwarder.set_upstreams([ProxyTarget("dead", "127.0.0.1", port, "HTTP")])
+        time.sleep(3.5)
+        assert forwarder.stats()["dead"]["failures"] == 1
+    finally:
+        forwarder.stop()
+
+
+def test_default_routes_send_only_discord_through_the_proxy(tmp_path):
+    routes_file = tmp_path / "Routes.txt"
+    routes_file.write_text(DEFAULT_ROUTES)
+    routes = RouteTable([str(routes_file)])
+    assert routes.route("gateway.discord.gg") == "proxy"
+    assert routes.route("discord.com") == "proxy"
+    assert routes.route("media.discordapp.net") == "race"
+    assert routes.route("example.org") == "direct"
+    assert routes.route("notdiscord.com") == "direct"
@@ -0,0 +1,87 @@
+import pytest
+
+from byeblock_gateway import GatewayProbe, open_websocket
+from byeblock_probe import ProbeError, ProxyTarget
+from byeblock_standins import start_origin, start_proxy, start_websocket
+
+STALL_TIMEOUT = 0.5
+
+
+@pytest.fixture(params=["HTTP", "SOCKS5"])
+def proxy(request):
+    server = start_proxy(request.param)
+    yield ProxyTarget(request.param, "127.0.0.1", server.port, request.param)
+    server.stop()
+
+
+def gateway(**options):
+    server = start_websocket(**options)
+    return server, f"ws://127.0.0.1:{server.port}/?v=9"
+
+
+def test_handshake_times_every_phase(proxy):
+    server, url = gateway()
+    try:
+        ws, phases = open_websocket(proxy, url, timeout=2)
+        with ws.sock:
+            assert set(phases) == {"dns", "connect", "proxy", "tls", "ttfb"}
+            assert ws.ping(2) > 0
+    finally:
+        server.stop()
+
+
+def test_a_server_that_does_not_upgrade_is_an_http_error(proxy):
+    origin = start_origin()
+    try:
+        with pytest.raises(ProbeError) as error:
+            open_websocket(proxy, f"ws://127.0.0.1:{origin.port}/", timeout=2)
+    finally:
+        origin.stop()
+    assert error.value.kind == "HTTPError"
+
+
+def test_pings_reuse_the_held_connection(proxy):
+    server, url = gateway()
+    probe = GatewayProbe(url, timeout=2, stall_timeout=STALL_TIMEOUT)
+    try:
+        results = [probe.probe(proxy) for _ in range(3)]
+        stats = probe.stats()[proxy.name]
+    finally:
+        probe.close()
+        server.stop()
+    assert all(result.ok for result in results), [result.error for result in results]
+    assert all(0 < result.ms < STALL_TIMEOUT * 1000 for result in results)
+    assert results[0].phases and not results[1].phases
+    assert stats["opened"] == 1
+    assert stats["held_s"] > 0
+
+
+def test_a_silent_server_is_a_stall(proxy):
+    server, url = gateway(pongs=1)
+    probe = GatewayProbe(url, timeout=2, stall_timeout=STALL_TIMEOUT)
+    try:
+        first = probe.probe(proxy)
+        second = probe.probe(proxy)
+        stats = probe.stats()[proxy.name]
+    finally:
+        probe.close()
+        server.stop()
+    assert first.ok, first.error
+    assert not second.ok and second.error == "Stall"
+    assert stats["stalls"] == 1 and stats["disconnects"] == 0
+    assert stats["detect_ms"] >= STALL_TIMEOUT * 1000
+
+
+def test_a_closed_connection_is_counted_and_reopened(proxy):
+    server, url = gateway(close_after=1)
+    probe = GatewayProbe(url, timeout=2, stall_timeout=STALL_TIMEOUT)
+    try:
+        results = [probe.probe(proxy) for _ in range(3)]
+        stats = probe.stats()[proxy.name]
+    finally:
+        probe.close()
+        server.stop()
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].error == "Disconnected"
+    assert stats["opened"] == 2 and stats["disconnects"] == 1 and stats["stalls"] == 0
+    assert stats["disconnect_rate"] == 0.5
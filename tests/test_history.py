@@ -0,0 +1,24 @@
+import time
+
+from byeblock_history import ProbeHistory
+from byeblock_probe import ProbeResult
+
+
+def test_aggregate_spans_raw_and_compacted_samples(tmp_path):
+    history = ProbeHistory(str(tmp_path / "history.sqlite"), raw_hours=1)
+    now = time.time()
+    old = now - 3 * 3600
+    history.append([ProbeResult("a", True, 100, timestamp=old), ProbeResult("a", True, 300, timestamp=old + 1),
+                    ProbeResult("b", False, error="Timeout", timestamp=old)])
+    history.compact(now)
+    history.append([ProbeResult("a", False, error="Timeout", timestamp=now - 10),
+                    ProbeResult("a", True, 50, timestamp=now - 5)])
+    try:
+        assert [result.ms for result in history.results("a", old, now)] == [None, 50]
+        stats = history.aggregate(now - 86400, now)
+        recent = history.aggregate(now - 60, now)
+    finally:
+        history.close()
+    assert stats["a"] == {"samples": 4, "loss": 0.25, "avg_ms": 150, "min_ms": 50, "max_ms": 300}
+    assert stats["b"]["loss"] == 1 and stats["b"]["avg_ms"] is None
+    assert recent == {"a": {"samples": 2, "loss": 0.5, "avg_ms": 50, "min_ms": 50, "max_ms": 50}}
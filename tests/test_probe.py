@@ -0,0 +1,30 @@
+from byeblock_probe import ProbeEngine, ProxyTarget, parse_proxy_line, read_proxy_list
+
+BAD_HOSTS = ["proxy..example.com", "a" * 64 + ".example.com"]
+
+
+def test_invalid_host_names_are_not_imported():
+    lines = [f"{host}:8080" for host in BAD_HOSTS] + ["proxy.example.com:8080", "socks5://10.0.0.1:1080"]
+    assert [target.host for target in read_proxy_list(lines)] == ["proxy.example.com", "10.0.0.1"]
+    assert parse_proxy_line("http://[::1]:3128").host == "::1"
+
+
+def test_invalid_host_names_fail_as_dns_errors():
+    engine = ProbeEngine(timeout=1)
+    try:
+        for host in BAD_HOSTS:
+            target = ProxyTarget(host, host, 8080)
+            result = engine.probe(target)
+            assert (result.ok, result.error) == (False, "DNSError")
+            assert [result.error for _, result in engine.stream([target])] == ["DNSError"]
+    finally:
+        engine.close()
+
+
+def test_unexpected_errors_become_failed_results():
+    engine = ProbeEngine(timeout=1)
+    try:
+        result = engine.probe(ProxyTarget("broken", "127.0.0.1", "not a port"))
+    finally:
+        engine.close()
+    assert not result.ok and result.error
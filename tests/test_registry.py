@@ -0,0 +1,70 @@
+import pytest
+
+QtCore = pytest.importorskip("PyQt5.QtCore")
+
+from byeblock_probe import ProxyTarget
+from byeblock_registry import DeferredSettings, IniSettings, ProxyRegistry, read_proxy_targets
+
+
+@pytest.fixture
+def settings(tmp_path):
+    path = str(tmp_path / "Settings.ini")
+    qsettings = QtCore.QSettings(path, QtCore.QSettings.IniFormat)
+    qsettings.setValue("Proxy/one/Host", "10.0.0.1")
+    qsettings.setValue("Proxy/one/Port", 1080)
+    qsettings.setValue("Proxy/one/Type", "SOCKS5")
+    qsettings.setValue("Proxy/one/User", "alice")
+    qsettings.setValue("Proxy/one/Password", "secret")
+    qsettings.setValue("Proxy/two/Host", "10.0.0.2")
+    qsettings.setValue("Proxy/two/Port", 8080)
+    qsettings.sync()
+    return DeferredSettings(qsettings), path
+
+
+def test_removed_keys_read_as_default_before_the_flush(settings):
+    settings, _ = settings
+    settings.remove("Proxy/one")
+    assert settings.value("Proxy/one/User", "") == ""
+    assert settings.value("Proxy/one/Port", 0, type=int) == 0
+    assert not settings.contains("Proxy/one/Host")
+    settings.setValue("Proxy/one/Host", "10.0.0.3")
+    assert settings.value("Proxy/one/Host") == "10.0.0.3"
+    assert settings.value("Proxy/one/Password", "") == ""
+
+
+def test_child_listing_follows_pending_changes(settings):
+    settings, _ = settings
+    settings.remove("Proxy/two")
+    settings.setValue("Proxy/three/Host", "10.0.0.4")
+    settings.beginGroup("Proxy")
+    assert sorted(settings.childGroups()) == ["one", "three"]
+    settings.endGroup()
+    settings.beginGroup("Proxy/one")
+    settings.remove("User")
+    assert "User" not in settings.childKeys()
+    assert settings.value("User") is None
+    settings.endGroup()
+    assert settings.value("Proxy/one/User") is None
+
+
+def test_writes_inside_a_group_land_under_the_group(settings):
+    settings, path = settings
+    settings.beginGroup("Proxy")
+    settings.setValue("x/Host", "10.0.0.9")
+    assert settings.value("x/Host") == "10.0.0.9"
+    assert "x" in settings.childGroups()
+    settings.endGroup()
+    assert settings.value("Proxy/x/Host") == "10.0.0.9"
+    settings.flush()
+    assert IniSettings(path).value("Proxy/x/Host") == "10.0.0.9"
+
+
+def test_put_without_user_drops_the_old_login(settings):
+    settings, path = settings
+    registry = ProxyRegistry(settings)
+    registry.put(ProxyTarget("one", "10.0.0.1", 1081, "HTTP"))
+    target = next(target for target in read_proxy_targets(settings) if target.name == "one")
+    assert (target.port, target.type, target.user, target.password) == (1081, "HTTP", "", "")
+    settings.flush()
+    target = next(target for target in read_proxy_targets(IniSettings(path)) if target.name == "one")
+    assert (target.port, target.user) == (1081, "")
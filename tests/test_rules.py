@@ -0,0 +1,24 @@
+from byeblock_rules import RuleMatcher
+
+RULES = ["discord.com/api/v9/science", "example.com/static/", "sentry.io", "type:ping"]
+
+
+def test_path_rules_match_on_segment_boundaries():
+    matcher = RuleMatcher(RULES)
+    assert matcher.match("discord.com", "/api/v9/science") == "discord.com/api/v9/science"
+    assert matcher.match("discord.com", "/api/v9/science/batch") == "discord.com/api/v9/science"
+    assert matcher.match("discord.com", "/api/v9/sciencefoo") is None
+    assert matcher.match("cdn.example.com", "/static/app.js") == "example.com/static/"
+    assert matcher.match("example.com", "/staticfoo") is None
+
+
+def test_host_rules_match_subdomains_only():
+    matcher = RuleMatcher(RULES)
+    assert matcher.match("o123.ingest.sentry.io", "/api/1/envelope/") == "sentry.io"
+    assert matcher.match("notsentry.io", "/") is None
+
+
+def test_type_rules():
+    matcher = RuleMatcher(RULES)
+    assert matcher.match("example.org", "/", "ping") == "type:ping"
+    assert matcher.match("example.org", "/", "script") is None
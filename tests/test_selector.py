@@ -0,0 +1,33 @@
+from byeblock_probe import ProbeResult
+from byeblock_selector import ProxySelector
+
+
+def selector_with(latencies):
+    selector = ProxySelector()
+    for name, ms in latencies.items():
+        for _ in range(5):
+            selector.add(ProbeResult(name, True, ms))
+    return selector
+
+
+def test_untested_proxy_pays_the_median_bandwidth():
+    selector = selector_with({"fast": 90, "slow": 200, "untested": 100})
+    selector.set_bandwidth("fast", 200 * 1024)
+    selector.set_bandwidth("slow", 200 * 1024)
+    assert selector.stats("untested").bandwidth == 200 * 1024
+    assert [name for name, _ in selector.ranking()] == ["fast", "untested", "slow"]
+
+
+def test_throttled_proxy_ranks_below_untested_fast_ones():
+    selector = selector_with({"throttled": 90, "quick": 200, "untested": 200})
+    selector.set_bandwidth("throttled", 200 * 1024)
+    selector.set_bandwidth("quick", 5 * 1048576)
+    selector.set_bandwidth("other", 5 * 1048576)
+    ranking = [name for name, _ in selector.ranking()]
+    assert ranking.index("throttled") > ranking.index("untested")
+
+
+def test_no_measurements_rank_on_latency_alone():
+    selector = selector_with({"a": 150, "b": 100})
+    assert selector.stats("a").score() == 150
+    assert [name for name, _ in selector.ranking()] == ["b", "a"]
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from byeblock_probe import ProxyTarget
+from byeblock_standins import start_origin, start_proxy
+from byeblock_throughput import measure_throughput
+
+RATE = 256 * 1024
+STREAMS = 2
+
+
+@pytest.fixture(scope="module")
+def origin():
+    server = start_origin()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize("proxy_type", ["HTTP", "SOCKS5"])
+def test_throughput_follows_the_rate_cap(origin, proxy_type):
+    proxy = start_proxy(proxy_type, rate=RATE)
+    try:
+        target = ProxyTarget("capped", "127.0.0.1", proxy.port, proxy_type)
+        result = measure_throughput(target, f"http://127.0.0.1:{origin.port}/?bytes={{bytes}}",
+                                    payload=1 << 30, streams=STREAMS, duration=3)
+    finally:
+        proxy.stop()
+    # The cap is per connection, and the first chunk of each one goes out before the throttle kicks in
+    cap = RATE * STREAMS
+    assert result.ok, result.error
+    assert 0.6 * cap <= result.sustained <= 1.2 * cap
+    assert result.sustained <= result.peak <= 1.5 * cap
+
+
+def test_uncapped_proxy_is_much_faster(origin):
+    proxy = start_proxy("HTTP")
+    try:
+        target = ProxyTarget("open", "127.0.0.1", proxy.port, "HTTP")
+        result = measure_throughput(target, f"http://127.0.0.1:{origin.port}/?bytes={{bytes}}",
+                                    payload=64 * 1048576, streams=STREAMS, duration=2)
+    finally:
+        proxy.stop()
+    assert result.ok, result.error
+    assert result.sustained > 10 * RATE * STREAMS
+
+
+def test_stop_does_not_wait_for_streams_still_connecting(origin):
+    # The stand-in holds every request for its delay, like a slow proxy handshake
+    proxy = start_proxy("HTTP", delay=3)
+    stop = threading.Event()
+    threading.Timer(0.2, stop.set).start()
+    try:
+        target = ProxyTarget("slow", "127.0.0.1", proxy.port, "HTTP")
+        start = time.perf_counter()
+        result = measure_throughput(target, f"http://127.0.0.1:{origin.port}/?bytes={{bytes}}",
+                                    payload=1048576, streams=STREAMS, duration=10, stop=stop)
+        elapsed = time.perf_counter() - start
+    finally:
+        proxy.stop()
+    assert not result.ok and result.error == "Cancelled"
+    assert elapsed < 1